@@ -12,7 +12,8 @@ from PyQt5 import uic
 from PyQt5.QtCore import Qt, pyqtSignal, pyqtSlot
 from PyQt5.QtWidgets import QButtonGroup, QRadioButton, QGridLayout, QAbstractButton, QWidget
 
-from music_theory import NOTES, ChordInterval, getChordNotes, notesFromString
+from music_theory import NOTES, ChordInterval, ChordRelation, getChordNotes, notesFromString, pitchClass, \
+    recognizeChord
 
 Ui_ChordSelector, QWidget = uic.loadUiType(os.path.join(os.path.dirname(__file__), "chord_selector.ui"))
 
@@ -76,13 +77,13 @@ class ChordSelector(QWidget, Ui_ChordSelector):
         """
         When the line editor content was edited manually, try recognizing the chord and adjusting the widget's state
         """
-        notes = set(notesFromString(self.chordNotesEdit.text()))
-        for ctype in ChordInterval.getAllChordTypes():
-            for note in NOTES:
-                chord = set(getChordNotes(note, ctype))
-                if chord == notes:
-                    self.setChord(note, ctype)
-                    return
+        notes = notesFromString(self.chordNotesEdit.text())
+        matches = recognizeChord(pitchClass(note) for note in notes)
+        # Only select a chord consisting of exactly the given notes. A chord without the fifth would add it, a chord
+        # contained in them would drop the remaining notes
+        if matches and matches[0].relation in (ChordRelation.exact, ChordRelation.inversion):
+            self.setChord(NOTES[matches[0].root], matches[0].chordType)
+            return
 
         # Nothing was found. Uncheck all buttons
         self.blockSignals(True)
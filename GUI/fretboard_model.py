@@ -17,7 +17,7 @@ from PyQt5.QtWidgets import QStyledItemDelegate, QWidget, QSpinBox
 
 from Instruments.instrument import Instrument
 from chord_inventor import ChordInventor
-from music_theory import NOTES, ChordInterval, getChordNotes
+from music_theory import NOTES, ChordInterval, getChordNotes, pitchClass, chordMask
 
 
 class FretboardModel(QAbstractItemModel):
@@ -31,6 +31,8 @@ class FretboardModel(QAbstractItemModel):
         self.chordInventor = ChordInventor(self.instrument)
         self.editable = True
         self.currentChord = []
+        self.currentRoot = None  # Pitch class of the root of the current chord
+        self.currentMask = 0  # Mask of the pitch classes of the current chord
 
     def hasIndex(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> bool:
         if parent.isValid():
@@ -76,14 +78,28 @@ class FretboardModel(QAbstractItemModel):
             return Qt.AlignCenter
         elif role == Qt.DisplayRole or role == Qt.EditRole:
             return self.instrument.getNote(self.stringFromIndex(index), index.row())
-        elif role == Qt.BackgroundRole and self.data(index, Qt.DisplayRole) in self.currentChord:
-            if self.data(index, Qt.DisplayRole) == self.currentChord[0]:
+        elif role == Qt.BackgroundRole and self.inCurrentChord(index):
+            if self.pitchClass(index) == self.currentRoot:
                 # Root note
                 return QBrush(Qt.black)
             return QBrush(Qt.darkGray)
-        elif role == Qt.ForegroundRole and self.data(index, Qt.DisplayRole) in self.currentChord:
+        elif role == Qt.ForegroundRole and self.inCurrentChord(index):
             return QPen(Qt.white)
 
+    def pitchClass(self, index):
+        """
+        Return the pitch class of the note at the index, or None, if there is no note
+        """
+        pc = self.instrument.pitchClassMatrix()[self.stringFromIndex(index), index.row()]
+        return None if pc < 0 else int(pc)
+
+    def inCurrentChord(self, index):
+        """
+        Return True if the note at the index belongs to the current chord
+        """
+        pc = self.pitchClass(index)
+        return pc is not None and self.currentMask >> pc & 1 == 1
+
     def setData(self, index: QModelIndex, value: typing.Any, role: int = Qt.EditRole) -> bool:
         if role != Qt.EditRole:
             return False
@@ -94,6 +110,15 @@ class FretboardModel(QAbstractItemModel):
         self.dataChanged.emit(index, index)  # Docu says it must explicitly be emitted
         return True
 
+    def setStrings(self, strings):
+        """
+        Tune the instrument to the notes, given as Instrument.strings. The model is reset once, instead of emitting
+        dataChanged for every string
+        """
+        self.beginResetModel()
+        self.instrument.strings = list(strings)
+        self.endResetModel()
+
     def stringFromIndex(self, index):
         return len(self.instrument.strings) - index.column() - 1
 
@@ -102,8 +127,12 @@ class FretboardModel(QAbstractItemModel):
         intvl = ChordInterval.getInterval(chordType)
         if intvl is None:
             self.currentChord = []
+            self.currentRoot = None
+            self.currentMask = 0
         else:
             self.currentChord = getChordNotes(chordRoot, intvl)
+            self.currentRoot = pitchClass(chordRoot)
+            self.currentMask = chordMask(self.currentRoot, intvl)
         topLeft = self.index(0, 0)
         bottomRight = self.index(self.rowCount() - 1, self.columnCount() - 1)
         self.dataChanged.emit(topLeft, bottomRight)
@@ -203,6 +232,6 @@ class FretboardDelegate(QStyledItemDelegate):
 
         painter.setBrush(brush)
 
-        if note in index.model().currentChord:
+        if index.model().inCurrentChord(index):
             painter.drawEllipse(rect)
         painter.drawText(rect, Qt.AlignCenter, note)
@@ -15,12 +15,14 @@ from copy import copy
 
 from PyQt5 import uic
 from PyQt5.QtCore import Qt, pyqtSlot, QRect, QPoint, QObject, QEvent, QModelIndex
+from PyQt5.QtGui import QCloseEvent, QStandardItem, QStandardItemModel
 from PyQt5.QtWidgets import QStyle, QToolButton, QLineEdit
 
-import Instruments
 from GUI.define_instrument_dialog import DefineInstrumentDialog
 from GUI.fretboard_model import FretboardModel
 from Instruments.instrument import Instrument
+from Instruments.instrument_store import InstrumentStore
+from voicing_database import VoicingDatabase, schemeText, voicings_file
 
 Ui_MainWindow, QMainWindow = uic.loadUiType(os.path.join(os.path.dirname(__file__), "mainwindow.ui"))
 
@@ -39,8 +41,18 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.chordPicWidget.installEventFilter(self)
 
-        self.jdata = None
-        self.jfile = os.path.join(os.path.dirname(Instruments.instrument.__file__), "instruments.json")
+        # Precomputed voicings of the selected chord are listed in the chord table, if the database was built
+        self.maxVoicings = 20
+        self.currentChord = ("", "")
+        self.voicings = None
+        if os.path.isfile(voicings_file):
+            self.voicings = VoicingDatabase(voicings_file, readOnly=True)
+        self.voicingModel = QStandardItemModel(0, 3, self)
+        self.voicingModel.setHorizontalHeaderLabels(["Voicing", "Notes", "Cost"])
+        self.chordTable.setModel(self.voicingModel)
+        self.chordSelector.chordSelected.connect(self.onChordSelected)
+
+        self.store = None
         self._readData()
 
         self.instrumentComboBox.addItems(self.getInstrumentList())
@@ -64,10 +76,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.fretboardView.adjustSizes()
 
     def _readData(self):
-
-        with open(self.jfile, 'r') as f:
-            data = f.read()
-        self.jdata = json.loads(data)
+        """
+        Open the store of the instruments. It is created from the JSON file of the instruments on the first run
+        """
+        self.store = InstrumentStore()
 
     def setModel(self, model):
         if self.model is not None:
@@ -76,57 +88,34 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.fretboardView.setModel(model)
         self.chordSelector.chordSelected.connect(model.setCurrentChord)
         self.model.dataChanged.connect(self.checkTuning)
+        self.model.modelReset.connect(lambda: self.checkTuning())
 
         # Show the same chord on the new instrument
         self.chordSelector.emitChord()
 
     def _saveData(self):
         """
-        Save all instruments to a JSON file
+        Save the current instrument with its tunings to the store and write the stored instruments to the JSON file
         """
-        i = self.instrumentComboBox.currentIndex()
-        instr = self.model.instrument
-        if len(self.jdata["instrument"]) > i:
-            jinstr = self.jdata["instrument"][i]
-        else:
-            self.jdata["instrument"].append({})
-            jinstr = self.jdata["instrument"][-1]
-        jinstr["name"] = instr.name
-        jinstr["strings"] = "".join(instr.tuning[0][1])
-        jinstr["nfrets"] = instr.nfrets
-        jinstr["dotsOnFrets"] = instr.dotsOnFrets
-        if any(instr.rootfrets):
-            jinstr["rootfrets"] = instr.rootfrets
-
-        if len(instr.tuning) > 1:
-            l = []
-            jinstr["tuning"] = l
-            for t in instr.tuning[1:]:
-                name = t[0]
-                strings = t[1]
-                d = {"strings": "".join(strings)}
-                if name is not None:
-                    d["name"] = name
-                l.append(d)
-
-        with open(self.jfile, 'w') as f:
-            f.write(json.dumps(self.jdata, indent=2))
+        self.store.saveInstrument(self.model.instrument)
+        self.store.exportJson()
 
     def getInstrumentList(self):
         """
         Return a list of names of instruments defined in the data
         """
-        if self.jdata is None:
+        if self.store is None:
             return []
 
-        return [instr["name"] for instr in self.jdata["instrument"]]
+        return self.store.names()
 
     @pyqtSlot(int)
     def onInstrumentSelected(self, i):
-        if i >= len(self.jdata["instrument"]):
+        names = self.getInstrumentList()
+        if i >= len(names):
             return self.onNewInstrumentClicked()
 
-        newInstrument = Instrument.fromData(self.jdata["instrument"][i])
+        newInstrument = self.store.instrument(names[i])
         newModel = FretboardModel(self, newInstrument)
         self.setModel(newModel)
         self.tuningComboBox.clear()
@@ -140,16 +129,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     @pyqtSlot(int)
     def onTuningSelected(self, i):
-        tuning = self.model.instrument.tuning[i]
-
-        row = 0
-        for string, note in enumerate(reversed(tuning[1])):
-            index = self.model.index(row, string)
-            self.model.setData(index, note, Qt.EditRole)
-
-        index_from = self.model.index(row, 0)
-        index_to = self.model.index(row, len(tuning[1]) - 1)
-        self.model.dataChanged.emit(index_from, index_to)
+        self.model.setStrings(self.model.instrument.tuning[i][1])
 
     @pyqtSlot()
     def onSaveTuningClicked(self):
@@ -174,6 +154,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             name = None
 
         self.model.instrument.tuning.append((name, s))
+        self.store.addTuning(self.model.instrument.name, s, name)
         self.tuningComboBox.addItem(f"{name} ({', '.join(s)})")
         self.tuningNameEditor.hide()
 
@@ -181,9 +162,10 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     def checkTuning(self, tlIndex=QModelIndex(), brIndex=QModelIndex()):
         """
         Checks if the currently (manually) set tuning can be found in the list of tunings.
-        If yes, select it from the combo box. If not, offer the option to save the new custom tuning
+        If yes, select it from the combo box. If not, offer the option to save the new custom tuning.
+        Without the indices (e.g. after the model was reset), the tuning is always checked
         """
-        if tlIndex.row() != 0 and brIndex.row() != 0:
+        if tlIndex.isValid() and tlIndex.row() != 0 and brIndex.row() != 0:
             return
         tuningIsKnown = False
         for i, t in enumerate(self.model.instrument.tuning):
@@ -192,18 +174,38 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 break
 
         self.saveTuningButton.setEnabled(not tuningIsKnown)
+        self.showVoicings()
 
         if tuningIsKnown:
             self.tuningComboBox.blockSignals(True)
             self.tuningComboBox.setCurrentIndex(i)
             self.tuningComboBox.blockSignals(False)
 
+    @pyqtSlot(str, str)
+    def onChordSelected(self, root, chordType):
+        self.currentChord = (root, chordType)
+        self.showVoicings()
+
+    def showVoicings(self):
+        """
+        List the best stored voicings of the current chord on the instrument in its current tuning
+        """
+        self.voicingModel.removeRows(0, self.voicingModel.rowCount())
+        root, chordType = self.currentChord
+        if self.voicings is None or self.model is None or not root or not chordType:
+            return
+        for v in self.voicings.voicings(self.model.instrument, root, chordType, limit=self.maxVoicings):
+            self.voicingModel.appendRow([QStandardItem(schemeText(v.scheme)),
+                                         QStandardItem(", ".join(v.notes)),
+                                         QStandardItem("{:g}".format(v.cost))])
+
     @pyqtSlot(str)
     def addInstrument(self, instr):
         """Add a new instrument definition to the database"""
-        newInstr = json.loads(instr)
-        self.jdata["instrument"].append(newInstr)
-        self.instrumentComboBox.insertItem(self.instrumentComboBox.count() - 2, newInstr["name"])
+        newInstr = Instrument.fromData(json.loads(instr))
+        if newInstr.name not in self.store:
+            self.instrumentComboBox.insertItem(self.instrumentComboBox.count() - 2, newInstr.name)
+        self.store.saveInstrument(newInstr)
         self.instrumentComboBox.setCurrentIndex(self.instrumentComboBox.count() - 1)
 
     @pyqtSlot()
@@ -213,6 +215,13 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         dialog.emitInstrumentDefinition.connect(self.addInstrument)
         dialog.exec()
 
+    def closeEvent(self, event: QCloseEvent) -> None:
+        """Close the databases with the window"""
+        self.store.close()
+        if self.voicings is not None:
+            self.voicings.close()
+        super().closeEvent(event)
+
     def eventFilter(self, object: QObject, event: QEvent) -> bool:
         """
         Show or hide buttons over widgets
@@ -11,33 +11,43 @@ import typing
 
 from PyQt5.QtGui import QValidator
 
-from music_theory import NOTEre, notesFromString
+from music_theory import tokenizeNotes
 
 
 class NoteListValidator(QValidator):
     """Validator that allows only writing notes, commas and spaces"""
 
     commare = re.compile(" *, *")  # Regex for commas and separators in the string
+    # Regex for a German name being typed at the end of the string, e.g. "Ci" of "Cis"
+    partialre = re.compile("( *, *)?[A-Ha-h][ie]")
 
     def validate(self, input: str, pos: int) -> typing.Tuple['QValidator.State', str, int]:
         s = input.strip()
         if s == "":
             return QValidator.Acceptable, input, pos
 
-        substrings = NOTEre.split(s)
+        offset = input.index(s)
+        output = list(input)
+        end = 0
         previousWasNote = False
-        for fragment in substrings:
-            if fragment == "":
-                continue
-            if NOTEre.fullmatch(fragment):
-                previousWasNote = True
-                continue
-            elif previousWasNote and NoteListValidator.commare.fullmatch(fragment):
-                previousWasNote = False
-            else:
+        for token in tokenizeNotes(s):
+            fragment = s[end:token.start]
+            if fragment and not (previousWasNote and NoteListValidator.commare.fullmatch(fragment)):
                 return QValidator.Invalid, input, pos
+            # Capitalize only the letter, the accidentals are case-sensitive
+            output[offset + token.start] = s[token.start].upper()
+            end = token.end
+            previousWasNote = True
+        fragment = s[end:]
+        if fragment and not (previousWasNote and NoteListValidator.commare.fullmatch(fragment)):
+            partial = NoteListValidator.partialre.fullmatch(fragment)
+            if partial is None or (partial.group(1) is not None) != previousWasNote:
+                return QValidator.Invalid, input, pos
+            letter = offset + end + partial.end() - 2
+            output[letter] = output[letter].upper()
+            return QValidator.Intermediate, "".join(output), pos
 
-        if previousWasNote:
-            return QValidator.Acceptable, input.upper(), pos
+        if not fragment:
+            return QValidator.Acceptable, "".join(output), pos
         else:
-            return QValidator.Intermediate, input.upper(), pos
+            return QValidator.Intermediate, "".join(output), pos
@@ -12,8 +12,12 @@ __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 import warnings
 from copy import copy
 
+import numpy as np
+
 from chord import Chord
-from music_theory import NOTES, notesFromString
+from chord_library import ChordLibrary
+from music_theory import NOTES, ChordRelation, maskPitchClasses, notesFromString, pitchClass, plainAnnotation, \
+    recognizeChord
 
 
 class Instrument(object):
@@ -30,7 +34,7 @@ class Instrument(object):
         self.strings = list()  # Names (tones) of the strings. 1st string is the one the farthest to the bottom
         # (the thinnest in guitar)
         self.nfrets = 0  # number of frets
-        self.chords = list()
+        self.chords = ChordLibrary()
         self.tuning = [("Standard", self.strings)]
 
         # Numbers of frets on which each string begins. Usually is all zeros, but for bluegrass banjo
@@ -39,6 +43,9 @@ class Instrument(object):
 
         self.dotsOnFrets = list()
 
+        # Pitch class matrices keyed by (strings, rootfrets, nfrets), see pitchClassMatrix
+        self._pitchClassMatrices = {}
+
     def defineChord(self, name, scheme=None, frets=None, fingers=None, prefix=None):
         """
         Add a chord diagram to the class
@@ -52,9 +59,7 @@ class Instrument(object):
                 scheme = tuple((fr, fg) for fr, fg in zip(frets, fingers))
         else:
             assert scheme is not None
-        chord = Chord(name, scheme, prefix=prefix)
-        if chord not in self.chords:
-            self.chords.append(chord)
+        self.chords.add(Chord(name, scheme, prefix=prefix))
         # print(f'self.defineChord("{name}", prefix="{type(self).__name__}"', old2new(scheme), ")")
 
     def checkChords(self):
@@ -79,13 +84,165 @@ class Instrument(object):
         """
         Return the name of the note on the given string and fret
         """
+        pc = self.getPitchClass(string, fret)
+        if pc is None:
+            return None
+        return NOTES[pc]
 
+    def getPitchClass(self, string, fret):
+        """
+        Return the pitch class (0-11) of the note on the given string and fret, or None, if the string does not reach
+        the fret
+        """
         if fret < self.rootfrets[string]:
             return None
-        root = self.strings[string]
-        ibase = NOTES.index(root)
+        return (pitchClass(self.strings[string]) - self.rootfrets[string] + fret) % 12
+
+    def pitchClassMatrix(self):
+        """
+        Return a read-only (strings x frets+1) array of the pitch classes of all notes on the fretboard. The cells
+        before the root frets are -1. The matrix is computed once for every tuning, i.e. combination of strings,
+        rootfrets and nfrets, and recomputed automatically if they change
+        """
+        key = self._matrixKey()
+        try:
+            return self._pitchClassMatrices[key]
+        except KeyError:
+            pass
+        frets = np.arange(self.nfrets + 1)
+        rootfrets = np.array(self.rootfrets, dtype=int).reshape(-1, 1)
+        bases = np.array([pitchClass(s) for s in self.strings], dtype=int).reshape(-1, 1)
+        matrix = np.where(frets >= rootfrets, (bases - rootfrets + frets) % 12, -1).astype(np.int8)
+        matrix.setflags(write=False)
+        self._pitchClassMatrices[key] = matrix
+        return matrix
+
+    def _matrixKey(self):
+        """Return the key of the pitch class matrix of the current tuning"""
+        return tuple(self.strings), tuple(self.rootfrets), self.nfrets
+
+    def chordCells(self, mask):
+        """
+        Return a boolean (strings x frets+1) array, True where the note belongs to the chord given by its mask of pitch
+        classes
+        """
+        # The last item of the table is looked up by the -1 cells before the root frets
+        table = np.array([mask >> pc & 1 for pc in range(12)] + [0], dtype=bool)
+        return table[self.pitchClassMatrix()]
+
+    def withTuning(self, tuning):
+        """
+        Return a view of the instrument with the strings tuned as in the tuning of given name or as the given notes.
+        The view is cheap: it has its own strings, root frets and tunings, which can be changed independently from this
+        instrument, but it shares the chord library. It has its own cache of the pitch class matrices, which starts
+        with the matrix of this instrument for the same tuning, if it is cached
+        """
+        if isinstance(tuning, str):
+            for name, strings in self.tuning:
+                if name == tuning:
+                    break
+            else:
+                raise ValueError("{} has no tuning {}".format(self.name, tuning))
+        else:
+            strings = tuning
+        if len(strings) != len(self.strings):
+            raise ValueError("{} has {} strings, not {}".format(self.name, len(self.strings), len(strings)))
+        view = copy(self)
+        view.strings = list(strings)
+        view.rootfrets = list(self.rootfrets)
+        view.dotsOnFrets = list(self.dotsOnFrets)
+        view.tuning = list(self.tuning)
+        key = view._matrixKey()
+        view._pitchClassMatrices = {key: self._pitchClassMatrices[key]} if key in self._pitchClassMatrices else {}
+        return view
+
+    def transposed(self, capo=0, partialCapos=None, shifts=0):
+        """
+        Return a view of the instrument (see withTuning) with a capo on the fret capo, strings capoed on their own on
+        the frets partialCapos (one per string, as the strings, None or 0 for no capo) and retuned by the semitones
+        shifts (one per string or one for all strings).
+
+        The frets of the view are counted from the capo, as in the chord books: the capo raises every string by capo
+        semitones, the drone of a banjo too, as if it were capoed at the same distance. A partial capo is placed on a
+        fret counted from the capo, its string starts there as at a root fret.
+
+        The pitch class matrix of the view is the cached one of the instrument with a vector of semitone offsets
+        added and the cells before the new root frets cleared. If all strings are moved by the same offset and no
+        string is capoed on its own, the chords of the view are the chords of the instrument renamed (see
+        ChordLibrary.transposed). Otherwise they are derived again from the matrix, see _derivedChords
+        """
+        n = len(self.strings)
+        offsets = capo + np.broadcast_to(np.asarray(shifts, dtype=int), (n,))
+        rootfrets = np.array(self.rootfrets, dtype=int)
+        if partialCapos is not None:
+            if len(partialCapos) != n:
+                raise ValueError("{} has {} strings, not {}".format(self.name, n, len(partialCapos)))
+            rootfrets = np.maximum(rootfrets, [c or 0 for c in partialCapos])
+        nfrets = self.nfrets - capo
+        if capo < 0 or (rootfrets > nfrets).any():
+            raise ValueError("{} has no fret {}".format(self.name, max(capo, int(rootfrets.max()))))
+
+        frets = np.arange(nfrets + 1)
+        matrix = np.where(frets >= rootfrets.reshape(-1, 1),
+                          (self.pitchClassMatrix()[:, :nfrets + 1] + offsets.reshape(-1, 1)) % 12, -1).astype(np.int8)
+        matrix.setflags(write=False)
+        view = copy(self)
+        view.strings = [NOTES[pc] for pc in matrix[np.arange(n), rootfrets].tolist()]
+        view.rootfrets = rootfrets.tolist()
+        view.nfrets = nfrets
+        view.dotsOnFrets = [dot - capo for dot in self.dotsOnFrets if dot > capo]
+        view.tuning = list(self.tuning)
+        view._pitchClassMatrices = {view._matrixKey(): matrix}
 
-        return NOTES[(ibase - self.rootfrets[string] + fret) % 12]
+        if view.rootfrets == list(self.rootfrets) and (offsets == offsets[0]).all():
+            if offsets[0] % 12:
+                view.chords = self.chords.transposed(int(offsets[0]))
+        else:
+            view.chords = view._derivedChords(self.chords, self.rootfrets)
+        return view
+
+    def _derivedChords(self, chords, rootfrets):
+        """
+        Return a library of the schemes of the chords, named as they sound on this instrument. The strings began at
+        the root frets rootfrets, when the chords were defined: the open strings now sound at the current root frets
+        and the schemes pressing a string below it are dropped. The pitch classes of all schemes are looked up in the
+        pitch class matrix in one step, the chords of distinct pitch classes are recognized once. The chords are named
+        by the root and the plain-text annotation of the chord type (see plainAnnotation). The schemes which are not
+        recognized as chords are dropped
+        """
+        frets = chords.fretArray().astype(int)
+        count, width = frets.shape
+        sounding = frets >= 0
+        # Scheme items run from the bass string, the last item of every scheme is the first string
+        lengths = (frets != -2).sum(axis=1).reshape(-1, 1)
+        strings = np.where(sounding, lengths - 1 - np.arange(width), 0)
+        oldRoots = np.asarray(rootfrets, dtype=int)[strings] if strings.size else strings
+        newRoots = np.asarray(self.rootfrets, dtype=int)[strings] if strings.size else strings
+        played = np.where(sounding & (frets <= oldRoots), newRoots, frets)
+        playable = ~(sounding & ((played < newRoots) | (played > self.nfrets))).any(axis=1)
+        pitchClasses = np.where(sounding, self.pitchClassMatrix()[strings, played.clip(0, self.nfrets)], -1)
+        # The matrix is of int8, too narrow for the bits of the pitch classes
+        masks = np.bitwise_or.reduce(np.where(pitchClasses >= 0, 1 << pitchClasses.clip(0).astype(int), 0), axis=1)
+        basses = pitchClasses[np.arange(count), (pitchClasses >= 0).argmax(axis=1)] if width else masks
+
+        names = {}
+        derived = ChordLibrary()
+        for chord, ok, mask, bass, row in zip(chords, playable.tolist(), masks.tolist(), basses.tolist(),
+                                              played.tolist()):
+            if not ok or not mask:
+                continue
+            if (mask, bass) not in names:
+                matches = [m for m in recognizeChord([bass] + maskPitchClasses(mask))
+                           if m.relation != ChordRelation.superset]
+                names[mask, bass] = NOTES[matches[0].root] + plainAnnotation(matches[0].chordType) if matches else None
+            if names[mask, bass] is None:
+                continue
+            scheme = tuple(item if item is None or chord.fret(j) == fret else
+                           fret if isinstance(item, int) else (fret,) + tuple(item[1:])
+                           for j, (item, fret) in enumerate(zip(chord.scheme, row)))
+            derived.add(Chord(names[mask, bass], scheme, chord.prefix, chord.suffix))
+        derived.frozen = chords.frozen
+        return derived
 
     @staticmethod
     def fromData(d):
@@ -122,10 +279,34 @@ class Instrument(object):
             for inv in reversed(invalid):
                 d["tuning"].pop(inv)
 
-        # ToDo: restore chords saved in the data
+        if "chords" in d:
+            instrument.chords = ChordLibrary.fromColumns(d["chords"])
 
         return instrument
 
+    def toData(self):
+        """
+        Return the data of the instrument, from which fromData restores it. The strings are those of the standard
+        tuning. The chords are saved in the columnar form of ChordLibrary.toColumns
+        """
+        strings = self.tuning[0][1] if self.tuning and self.tuning[0][1] else self.strings
+        d = {"name": self.name,
+             "strings": "".join(strings),
+             "nfrets": self.nfrets,
+             "dotsOnFrets": list(self.dotsOnFrets)}
+        if any(self.rootfrets):
+            d["rootfrets"] = list(self.rootfrets)
+        if len(self.tuning) > 1:
+            d["tuning"] = []
+            for name, strings in self.tuning[1:]:
+                t = {"strings": "".join(strings)}
+                if name is not None:
+                    t["name"] = name
+                d["tuning"].append(t)
+        if len(self.chords):
+            d["chords"] = self.chords.toColumns()
+        return d
+
 
 def old2new(old):
     """ Helper function converting old argument list todefineChord to a new one"""
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__all__ = ['InstrumentFactory', 'INSTRUMENTS', 'INSTRUMENT_CLASSES', 'instruments_file']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import json
+import os
+from copy import deepcopy
+
+from Instruments.banjo import Banjo_5string
+from Instruments.guitar import Guitar
+from Instruments.instrument import Instrument
+from Instruments.ukulele import Ukulele
+
+# JSON file with the definitions of the instruments and their tunings
+instruments_file = os.path.join(os.path.dirname(__file__), "instruments.json")
+
+# Instruments whose chords are defined in code, keyed by their names
+INSTRUMENT_CLASSES = {"Guitar": Guitar, "Banjo": Banjo_5string, "Ukulele": Ukulele}
+
+
+class InstrumentFactory(object):
+    """
+    Builds every instrument definition once and hands out cheap views of it in given tunings (see
+    Instrument.withTuning), instead of constructing and retuning instruments over and over.
+
+    The definitions come from the JSON file (default: instruments_file) and from the classes defining chords in code
+    (default: INSTRUMENT_CLASSES). If both define an instrument of the same name and the file does not save its
+    chords, the definition from the file gets the chords of the class. The chord libraries of the definitions are
+    frozen, so that all views can share them
+    """
+
+    def __init__(self, jfile=None, classes=None):
+        self.jfile = instruments_file if jfile is None else jfile
+        self.classes = dict(INSTRUMENT_CLASSES if classes is None else classes)
+        self._data = None  # Definitions in the JSON file keyed by the instrument names, read when first needed
+        self._definitions = {}
+
+    def _storedData(self):
+        if self._data is None:
+            self._data = {}
+            if os.path.isfile(self.jfile):
+                with open(self.jfile, 'r') as f:
+                    self._data = {d["name"]: d for d in json.load(f)["instrument"]}
+        return self._data
+
+    def storedNames(self):
+        """Return the names of the instruments defined in the JSON file, in the order of the file"""
+        return list(self._storedData())
+
+    def names(self):
+        """Return the names of all instruments: the ones defined in the JSON file, followed by the other classes"""
+        stored = self._storedData()
+        return list(stored) + [name for name in self.classes if name not in stored]
+
+    def definition(self, name) -> Instrument:
+        """
+        Return the shared definition of the instrument. It is built on the first call. Do not modify it, but take a
+        view of it (see instrument)
+        """
+        try:
+            return self._definitions[name]
+        except KeyError:
+            pass
+        data = self._storedData().get(name)
+        cls = self.classes.get(name)
+        if data is None and cls is None:
+            raise KeyError("Unknown instrument: {}".format(name))
+        if data is None:
+            definition = cls()
+            definition.tuning = [("Standard", list(definition.strings))]
+        else:
+            # fromData drops the invalid tunings from the data
+            definition = Instrument.fromData(deepcopy(data))
+            if cls is not None and "chords" not in data:
+                definition.chords = cls().chords
+        definition.chords.freeze()
+        self._definitions[name] = definition
+        return definition
+
+    def instrument(self, name, tuning=None) -> Instrument:
+        """
+        Return a view of the instrument in the tuning of given name, or given as notes (default: the standard one)
+        """
+        definition = self.definition(name)
+        return definition.withTuning(definition.strings if tuning is None else tuning)
+
+
+# Factory of the instruments of the package, shared by the applications
+INSTRUMENTS = InstrumentFactory()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+Transactional store of the instrument definitions.
+
+The instruments and their tunings are kept in an SQLite file, one row per instrument and per tuning, so that a single
+instrument or tuning is read or written without touching the others. Every write is committed atomically.
+
+The JSON file of the instruments (see instruments_file) remains the source of the shared catalogue, which
+InstrumentFactory and generate_htmls.py read: whenever it has changed since it was last imported, its instruments are
+merged into the store when the store is opened. The store is written back to it by exportJson.
+"""
+
+__all__ = ['InstrumentStore', 'instruments_store_file']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import hashlib
+import json
+import os
+import sqlite3
+
+from Instruments.instrument import Instrument
+from Instruments.instrument_factory import instruments_file
+from music_theory import notesFromString
+
+# Default store file, next to the JSON file of the instruments
+instruments_store_file = os.path.join(os.path.dirname(__file__), "instruments.sqlite")
+
+# Version of the schema. Stores of other versions are created anew from the JSON file
+INSTRUMENT_STORE_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS instruments (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    strings TEXT NOT NULL,
+    nfrets INTEGER NOT NULL,
+    dotsOnFrets TEXT,
+    rootfrets TEXT,
+    chords TEXT
+);
+CREATE TABLE IF NOT EXISTS tunings (
+    id INTEGER PRIMARY KEY,
+    instrument INTEGER NOT NULL REFERENCES instruments(id) ON DELETE CASCADE,
+    name TEXT,
+    strings TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tunings_instrument ON tunings(instrument, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class InstrumentStore(object):
+    """
+    SQLite store of the instruments in the format of Instrument.toData. The instruments are kept in the order in which
+    they were added. Listing them reads only their names, the details of an instrument are read when it is requested.
+
+    An import of the JSON file merges its instruments into the stored ones of the same names: the definitions of the
+    strings and frets are imported, the stored tunings and chords missing from the file (e.g. added in the GUI) are
+    kept after the imported ones. The other stored instruments are kept as they are.
+
+    Use it as a context manager to close it
+    """
+
+    def __init__(self, filename=None, jfile=None):
+        """
+        Open the store in the file (default: instruments_store_file) and import the JSON file (default:
+        instruments_file), if it changed since it was last imported, see importJson
+        """
+        if filename is None:
+            filename = instruments_store_file
+        self.filename = filename
+        self.jfile = instruments_file if jfile is None else jfile
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self._createSchema()
+        self.importJson(self.jfile)
+
+    def _createSchema(self):
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version == INSTRUMENT_STORE_VERSION:
+            return
+        with self.connection:
+            self.connection.executescript("DROP TABLE IF EXISTS tunings; DROP TABLE IF EXISTS instruments; "
+                                          "DROP TABLE IF EXISTS meta;")
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute("PRAGMA user_version = {:d}".format(INSTRUMENT_STORE_VERSION))
+
+    def importJson(self, jfile):
+        """
+        Merge the instruments of the JSON file into the store in a single transaction, unless the file is missing or
+        has not changed since it was last imported or exported. Return True if it was imported
+        """
+        if not os.path.isfile(jfile):
+            return False
+        with open(jfile, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'jsonHash'").fetchone()
+        if row is not None and row[0] == digest:
+            return False
+        with self.connection:
+            for d in json.loads(content.decode('utf-8'))["instrument"]:
+                self._write(self._merged(Instrument.fromData(d)).toData())
+            self._setJsonHash(digest)
+        return True
+
+    def _merged(self, instrument: Instrument):
+        """
+        Add the tunings and chords of the stored instrument of the same name, which the instrument lacks, to it
+        """
+        if instrument.name not in self:
+            return instrument
+        stored = self.instrument(instrument.name)
+        for name, strings in stored.tuning[1:]:
+            if len(strings) == len(instrument.strings) and all(strings != s for _, s in instrument.tuning):
+                instrument.tuning.append((name, strings))
+        if len(stored.chords):
+            for chord in stored.chords:
+                instrument.chords.add(chord)
+        return instrument
+
+    def exportJson(self, jfile=None):
+        """
+        Write all stored instruments to the JSON file (default: the one imported when the store was opened), replacing
+        it atomically. The written file is not imported again
+        """
+        if jfile is None:
+            jfile = self.jfile
+        content = json.dumps({"instrument": [self.data(name) for name in self.names()]}, indent=2).encode('utf-8')
+        temporary = jfile + ".tmp"
+        with open(temporary, 'wb') as f:
+            f.write(content)
+        os.replace(temporary, jfile)
+        with self.connection:
+            self._setJsonHash(hashlib.sha256(content).hexdigest())
+
+    def _setJsonHash(self, digest):
+        """Record the hash of the JSON file last imported or exported. Does not commit"""
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('jsonHash', ?)", (digest,))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _instrumentId(self, name):
+        row = self.connection.execute("SELECT id FROM instruments WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError("Unknown instrument: {}".format(name))
+        return row[0]
+
+    def names(self):
+        """Return the names of the stored instruments"""
+        return [name for name, in self.connection.execute("SELECT name FROM instruments ORDER BY id")]
+
+    def __contains__(self, name):
+        return self.connection.execute("SELECT 1 FROM instruments WHERE name = ?", (name,)).fetchone() is not None
+
+    def tunings(self, name):
+        """
+        Return the tunings of the instrument as (name, notes) pairs, the standard one first
+        """
+        instrumentId = self._instrumentId(name)
+        strings, = self.connection.execute("SELECT strings FROM instruments WHERE id = ?", (instrumentId,)).fetchone()
+        return [("Standard", notesFromString(strings))] + [
+            (tuningName, notesFromString(strings)) for tuningName, strings in self.connection.execute(
+                "SELECT name, strings FROM tunings WHERE instrument = ? ORDER BY id", (instrumentId,))]
+
+    def data(self, name):
+        """
+        Return the data of the instrument, from which Instrument.fromData creates it
+        """
+        instrumentId = self._instrumentId(name)
+        strings, nfrets, dotsOnFrets, rootfrets, chords = self.connection.execute(
+            "SELECT strings, nfrets, dotsOnFrets, rootfrets, chords FROM instruments WHERE id = ?",
+            (instrumentId,)).fetchone()
+        d = {"name": name, "strings": strings, "nfrets": nfrets}
+        for key, value in (("dotsOnFrets", dotsOnFrets), ("rootfrets", rootfrets), ("chords", chords)):
+            if value is not None:
+                d[key] = json.loads(value)
+        tunings = []
+        for tuningName, strings in self.connection.execute(
+                "SELECT name, strings FROM tunings WHERE instrument = ? ORDER BY id", (instrumentId,)):
+            t = {"strings": strings}
+            if tuningName is not None:
+                t["name"] = tuningName
+            tunings.append(t)
+        if tunings:
+            d["tuning"] = tunings
+        return d
+
+    def instrument(self, name) -> Instrument:
+        """Return a new instrument created from the stored data"""
+        return Instrument.fromData(self.data(name))
+
+    def saveInstrument(self, instrument: Instrument):
+        """
+        Store the instrument with all its tunings and chords, replacing the stored instrument of the same name
+        """
+        with self.connection:
+            self._write(instrument.toData())
+
+    def _write(self, d):
+        """Store the data of an instrument. Does not commit"""
+        values = (d["strings"], d["nfrets"],
+                  *(json.dumps(d[key]) if key in d else None for key in ("dotsOnFrets", "rootfrets", "chords")))
+        row = self.connection.execute("SELECT id FROM instruments WHERE name = ?", (d["name"],)).fetchone()
+        if row is None:
+            instrumentId = self.connection.execute(
+                "INSERT INTO instruments (strings, nfrets, dotsOnFrets, rootfrets, chords, name) "
+                "VALUES (?, ?, ?, ?, ?, ?)", values + (d["name"],)).lastrowid
+        else:
+            # Updated in place, so that the instrument keeps its position
+            instrumentId = row[0]
+            self.connection.execute(
+                "UPDATE instruments SET strings = ?, nfrets = ?, dotsOnFrets = ?, rootfrets = ?, chords = ? "
+                "WHERE id = ?", values + (instrumentId,))
+            self.connection.execute("DELETE FROM tunings WHERE instrument = ?", (instrumentId,))
+        self.connection.executemany("INSERT INTO tunings (instrument, name, strings) VALUES (?, ?, ?)",
+                                    [(instrumentId, t.get("name"), t["strings"]) for t in d.get("tuning", [])])
+
+    def addTuning(self, name, strings, tuningName=None):
+        """
+        Add a tuning (list of notes) to the stored instrument. The tuning must have as many strings as the instrument
+        """
+        instrumentId = self._instrumentId(name)
+        standard, = self.connection.execute("SELECT strings FROM instruments WHERE id = ?", (instrumentId,)).fetchone()
+        if len(strings) != len(notesFromString(standard)):
+            raise ValueError("{} has {} strings, not {}".format(name, len(notesFromString(standard)), len(strings)))
+        with self.connection:
+            self.connection.execute("INSERT INTO tunings (instrument, name, strings) VALUES (?, ?, ?)",
+                                    (instrumentId, tuningName, "".join(strings)))
+
+    def removeInstrument(self, name):
+        """Remove the instrument with its tunings"""
+        with self.connection:
+            self.connection.execute("DELETE FROM instruments WHERE id = ?", (self._instrumentId(name),))
@@ -5,13 +5,14 @@ Created on 16.10.2021 17:40 10
 @author: Piotr Gradkowski <grotsztaksel@o2.pl>
 """
 
-__all__ = ['Chord']
+__all__ = ['Chord', 'PackedChord', 'ChordName', 'parseChordName', 'chordFileName', 'transposeChordName']
 __date__ = '2021-10-16'
 __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 
 from collections import namedtuple
+from functools import lru_cache
 
-from music_theory import CHORD_ENGLISH, CHORD_GERMAN
+from music_theory import CHORD_ENGLISH, CHORD_GERMAN, NOTES, NOTE_TOKENre, pitchClass
 
 Chord = namedtuple("Chord", ["name", "scheme", "prefix", "suffix"], defaults=["", ""])
 Chord.__doc__ = """
@@ -20,6 +21,85 @@ Chord.__doc__ = """
 
                 """
 
+ChordName = namedtuple("ChordName", ["root", "minor", "suffix"])
+ChordName.__doc__ = "Parts of a chord name, see parseChordName"
+ChordName.root.__doc__ = "Root note, e.g. 'D#'"
+ChordName.minor.__doc__ = "True for a minor chord"
+ChordName.suffix.__doc__ = "The rest of the name, e.g. '7' or '6/9', or an empty string"
+
+
+@lru_cache(maxsize=None)
+def parseChordName(name) -> ChordName:
+    """
+    Split the chord name written in the English (e.g. "D#m7") or German (e.g. "dis7") naming convention into its
+    parts. The results are cached, as chords of the same names are parsed over and over
+    """
+    n = name  # for short
+
+    m_eng = CHORD_ENGLISH.fullmatch(n)
+    if m_eng:
+        root = n[0]
+
+        i = 0
+        if "#" in n:
+            root += "#"
+            i = 1
+        try:
+            minor = n[1 + i] == "m"
+        except IndexError:
+            minor = False
+        return ChordName(root, minor, m_eng.group(1) or "")
+
+    m_ger = CHORD_GERMAN.fullmatch(n)
+    if m_ger:
+        root = n[0].upper()
+        try:
+            if n[1] == "s" or n[1:3] == "is":
+                root += "#"
+        except IndexError:
+            pass
+        return ChordName(root, root[0] != n[0], m_ger.group(3) or "")
+
+    else:
+        raise ValueError("{} matches neither English nor German naming convention".format(name))
+
+
+@lru_cache(maxsize=None)
+def chordFileName(name) -> str:
+    """
+    Convert the chord name to a string that could be used as a valid file name (or at the core of the file name)
+    """
+    root, minor, suffix = parseChordName(name)
+    output = root.replace("#", "_sharp") + ("_minor" if minor else "_major")
+    if suffix:
+        output += "_" + suffix
+    return output.replace("/", "by").replace("+", "plus")
+
+
+@lru_cache(maxsize=None)
+def transposeChordName(name, semitones) -> str:
+    """
+    Return the chord name with the root moved by the semitones, keeping the naming convention: "A#m" moved by 2 is
+    "Cm", "cis7" is "dis7" and "H" is "Cis". Names that follow neither convention are
+    read as the root followed by an annotation of the chord type, as ChordInventor names the chords
+    """
+    german = CHORD_ENGLISH.fullmatch(name) is None and CHORD_GERMAN.fullmatch(name) is not None
+    if german:
+        end = CHORD_GERMAN.fullmatch(name).end(1)
+    elif CHORD_ENGLISH.fullmatch(name):
+        end = 2 if name[1:2] == "#" else 1
+    else:
+        match = NOTE_TOKENre.match(name)
+        if match is None:
+            raise ValueError("{} does not begin with a root note".format(name))
+        end = match.end()
+    root = NOTES[(pitchClass(name[:end]) + semitones) % 12]
+    if german:
+        root = root.replace("B", "H").replace("#", "is")
+        if name[0].islower():
+            root = root.lower()
+    return root + name[end:]
+
 
 class Chord(Chord):
     def __len__(self):
@@ -27,10 +107,11 @@ class Chord(Chord):
 
     def fret(self, istring):
         """
-        Unpacks the i-th item from the scheme and returns the fret that should be pressed
+        Unpacks the i-th item from the scheme and returns the fret that should be pressed, or None, if the string is
+        muted
         """
         c = self.scheme[istring]
-        if isinstance(c, int):
+        if c is None or isinstance(c, int):
             return c
         return c[0]
 
@@ -39,7 +120,7 @@ class Chord(Chord):
         Unpacks the i-th item from the scheme and returns the finger that should be used to press the string
         """
         c = self.scheme[istring]
-        if isinstance(c, int):
+        if c is None or isinstance(c, int):
             return None
         elif len(c) < 1:
             return None
@@ -50,48 +131,98 @@ class Chord(Chord):
         """
         Convert the chord name to a string that could be used as a valid file name (or at the core of the file name)
         """
-        n = self.name  # for short
-
-        m_eng = CHORD_ENGLISH.fullmatch(n)
-        if m_eng:
-            output = n[0]
-
-            i = 0
-            if "#" in n:
-                output += "_sharp"
-                i = 1
-            try:
-                if n[1 + i] == "m":
-                    output += "_minor"
-                else:
-                    output += "_major"
-            except IndexError:
-                output += "_major"
-
-            suffix = m_eng.group(1)
-            if suffix:
-                output += "_" + suffix
-
-            return output.replace("/", "by").replace("+", "plus")
-
-        m_ger = CHORD_GERMAN.fullmatch(n)
-        if m_ger:
-            output = n[0].upper()
-            try:
-                if n[1] == "s" or n[1:3] == "is":
-                    output += "_sharp"
-            except IndexError:
-                pass
-            if output[0] == n[0]:
-                output += "_major"
-            else:
-                output += "_minor"
-
-            suffix = m_ger.group(3)
-            if suffix:
-                output += "_" + suffix
-
-            return output.replace("/", "by").replace("+", "plus")
-
-        else:
-            raise ValueError("{} matches neither English nor German naming convention".format(self.name))
+        return chordFileName(self.name)
+
+
+class PackedChord(object):
+    """
+    Compact form of a Chord for large sets of voicings. The frets and fingers are packed into fixed-width byte strings
+    instead of a tuple of ints, None and (fret, finger) tuples, and the instances have no __dict__.
+
+    A packed chord has the same interface as Chord and compares and hashes equal to the Chord it was packed from, so
+    the two can be mixed in sets and ChordLibrary. It converts to and from Chord without loss, see fromChord and toChord
+    """
+    __slots__ = ("name", "prefix", "suffix", "frets", "fingers")
+
+    # Code of the finger of a (fret, None) item of a scheme
+    NO_FINGER = 255
+
+    def __init__(self, name, frets, fingers=None, prefix="", suffix=""):
+        """
+        frets - bytes with fret + 1 of every string, 0 for a muted string.
+        fingers - None if the scheme has no (fret, finger) items, otherwise bytes with 0 for a plain fret, finger + 1
+        for a (fret, finger) item and NO_FINGER for a (fret, None) item
+        """
+        self.name = name
+        self.frets = frets
+        self.fingers = fingers
+        self.prefix = prefix
+        self.suffix = suffix
+
+    @staticmethod
+    def fromChord(chord: Chord):
+        """Pack the chord"""
+        frets = bytes(0 if c is None else (c if isinstance(c, int) else c[0]) + 1 for c in chord.scheme)
+        fingers = None
+        if any(isinstance(c, tuple) for c in chord.scheme):
+            fingers = bytes(0 if not isinstance(c, tuple) else PackedChord.NO_FINGER if c[1] is None else c[1] + 1
+                            for c in chord.scheme)
+        return PackedChord(chord.name, frets, fingers, chord.prefix, chord.suffix)
+
+    def toChord(self) -> Chord:
+        """Unpack the chord"""
+        return Chord(self.name, self.scheme, self.prefix, self.suffix)
+
+    @property
+    def scheme(self):
+        """The scheme of the chord as in Chord"""
+        frets = [f - 1 if f else None for f in self.frets]
+        if self.fingers is None:
+            return tuple(frets)
+        return tuple(f if not g else (f, None if g == PackedChord.NO_FINGER else g - 1)
+                     for f, g in zip(frets, self.fingers))
+
+    def __len__(self):
+        return len(self.frets)
+
+    def fret(self, istring):
+        """
+        Return the fret that should be pressed on the i-th string, or None, if the string is muted
+        """
+        f = self.frets[istring]
+        return f - 1 if f else None
+
+    def finger(self, istring):
+        """
+        Return the finger that should be used to press the i-th string, or None, if it is not given
+        """
+        if self.fingers is None:
+            return None
+        g = self.fingers[istring]
+        return None if g in (0, PackedChord.NO_FINGER) else g - 1
+
+    @property
+    def toString(self):
+        """
+        Convert the chord name to a string that could be used as a valid file name (or at the core of the file name)
+        """
+        return chordFileName(self.name)
+
+    def _key(self):
+        return self.name, self.scheme, self.prefix, self.suffix
+
+    def __eq__(self, other):
+        if isinstance(other, PackedChord):
+            return (self.name, self.frets, self.fingers, self.prefix, self.suffix) == \
+                (other.name, other.frets, other.fingers, other.prefix, other.suffix)
+        if isinstance(other, Chord):
+            return self._key() == tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        # The hash of the equal Chord, which is a namedtuple of the same fields
+        return hash(self._key())
+
+    def __repr__(self):
+        return "PackedChord(name={!r}, scheme={!r}, prefix={!r}, suffix={!r})".format(self.name, self.scheme,
+                                                                                     self.prefix, self.suffix)
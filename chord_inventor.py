@@ -5,14 +5,40 @@ Created on 03.12.2021 21:12 12
 @author: Piotr Gradkowski <grotsztaksel@o2.pl>
 """
 
-__all__ = ['ChordInventor']
+__all__ = ['ChordInventor', 'VoicingCatalogue']
 __date__ = '2021-12-03'
 __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+import numpy as np
+
 from Instruments.instrument import Instrument
-from music_theory import NOTES, ChordInterval
+from chord import Chord, PackedChord
+from music_theory import NOTES, ChordInterval, chordMask, pitchClass
+
+# Number of pitch classes in every 12-bit mask
+POPCOUNT = [bin(mask).count("1") for mask in range(1 << 12)]
+
+VoicingCatalogue = namedtuple("VoicingCatalogue", ["schemes", "roots", "types", "chordTypes"])
+VoicingCatalogue.__doc__ = "Voicings of many chords found by ChordInventor.buildCatalogue"
+VoicingCatalogue.schemes.__doc__ = "(voicings x strings) array of frets from the bass string, -1 for a muted string"
+VoicingCatalogue.roots.__doc__ = "Pitch classes of the roots of the voicings"
+VoicingCatalogue.types.__doc__ = "Indices of the chord types of the voicings in chordTypes"
+VoicingCatalogue.chordTypes.__doc__ = "The chord types of the catalogue"
+
+
+class VoicingCatalogue(VoicingCatalogue):
+    def select(self, root: str, chordType):
+        """
+        Return the schemes of the chord's voicings
+        """
+        itype = self.chordTypes.index(chordType)
+        return self.schemes[(self.roots == pitchClass(root)) & (self.types == itype)]
+
 
-# An abandoned class
 class ChordInventor(object):
     """
     Figures out chord configurations given the instrument's tuning. Implements very little ergonomyy rules, so the
@@ -20,8 +46,20 @@ class ChordInventor(object):
     """
 
     def __init__(self, instrument=None):
-        # primitive way to filter possibly ergonomic chords
+        # primitive way to filter possibly ergonomic chords: all pressed frets lie within this many frets
         self.maxFingerStretch = 4
+        # Number of fingers pressing the strings. A barre on the lowest pressed fret takes one finger
+        self.maxFingers = 4
+        # If False, only the strings on the bass side may be muted, as in strummed chords
+        self.allowInnerMutes = False
+
+        # Weights of the ergonomic cost of a voicing (see voicingCost), per fret of the stretch, for a barre, per muted
+        # string, for a bass note other than the root and per fret of the highest pressed fret
+        self.stretchCost = 1.0
+        self.barreCost = 2.0
+        self.muteCost = 1.0
+        self.bassCost = 3.0
+        self.positionCost = 0.5
 
         self.instrument = None
         self.notes = None
@@ -34,12 +72,139 @@ class ChordInventor(object):
         self.instrument = instrument
         self.figureOutStrings()
 
-    def buildChords(self, root: str, chordType=None):
+    def buildChords(self, root: str, chordType=None, name=None):
+        """
+        Find all playable voicings of the chord on the instrument in its current tuning. A voicing contains every note
+        of the chord, presses the frets within maxFingerStretch with at most maxFingers fingers and mutes the strings
+        as allowed by allowInnerMutes. Returns a list of PackedChord with schemes running from the bass string to the
+        thinnest one, as in Instrument.defineChord. The chords are named root + the first annotation of the chord type
+        unless the name is given
+        """
+        if chordType is None:
+            chordType = ChordInterval.major
+        if name is None:
+            name = root + chordType.annotations[0]
+        search = _VoicingSearch(self, pitchClass(root), chordType)
+        search.run()
+        return [PackedChord.fromChord(Chord(name, scheme)) for scheme in search.schemes]
+
+    def bestChords(self, root: str, chordType=None, k=5, name=None):
+        """
+        Find the k best voicings of the chord, by voicingCost, with the same rules as buildChords. Returns a
+        list of PackedChord, the best one first. Only the k best voicings found so far are kept and the search skips the
+        branches that cannot do better than them, so the memory does not grow with the number of voicings
+        """
+        if chordType is None:
+            chordType = ChordInterval.major
+        if name is None:
+            name = root + chordType.annotations[0]
+        search = _BestVoicingSearch(self, pitchClass(root), chordType, k)
+        search.run()
+        return [PackedChord.fromChord(Chord(name, scheme)) for scheme in search.best()]
+
+    def voicingCost(self, scheme, root: str):
+        """
+        Return the ergonomic cost of a voicing of a chord with the given root: the lower, the better. The cost weights
+        the span of the pressed frets, a barre, the muted strings, a bass note other than the root and the position of
+        the voicing on the neck
+        """
+        rootfrets = list(reversed(self.instrument.rootfrets))
+        pressed = [f for f, rootfret in zip(scheme, rootfrets) if f is not None and f != rootfret]
+        return self._cost(scheme, rootfrets, min(pressed, default=None), max(pressed, default=None), pitchClass(root),
+                          len(pressed) > self.maxFingers)
+
+    def _cost(self, scheme, rootfrets, lowest, highest, root, barre):
+        """
+        Return the cost of the scheme, or its lower bound, if the scheme is incomplete. The bass note and the muted
+        strings are those of the strings in the scheme
+        """
+        cost = self.muteCost * scheme.count(None)
+        if lowest is not None:
+            cost += self.stretchCost * (highest - lowest) + self.positionCost * highest
+        if barre:
+            cost += self.barreCost
+        for i, f in enumerate(scheme):
+            if f is not None:
+                string = len(rootfrets) - i - 1
+                if self.instrument.getPitchClass(string, f) != root:
+                    cost += self.bassCost
+                break
+        return cost
+
+    def buildCatalogue(self, chordTypes=None):
+        """
+        Find the voicings of all roots of the chord types (default: all registered types) at once. The rules are the
+        same as in buildChords, but the frets are evaluated with array operations: every combination of muted, open
+        and pressed strings is enumerated once and matched against the masks of all chords in all windows of
+        maxFingerStretch frets at the same time, without a loop over the windows. Returns a VoicingCatalogue ordered by
+        chord type, root and the window of the voicing
+        """
+        if chordTypes is None:
+            chordTypes = ChordInterval.getAllChordTypes()
+        chordTypes = tuple(chordTypes)
+        chordMasks = np.zeros(1 << 12, dtype=bool)
+        for chordType in chordTypes:
+            for root in range(12):
+                chordMasks[chordMask(root, chordType)] = True
+
+        # In the order of the schemes
+        matrix = self.instrument.pitchClassMatrix()[::-1].astype(int)
+        rootfrets = np.array(self.instrument.rootfrets[::-1])
+        nfrets = self.instrument.nfrets
+        width = self.maxFingerStretch
+        strings = np.arange(len(rootfrets))
 
-        chords = []
+        # Every combination of the options of the strings: 0 - muted, 1 - open, 2... - pressed on the frets of a window
+        choices = np.indices((width + 2,) * len(rootfrets)).reshape(len(rootfrets), -1).T
+        muted = choices == 0
+        pressed = choices >= 2
+        anyPressed = pressed.any(axis=1)
+        allowedMutes = np.ones(len(choices), dtype=bool)
+        if not self.allowInnerMutes:
+            allowedMutes = (~muted[:, 1:] | muted[:, :-1]).all(axis=1)
 
-        for fret in range(0, self.instrument.nfrets - self.maxFingerStretch):
-            pass
+        # Frets, validity and pitch class bits of the options of every string in every window: windows x strings x
+        # options. The windows start on the frets 1 to nfrets
+        bases = np.arange(1, nfrets + 1)
+        frets = np.empty((nfrets, len(rootfrets), width + 2), dtype=int)
+        frets[:, :, 0] = -1
+        frets[:, :, 1] = rootfrets
+        frets[:, :, 2:] = bases.reshape(-1, 1, 1) + np.arange(width)
+        valid = np.ones(frets.shape, dtype=bool)
+        valid[:, :, 2:] = (frets[:, :, 2:] > rootfrets.reshape(-1, 1)) & (frets[:, :, 2:] <= nfrets)
+        bits = np.where(valid, 1 << matrix[strings.reshape(-1, 1), np.clip(frets, 0, nfrets)], 0).astype(np.uint16)
+        bits[:, :, 0] = 0
+
+        # Windows x combinations
+        keep = allowedMutes & valid[:, strings, choices].all(axis=2)
+        mask = np.bitwise_or.reduce(bits[:, strings, choices], axis=2)
+        keep &= chordMasks[mask]
+        window, combination = np.nonzero(keep)
+        f = frets[window.reshape(-1, 1), strings, choices[combination]]
+        p = pressed[combination]
+        # Every voicing belongs to the window starting on its lowest pressed fret. The voicings without pressed
+        # frets belong to the first window
+        lowest = np.where(p, f, nfrets + 1).min(axis=1)
+        inWindow = np.where(anyPressed[combination], lowest == bases[window], window == 0)
+        nPressed = p.sum(axis=1)
+        onLowest = (p & (f == lowest.reshape(-1, 1))).sum(axis=1)
+        fingers = np.where(onLowest > 1, 1 + nPressed - onLowest, nPressed)
+        ok = inWindow & (fingers <= self.maxFingers)
+        schemes = f[ok].astype(np.int8)
+        masks = mask[window[ok], combination[ok]]
+        order = np.argsort(masks, kind="stable")
+        masks = masks[order]
+
+        selected, roots, types = [], [], []
+        for itype, chordType in enumerate(chordTypes):
+            for root in range(12):
+                m = chordMask(root, chordType)
+                rows = order[np.searchsorted(masks, m, "left"):np.searchsorted(masks, m, "right")]
+                selected.append(rows)
+                roots.append(np.full(len(rows), root, dtype=np.int8))
+                types.append(np.full(len(rows), itype, dtype=np.int16))
+        return VoicingCatalogue(schemes[np.concatenate(selected)], np.concatenate(roots), np.concatenate(types),
+                                chordTypes)
 
     def figureOutStrings(self):
         """
@@ -62,3 +227,128 @@ class ChordInventor(object):
             for i in range(self.instrument.nfrets - self.instrument.rootfrets[i] + 1):
                 notes_on_string.append(notes[baseNoteIndex + i])
             self.notes.append(notes_on_string)
+
+
+class _VoicingSearch(object):
+    """
+    Depth-first search of the voicings of a chord, see ChordInventor.buildChords
+    """
+    # Whether prune must be called. Saves the calls in the search of all voicings
+    pruning = False
+
+    def __init__(self, inventor, root, chordType):
+        self.inventor = inventor
+        self.allowInnerMutes = inventor.allowInnerMutes
+        self.maxFingerStretch = inventor.maxFingerStretch
+        self.maxFingers = inventor.maxFingers
+        self.root = root
+        self.required = chordMask(root, chordType)
+        self.scheme = []  # Frets chosen on the strings searched so far
+        self.schemes = []
+
+        # The candidates of every string, in the order of the schemes: the pitch class of the open string (None if it
+        # is not a chord note), the pressed frets and their pitch classes. The root fret of a string (usually 0) is
+        # played open and is not pressed
+        self.rootfrets = list(reversed(inventor.instrument.rootfrets))
+        self.candidates = []
+        for row, rootfret in zip(reversed(inventor.instrument.pitchClassMatrix().tolist()), self.rootfrets):
+            pressed = [(f, pc) for f, pc in enumerate(row) if f > rootfret and self.required >> pc & 1]
+            self.candidates.append((row[rootfret] if self.required >> row[rootfret] & 1 else None,
+                                    [f for f, _ in pressed], [pc for _, pc in pressed]))
+
+    def run(self, covered=0, lowest=None, highest=None):
+        """
+        Search the voicings beginning with the current scheme. Covered is the mask of its notes, lowest and highest
+        are its pressed frets (or None)
+        """
+        scheme = self.scheme
+        i = len(scheme)
+        if i == len(self.candidates):
+            if covered == self.required:
+                fingers = self.fingersNeeded(lowest)
+                if fingers <= self.maxFingers:
+                    self.found(lowest, highest, fingers)
+            return
+        # Prune if the remaining strings cannot supply the missing notes
+        if POPCOUNT[self.required & ~covered] > len(self.candidates) - i:
+            return
+        if self.pruning and self.prune(lowest, highest):
+            return
+
+        if self.allowInnerMutes or covered == 0:
+            scheme.append(None)
+            self.run(covered, lowest, highest)
+            scheme.pop()
+
+        openPc, frets, pitchClasses = self.candidates[i]
+        if openPc is not None:
+            scheme.append(self.rootfrets[i])
+            self.run(covered | 1 << openPc, lowest, highest)
+            scheme.pop()
+
+        # Only the frets within maxFingerStretch of the frets pressed so far
+        if lowest is None:
+            start, stop = 0, len(frets)
+        else:
+            start = bisect_left(frets, highest - self.maxFingerStretch + 1)
+            stop = bisect_right(frets, lowest + self.maxFingerStretch - 1)
+        for j in range(start, stop):
+            f = frets[j]
+            scheme.append(f)
+            self.run(covered | 1 << pitchClasses[j], f if lowest is None or f < lowest else lowest,
+                     f if highest is None or f > highest else highest)
+            scheme.pop()
+
+    def fingersNeeded(self, lowest):
+        """
+        Return the number of fingers pressing the frets of the scheme, using a barre on the lowest fret if more than
+        one string is pressed there
+        """
+        pressed = [f for f, rootfret in zip(self.scheme, self.rootfrets) if f is not None and f != rootfret]
+        onLowest = pressed.count(lowest)
+        if onLowest > 1:
+            return 1 + len(pressed) - onLowest
+        return len(pressed)
+
+    def prune(self, lowest, highest):
+        """Return True to skip the voicings beginning with the current scheme"""
+        return False
+
+    def found(self, lowest, highest, fingers):
+        """Called with every voicing found, the current scheme"""
+        self.schemes.append(tuple(self.scheme))
+
+
+class _BestVoicingSearch(_VoicingSearch):
+    """
+    Search of the k voicings of a chord with the lowest cost, see ChordInventor.bestChords
+    """
+    pruning = True
+
+    def __init__(self, inventor, root, chordType, k):
+        super().__init__(inventor, root, chordType)
+        self.k = k
+        # Max-heap of the best voicings: (-cost, -number, scheme). Of voicings with equal costs, the first found wins
+        self.heap = []
+        self.count = 0
+
+    def prune(self, lowest, highest):
+        # The cost of the scheme can only grow with more strings, except for the barre and the bass note, which are
+        # not counted until they are known
+        return len(self.heap) == self.k and self.inventor._cost(self.scheme, self.rootfrets, lowest, highest,
+                                                                self.root, False) >= -self.heap[0][0]
+
+    def found(self, lowest, highest, fingers):
+        pressed = sum(1 for f, rootfret in zip(self.scheme, self.rootfrets) if f is not None and f != rootfret)
+        cost = self.inventor._cost(self.scheme, self.rootfrets, lowest, highest, self.root,
+                                   pressed > self.maxFingers)
+        self.count += 1
+        item = (-cost, -self.count, tuple(self.scheme))
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, item)
+        elif item > self.heap[0]:
+            heapq.heapreplace(self.heap, item)
+
+    def best(self):
+        """Return the schemes of the best voicings, the best one first"""
+        return [scheme for _, _, scheme in sorted(self.heap, reverse=True)]
@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+__all__ = ['ChordLibrary']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import base64
+from functools import lru_cache
+
+import numpy as np
+
+from chord import Chord, PackedChord, parseChordName, transposeChordName
+from music_theory import CHORD_TYPES, NOTE_TOKENre, pitchClass
+
+# Codes of the items of the schemes in the columns of a library, see toColumns
+_MUTED = -1  # The fret of a muted string
+_ABSENT = -2  # Fret and finger past the end of a scheme shorter than the others
+_PLAIN = -1  # The finger of an item that is just a fret
+_NO_FINGER = -3  # The finger of a (fret, None) item
+
+
+def _encode(array):
+    return base64.b64encode(array.tobytes()).decode('ascii')
+
+
+def _decode(text, dtype):
+    return np.frombuffer(base64.b64decode(text), dtype=dtype)
+
+
+class ChordLibrary(object):
+    """
+    Chords of an instrument, kept in the order in which they were added, without duplicates and indexed by their name,
+    root (pitch class), chord type (name), prefix and lowest pressed fret. Adding a chord costs only the check for
+    duplicates, the chords are indexed when they are looked up for the first time.
+
+    The library can be used as the list of chords it used to be: it can be iterated, indexed, appended to and tested
+    for membership, the latter in constant time. A frozen library (see freeze) can be shared by many instruments.
+
+    A library can be saved in a compact columnar form and loaded from it lazily, see toColumns and fromColumns
+    """
+
+    def __init__(self, chords=()):
+        self._chords = []
+        self._keys = {}  # (name, root, chord type name, prefix, lowest fret) of the chords, None until indexed
+        # Lists of chords in the order of _chords, keyed by what they are indexed by, in the order of the keys
+        self._indexes = ({}, {}, {}, {}, {})
+        self._indexed = 0  # Number of the chords in _chords that are indexed
+        self.frozen = False
+        self._columns = None  # Columns of the chords not loaded yet, see fromColumns
+        self.extend(chords)
+
+    @staticmethod
+    def fromColumns(columns):
+        """
+        Return a library of the chords saved by toColumns. The chords are decoded only when the library is used for the
+        first time, so loading a library of thousands of voicings costs next to nothing until they are needed
+        """
+        library = ChordLibrary()
+        library._columns = columns
+        return library
+
+    def _load(self):
+        """Decode the chords of the columns given to fromColumns"""
+        columns, self._columns = self._columns, None
+        count, width = columns["count"], columns["width"]
+        frets = _decode(columns["frets"], np.int8).reshape(count, width)
+        items = frets.astype(object)
+        items[frets == _MUTED] = None
+        if "fingers" in columns:
+            fingers = _decode(columns["fingers"], np.int8).reshape(count, width)
+            for i, j in zip(*np.nonzero((fingers >= 0) | (fingers == _NO_FINGER))):
+                items[i, j] = (int(frets[i, j]), None if fingers[i, j] == _NO_FINGER else int(fingers[i, j]))
+        lengths = (frets != _ABSENT).sum(axis=1).tolist()
+        schemes = [tuple(row[:n]) for row, n in zip(items.tolist(), lengths)]
+        tables = [[columns[table][i] for i in _decode(columns[key], "<u2").tolist()]
+                  for table, key in (("names", "name"), ("prefixes", "prefix"), ("suffixes", "suffix"))]
+        # Every method loads the chords before using the library, so it is empty yet
+        self._keys = dict.fromkeys(map(Chord, tables[0], schemes, tables[1], tables[2]))
+        self._chords = list(self._keys)
+
+    def toColumns(self):
+        """
+        Return the chords in a compact, JSON-serializable columnar form: the frets and the fingers of all chords as
+        (chords x strings) arrays of bytes and the indices of their names, prefixes and suffixes in tables of the
+        distinct ones. The arrays are base64-encoded
+        """
+        if self._columns is not None:  # Not decoded, so not changed either
+            return self._columns
+        chords = list(self)
+        frets, fingers = self._schemeArrays()
+        columns = {"count": len(chords), "width": frets.shape[1], "frets": _encode(frets)}
+        if (fingers >= 0).any() or (fingers == _NO_FINGER).any():
+            columns["fingers"] = _encode(fingers)
+        for table, key, values in (("names", "name", [chord.name for chord in chords]),
+                                   ("prefixes", "prefix", [chord.prefix for chord in chords]),
+                                   ("suffixes", "suffix", [chord.suffix for chord in chords])):
+            distinct = list(dict.fromkeys(values))
+            positions = {value: i for i, value in enumerate(distinct)}
+            columns[table] = distinct
+            columns[key] = _encode(np.array([positions[value] for value in values], dtype="<u2"))
+        return columns
+
+    def _schemeArrays(self):
+        """Return the (chords x strings) arrays of the frets and the fingers of the chords, see toColumns"""
+        width = max((len(chord.scheme) for chord in self._chords), default=0)
+        frets = np.full((len(self._chords), width), _ABSENT, dtype=np.int8)
+        fingers = np.full((len(self._chords), width), _ABSENT, dtype=np.int8)
+        for i, chord in enumerate(self._chords):
+            for j, item in enumerate(chord.scheme):
+                if item is None:
+                    frets[i, j], fingers[i, j] = _MUTED, _PLAIN
+                elif isinstance(item, int):
+                    frets[i, j], fingers[i, j] = item, _PLAIN
+                else:
+                    frets[i, j], fingers[i, j] = item[0], _NO_FINGER if item[1] is None else item[1]
+        return frets, fingers
+
+    def fretArray(self):
+        """
+        Return the frets of the chords as a (chords x strings) integer array, the bass string first, as in the schemes.
+        Muted strings are -1, the items past the end of a scheme shorter than the others are -2
+        """
+        if self._columns is not None:
+            return _decode(self._columns["frets"], np.int8).reshape(self._columns["count"], self._columns["width"])
+        return self._schemeArrays()[0]
+
+    def transposed(self, semitones):
+        """
+        Return a library of the same schemes with the roots of the names moved by the semitones (see
+        transposeChordName), as they sound e.g. with a capo. The names are replaced in the columns of the library, so
+        that the chords are decoded only when used. The new library is frozen if this one is
+        """
+        columns = dict(self.toColumns())
+        names = [transposeChordName(name, semitones) for name in columns["names"]]
+        if len(set(names)) == len(names):
+            columns["names"] = names
+            library = ChordLibrary.fromColumns(columns)
+        else:  # Names of the same chord in both conventions became equal, so the chords must be checked for duplicates
+            library = ChordLibrary(Chord(transposeChordName(chord.name, semitones), chord.scheme, chord.prefix,
+                                         chord.suffix) for chord in self)
+        library.frozen = self.frozen
+        return library
+
+    def add(self, chord: Chord):
+        """
+        Add the chord, unless an equal one is already in the library. Return True if it was added
+        """
+        if self._columns is not None:
+            self._load()
+        if self.frozen:
+            raise ValueError("Cannot add {} to a frozen chord library".format(chord.name))
+        if isinstance(chord, PackedChord):
+            chord = chord.toChord()
+        elif not isinstance(chord.scheme, tuple):
+            chord = Chord(chord.name, tuple(chord.scheme), chord.prefix, chord.suffix)
+        if chord in self._keys:
+            return False
+        self._keys[chord] = None
+        self._chords.append(chord)
+        return True
+
+    def freeze(self):
+        """
+        Forbid adding chords, so that the library can be shared
+        """
+        self.frozen = True
+        return self
+
+    def _index(self):
+        """Index the chords added since the last lookup"""
+        if self._columns is not None:
+            self._load()
+        for chord in self._chords[self._indexed:]:
+            root, chordType = ChordLibrary.rootAndType(chord.name)
+            keys = (chord.name, root, None if chordType is None else chordType.name, chord.prefix,
+                    ChordLibrary.lowestFret(chord))
+            self._keys[chord] = keys
+            for index, key in zip(self._indexes, keys):
+                if key is not None:
+                    index.setdefault(key, []).append(chord)
+        self._indexed = len(self._chords)
+
+    def append(self, chord: Chord):
+        """Add the chord as to a list. See add"""
+        self.add(chord)
+
+    def extend(self, chords):
+        for chord in chords:
+            self.add(chord)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def rootAndType(name):
+        """
+        Return the root (pitch class) and the ChordType of the chord name. Either is None if it cannot be determined.
+        Names that follow neither naming convention (see parseChordName) are read as the root followed by an
+        annotation of the chord type, as ChordInventor names the chords, e.g. "CM7"
+        """
+        try:
+            root, minor, suffix = parseChordName(name)
+            return pitchClass(root), CHORD_TYPES.getByAnnotation(("m" if minor else "") + suffix)
+        except ValueError:
+            pass
+        match = NOTE_TOKENre.match(name)
+        if match is None:
+            return None, None
+        return pitchClass(match.group()), CHORD_TYPES.getByAnnotation(name[match.end():])
+
+    @staticmethod
+    def lowestFret(chord: Chord):
+        """
+        Return the lowest pressed fret of the chord, or 0, if no fret is pressed
+        """
+        frets = [c if isinstance(c, int) else c[0] for c in chord.scheme if c is not None]
+        return min((f for f in frets if f > 0), default=0)
+
+    def find(self, name=None, root=None, chordType=None, prefix=None, lowestFret=None):
+        """
+        Return the list of chords matching all given criteria, in the order in which they were added. The root is
+        given by its name or pitch class, the chord type by a ChordType or its name
+        """
+        if isinstance(root, str):
+            root = pitchClass(root)
+        if chordType is not None and not isinstance(chordType, str):
+            chordType = chordType.name
+        self._index()
+        selection = [(i, key) for i, key in enumerate((name, root, chordType, prefix, lowestFret)) if key is not None]
+        if not selection:
+            return list(self._chords)
+        # Filter the shortest list of candidates by the other criteria, keeping its order
+        candidates = min((self._indexes[i].get(key, []) for i, key in selection), key=len)
+        return [chord for chord in candidates if all(self._keys[chord][i] == key for i, key in selection)]
+
+    def __iter__(self):
+        if self._columns is not None:
+            self._load()
+        return iter(self._chords)
+
+    def __len__(self):
+        if self._columns is not None:
+            return self._columns["count"]
+        return len(self._chords)
+
+    def __getitem__(self, item):
+        if self._columns is not None:
+            self._load()
+        return self._chords[item]
+
+    def __contains__(self, chord):
+        if self._columns is not None:
+            self._load()
+        try:
+            return chord in self._keys
+        except TypeError:  # Unhashable scheme
+            return chord in self._chords
+
+    def __repr__(self):
+        if self._columns is not None:
+            self._load()
+        return "ChordLibrary({!r})".format(self._chords)
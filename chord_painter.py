@@ -9,15 +9,20 @@ __all__ = ['ChordPainter']
 __date__ = '2021-10-12'
 __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 
-from PyQt5.QtCore import Qt, QSize, QPoint, QRect
-from PyQt5.QtGui import QColor, QPainter, QPixmap, QBrush, QImage, QFontMetrics
+from PyQt5.QtCore import Qt, QSize, QPoint, QRect, QRectF
+from PyQt5.QtGui import QColor, QPainter, QPixmap, QBrush, QImage, QFontMetrics, QFont
 
-from chord import Chord
+from chord import Chord, PackedChord
+from svg_document import SvgDocument
+from utils import savePng
 
 
 class ChordPainter(object):
     """
     The class actually responsible for painting the chord scheme and saving image files from them
+
+    The painter paints into an offscreen QImage, so it can be used in any thread and without a display, as long as
+    a QGuiApplication exists. Painting must be enclosed between begin() and end(), or done in a "with" block
     """
 
     def __init__(self, chord=None, size=None, instrument=None):
@@ -32,10 +37,10 @@ class ChordPainter(object):
         # Use only a part of the available space to draw the fretboard: leave some margins for open/mute string marks
         # and for fret numbering, if the diagram does not start at fret 0
 
-        offset_w = int(-rightMargin * float(self.pixmap.width()))
-        offset_h = int(topMargin * float(self.pixmap.height()))
-        self.fretBoard = self.pixmap.rect().adjusted(0, offset_h,
-                                                     offset_w, 0)
+        offset_w = int(-rightMargin * float(self.image.width()))
+        offset_h = int(topMargin * float(self.image.height()))
+        self.fretBoard = self.image.rect().adjusted(0, offset_h,
+                                                    offset_w, 0)
 
         self.nfrets = 5  # number of frets visible
 
@@ -55,7 +60,7 @@ class ChordPainter(object):
         """
         Set the chord scheme
         """
-        assert isinstance(chord, Chord)
+        assert isinstance(chord, (Chord, PackedChord))
         self.chord = chord
 
     def setSize(self, size: QSize):
@@ -64,13 +69,39 @@ class ChordPainter(object):
         """
         if size is None:
             return
-        self.pixmap = QPixmap(size)
-        self.pixmap.fill(QColor(Qt.white))
-        self.p.begin(self.pixmap)
-        self.p.setRenderHint(QPainter.Antialiasing)
+        self.image = QImage(size, QImage.Format_RGB32)
+        self.image.fill(QColor(Qt.white))
 
     def size(self):
-        return self.pixmap.size()
+        return self.image.size()
+
+    def begin(self):
+        """Start painting into the image"""
+        self.p.begin(self.image)
+        self.p.setRenderHint(QPainter.Antialiasing)
+
+    def end(self):
+        """Finish painting. The image can only be used after that"""
+        self.p.end()
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end()
+
+    @property
+    def pixmap(self):
+        """The painted image as a pixmap. Can only be used in the GUI thread"""
+        return QPixmap.fromImage(self.image)
+
+    def save(self, filename, indexed=False, compression=-1):
+        """
+        Save the painted image as PNG without metadata, optionally with an 8-bit palette and given compression level
+        (see utils.encodePng). Return the size of the file in bytes
+        """
+        return savePng(self.image, filename, indexed, compression)
 
     def drawEmpty(self):
         """
@@ -93,6 +124,70 @@ class ChordPainter(object):
             else:
                 self.symbols.drawFinger(i, fret, self.chord.finger(i))
 
+    def toSvg(self, idPrefix=""):
+        """
+        Return the whole chord diagram (as drawn by drawEmpty() and drawChord()) as SVG markup.
+        Does not need painting
+        """
+        svg = SvgDocument(self.image.width(), self.image.height(), idPrefix)
+        svg.fill("#fff")
+        black = self.frets.color.name()
+        left = self.pos_string[0]
+        right = self.pos_string[-1]
+
+        # Frets, the 0th fret or the number of the first fret visible
+        for f in self.pos_fret:
+            svg.line(left, f, right, f, self.frets.fret_line_width, black)
+        if self.frets.updateFirstFretVisible():
+            svg.line(left, self.fretBoard.top(), right, self.fretBoard.top(), self.frets.bar_zero_width, black)
+        else:
+            rom = int_to_roman(self.firstFretVisible)
+            rect, font = self.frets.fretNumberGeometry()
+            rotate = QFontMetrics(font, self.image).boundingRect(rom).width() > rect.width()
+            svg.text(rect.left() + rect.height() / 2, QRectF(rect).center().y(), rom, font.pixelSize(), black,
+                     rotate=-90 if rotate else None, family=font.family())
+
+        if self.instrument is not None:
+            for dotFret in self.instrument.dotsOnFrets:
+                rect = self.frets.dotRect(dotFret)
+                if rect is not None:
+                    rect = QRectF(rect)
+                    svg.ellipse(rect.center().x(), rect.center().y(), rect.width() / 2, rect.height() / 2,
+                                self.frets.dotColor.name())
+
+        for sp in self.pos_string:
+            svg.line(sp, self.fretBoard.top(), sp, self.fretBoard.bottom(), self.strings.string_thickness,
+                     self.strings.color.name())
+
+        # The chord itself. The symbols are defined once and placed on each string
+        symbols = self.symbols
+        color = symbols.color.name()
+        for i in range(len(self.chord.scheme)):
+            fret = self.chord.fret(i)
+            if not isinstance(fret, int) or fret < 0 or fret == 0:
+                rect = QRectF(symbols._getMarkerRect(i, symbols.margin))
+                r = rect.width() / 2
+                if fret == 0:
+                    markup = '<circle r="{:g}" fill="none" stroke="{}" stroke-width="{}"/>'.format(
+                        r, color, symbols.lineWidth)
+                else:
+                    markup = '<path d="M{0:g} {0:g}L{1:g} {1:g}M{1:g} {0:g}L{0:g} {1:g}" stroke="{2}" ' \
+                             'stroke-width="{3}"/>'.format(-r, r, color, symbols.lineWidth)
+                symbolId = svg.define(("open" if fret == 0 else "mute", r), '<g id="{id}">' + markup + '</g>')
+            else:
+                rect = QRectF(symbols.fingerRect(i, fret))
+                r = rect.width() / 2
+                finger = self.chord.finger(i)
+                markup = '<circle r="{:g}" fill="{}"/>'.format(r, color)
+                if finger is not None and symbols.drawFingerNumbers:
+                    markup += SvgDocument.textMarkup(0, 0, str(finger), rect.height() * 0.8,
+                                                     symbols.fingerNumberColor.name())
+                else:
+                    finger = None
+                symbolId = svg.define(("finger", r, finger), '<g id="{id}">' + markup + '</g>')
+            svg.use(symbolId, rect.center().x(), rect.center().y())
+        return svg.toString()
+
 
 class AbstractPainter(object):
     def __init__(self, parent: ChordPainter):
@@ -101,7 +196,7 @@ class AbstractPainter(object):
         self.nfrets = parent.nfrets
         self.fretBoard = parent.fretBoard
         self.p = parent.p
-        self.pixmap = self.p.device()
+        self.image = parent.image
         self.size = None
         self.color = None
 
@@ -167,11 +262,27 @@ class FretPainter(AbstractPainter):
 
         # If the zeroth fret is visible on the diagram (i.e the diagram does not start from, for example, fret III,
         # draw the bar
+        if self.updateFirstFretVisible():
+            # Draw the 0th fret
+            pen = self.p.pen()
+            pen.setWidth(self.bar_zero_width)
+            pen.setStyle(Qt.SolidLine)
+            pen.setColor(self.color)
+            self.p.setPen(pen)
+            self.p.drawLine(self.parent.pos_string[0], self.fretBoard.top(),
+                            self.parent.pos_string[-1], self.fretBoard.top())
+
+    def updateFirstFretVisible(self):
+        """
+        Determine the first fret visible on the diagram. Return True if the diagram starts at the 0th fret
+        """
         frets_used = []
         for string in range(len(self.chord.scheme)):
-            frets_used.append(self.chord.fret(string))
+            fret = self.chord.fret(string)
+            if fret is not None:
+                frets_used.append(fret)
 
-        fret_max = max(frets_used)
+        fret_max = max(frets_used, default=0)
         fret_min = fret_max
         for fret in frets_used:
             if fret > 0 and fret < fret_min:
@@ -184,25 +295,14 @@ class FretPainter(AbstractPainter):
 
         if fret_max <= self.nfrets:
             self.parent.firstFretVisible = 0
-            # Draw the 0th fret
-            pen = self.p.pen()
-            pen.setWidth(self.bar_zero_width)
-            pen.setStyle(Qt.SolidLine)
-            pen.setColor(self.color)
-            self.p.setPen(pen)
-            self.p.drawLine(self.parent.pos_string[0], self.fretBoard.top(),
-                            self.parent.pos_string[-1], self.fretBoard.top())
-        else:
-            self.parent.firstFretVisible = fret_min - 1
+            return True
+        self.parent.firstFretVisible = fret_min - 1
+        return False
 
     def drawDot(self, fret):
-        radius = int(self.dotSize * self.parent.pos_string[0])
-
-        center = self.fretRect(fret).center()
-        if not self.fretBoard.contains(center):
+        rect = self.dotRect(fret)
+        if rect is None:
             return
-        topLeft = center - QPoint(radius, radius)
-        bottomRight = center + QPoint(radius, radius)
 
         pen = self.p.pen()
         brush = QBrush(Qt.SolidPattern)
@@ -212,7 +312,20 @@ class FretPainter(AbstractPainter):
         self.p.setBrush(brush)
         self.p.setPen(pen)
 
-        self.p.drawEllipse(QRect(topLeft, bottomRight))
+        self.p.drawEllipse(rect)
+
+    def dotRect(self, fret):
+        """
+        Return the rectangle of the dot marking the fret, or None if the fret is not visible
+        """
+        radius = int(self.dotSize * self.parent.pos_string[0])
+
+        center = self.fretRect(fret).center()
+        if not self.fretBoard.contains(center):
+            return None
+        topLeft = center - QPoint(radius, radius)
+        bottomRight = center + QPoint(radius, radius)
+        return QRect(topLeft, bottomRight)
 
     def drawFretNumber(self):
         if self.parent.firstFretVisible == 0:
@@ -224,20 +337,10 @@ class FretPainter(AbstractPainter):
         pen.setColor(self.color)
         self.p.setPen(pen)
 
-        topLeft = self.fretBoard.topRight()
-        width = self.pixmap.rect().right() - topLeft.x()
-        height = width
-        bottomRight = QPoint(self.pixmap.rect().right(), topLeft.y() + height)
-
-        rect = QRect(topLeft, bottomRight)
-        rect.moveTo(topLeft - QPoint(0, height / 2))
-
-        font = self.p.font()
-        font.setFamily("Times New Roman")
-        font.setPixelSize(rect.height() * 0.8)
+        rect, font = self.fretNumberGeometry()
         self.p.setFont(font)
 
-        m = QFontMetrics(font, self.pixmap)
+        m = QFontMetrics(font, self.image)
         bw = m.boundingRect(rom).width()
         need_rotate = bw > rect.width()
         if need_rotate:
@@ -248,13 +351,30 @@ class FretPainter(AbstractPainter):
             h = rect.height()
             new_x = -y
             new_y = x
-            rect = QRect(new_x - bw / 2, new_y, bw, h)
+            rect = QRect(int(new_x - bw / 2), new_y, bw, h)
 
         self.p.drawText(rect, Qt.AlignCenter, rom)
         if need_rotate:
             self.p.rotate(90)
             self.p.restore()
 
+    def fretNumberGeometry(self):
+        """
+        Return the rectangle in which the number of the first visible fret is written and the font to write it
+        """
+        topLeft = self.fretBoard.topRight()
+        width = self.image.rect().right() - topLeft.x()
+        height = width
+        bottomRight = QPoint(self.image.rect().right(), topLeft.y() + height)
+
+        rect = QRect(topLeft, bottomRight)
+        rect.moveTo(topLeft - QPoint(0, int(height / 2)))
+
+        font = self.p.font() if self.p.isActive() else QFont()
+        font.setFamily("Times New Roman")
+        font.setPixelSize(int(rect.height() * 0.8))
+        return rect, font
+
 
 class SymbolPainter(AbstractPainter):
     def __init__(self, parent):
@@ -267,12 +387,7 @@ class SymbolPainter(AbstractPainter):
         self.fingerOnFretWidth = 0.7  # Percentage of the where the finger marker should be painted
 
     def drawFinger(self, istring, fret, finger=None):
-        fret = self.fretRect(fret)
-
-        symbolCenter = QPoint(self.parent.pos_string[istring],
-                              fret.top() + self.fingerOnFretWidth * fret.height())
-        topLeft = symbolCenter - QPoint(0.5 * self.stringOffset(), 0.5 * self.stringOffset())
-        bottomRight = symbolCenter + QPoint(0.5 * self.stringOffset(), 0.5 * self.stringOffset())
+        rect = self.fingerRect(istring, fret)
 
         pen = self.p.pen()
         pen.setStyle(Qt.NoPen)
@@ -282,7 +397,6 @@ class SymbolPainter(AbstractPainter):
 
         self.p.setBrush(brush)
         self.p.setPen(pen)
-        rect = QRect(topLeft, bottomRight).adjusted(1, 1, -1, -1)
         self.p.drawEllipse(rect)
 
         if finger is None or not self.drawFingerNumbers:
@@ -294,7 +408,7 @@ class SymbolPainter(AbstractPainter):
         pen.setBrush(brush)
         pen.setColor(brush.color())
         font = self.p.font()
-        font.setPixelSize(rect.height() * 0.8)
+        font.setPixelSize(int(rect.height() * 0.8))
 
         self.p.setFont(font)
         self.p.setPen(pen)
@@ -302,6 +416,20 @@ class SymbolPainter(AbstractPainter):
 
         self.p.drawText(rect, Qt.AlignCenter, str(finger))
 
+    def fingerRect(self, istring, fret):
+        """
+        Return the rectangle of the marker of the finger pressing the string on the fret
+        """
+        fret = self.fretRect(fret)
+
+        # The positions are truncated, as Qt used to do implicitly
+        symbolCenter = QPoint(int(self.parent.pos_string[istring]),
+                              int(fret.top() + self.fingerOnFretWidth * fret.height()))
+        half = int(0.5 * self.stringOffset())
+        topLeft = symbolCenter - QPoint(half, half)
+        bottomRight = symbolCenter + QPoint(half, half)
+        return QRect(topLeft, bottomRight).adjusted(1, 1, -1, -1)
+
     def drawOpenString(self, istring):
         pen = self.p.pen()
         brush = QBrush(Qt.NoBrush)
@@ -330,7 +458,7 @@ class SymbolPainter(AbstractPainter):
 
     def _getMarkerRect(self, istring, margin):
         markerSize = int(0.8 * self.stringOffset())
-        bottomRight = QPoint(self.parent.pos_string[istring] + markerSize / 2,
+        bottomRight = QPoint(int(self.parent.pos_string[istring] + markerSize / 2),
                              self.fretBoard.top() - margin)
 
         topLeft = bottomRight - QPoint(markerSize, markerSize)
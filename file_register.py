@@ -10,6 +10,7 @@ __date__ = '2021-10-22'
 __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 
 import hashlib
+import json
 import os
 
 
@@ -22,13 +23,24 @@ class FileRegister(object):
 
     This allows overwriting older versions of files repeatedly created by the process, but choosing unique names
     for files created in the process
+
+    If a manifest file is given, the register also remembers across processes, from which inputs each file was built.
+    This allows skipping files whose inputs have not changed since the last run
     """
     md5 = hashlib.md5()
 
-    def __init__(self, suffix_index=1):
+    def __init__(self, suffix_index=1, manifest=None):
         self.files = {}
         self.suffix = suffix_index
 
+        self.manifest = manifest
+        self.inputs = {}  # Hashes of inputs of the files, keyed by the normalized file name
+        self.rebuilt = 0  # Number of files built (or rebuilt) in this process
+        self.upToDate = 0  # Number of files found up to date in this process
+        self.forced = False  # If True, no file is considered up to date, but the recorded hashes are kept
+        if manifest is not None and os.path.isfile(manifest):
+            self.load()
+
     def getUniqueName(self, filename):
         """
         Returns name that does not collide with ones already created in the process
@@ -65,3 +77,42 @@ class FileRegister(object):
         if not os.path.isfile(file):
             return False
         return file in self.files
+
+    @staticmethod
+    def inputsHash(*inputs):
+        """
+        Return a hash of the inputs from which a file is built. The inputs must be serializable to JSON
+        """
+        data = json.dumps(inputs, sort_keys=True).encode('utf-8')
+        return hashlib.sha1(data).hexdigest()
+
+    def isUpToDate(self, file, inputsHash):
+        """
+        Check if the file exists and was built from the inputs with the given hash
+        """
+        if self.forced or not os.path.isfile(file):
+            return False
+        return self.inputs.get(os.path.normpath(file)) == inputsHash
+
+    def record(self, file, inputsHash):
+        """
+        Remember the hash of the inputs from which the file has just been built
+        """
+        self.inputs[os.path.normpath(file)] = inputsHash
+        self.rebuilt += 1
+
+    def load(self):
+        """
+        Read the input hashes from the manifest file
+        """
+        with open(self.manifest, 'r') as f:
+            self.inputs = json.load(f)
+
+    def save(self):
+        """
+        Write the input hashes to the manifest file
+        """
+        if self.manifest is None:
+            return
+        with open(self.manifest, 'w') as f:
+            f.write(json.dumps(self.inputs, indent=2, sort_keys=True))
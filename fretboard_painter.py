@@ -9,30 +9,52 @@ __all__ = ['FretboardPainter']
 __date__ = '2021-12-04'
 __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 
-from PyQt5.QtCore import Qt, QSize, QPoint, QRect, QMargins
-from PyQt5.QtGui import QPixmap, QColor, QPainter, QBrush
+import numpy as np
+from PyQt5.QtCore import Qt, QSize, QPoint, QRect, QRectF, QMargins
+from PyQt5.QtGui import QPixmap, QColor, QPainter, QBrush, QImage
 
-from music_theory import NOTES
-from utils import square
+from music_theory import NOTES, PITCH_CLASSES, pitchClass, pitchClassMask
+from svg_document import SvgDocument
+from utils import square, savePng
+
+# Version of the painted output. Increase it whenever a change in the painter changes the look of the images, so that
+# images built by an older version are not considered up to date
+PAINTER_VERSION = 1
 
 
 class FretboardPainter(object):
     """
     An object drawing the image of the whole fretboard of a string instrument. It can also mark notes belonging to a
     selected chord
+
+    In the layered mode, the fretboard with all notes unmarked is painted only once for given instrument, tuning and
+    size and cached. The image of a chord is then made by copying that base layer and marking only the chord notes
+
+    The painter paints into an offscreen QImage, so it can be used in any thread and without a display, as long as
+    a QGuiApplication exists. Painting must be enclosed between begin() and end(), or done in a "with" block:
+
+        with FretboardPainter(size, instrument) as painter:
+            painter.draw()
+        painter.image.save(filename)
     """
 
-    def __init__(self, size, instrument):
+    # Base layers of the layered mode, keyed by everything they are painted from
+    _baseLayers = {}
+
+    def __init__(self, size, instrument, layered=False):
         self.instrument = instrument
+        self.layered = layered
         self.offsets = None
 
         self.evenFretWidth = True
 
         self.chordNotes = []
+        self.chordRoot = None  # Pitch class of the root note of the chord
+        self.chordMask = 0  # Mask of the pitch classes of the chord
 
         self.p = QPainter()
         self.fretBoardRect = QRect()  # Rectangle of the fretboard itself (smaller than the viewport, using margins)
-        self.pixmap = None
+        self.image = None
 
         self.fontSize = 12
         self.fingerCircleSizeFactor = 1 / 0.6  # How many times the circle in which the note is inscribed is larger than
@@ -48,12 +70,112 @@ class FretboardPainter(object):
         self.fret_line_width = 2
         self.dotColor = QColor(Qt.gray)
 
+    def begin(self):
+        """Start painting into the image"""
+        self.p.begin(self.image)
+        self.p.setRenderHint(QPainter.Antialiasing)
+
+    def end(self):
+        """Finish painting. The image can only be used after that"""
+        self.p.end()
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end()
+
+    @property
+    def pixmap(self):
+        """The painted image as a pixmap. Can only be used in the GUI thread"""
+        return QPixmap.fromImage(self.image)
+
+    def save(self, filename, indexed=False, compression=-1):
+        """
+        Save the painted image as PNG without metadata, optionally with an 8-bit palette and given compression level
+        (see utils.encodePng). Return the size of the file in bytes
+        """
+        return savePng(self.image, filename, indexed, compression)
+
     def draw(self):
+        if self.layered:
+            self.p.drawImage(0, 0, self._baseLayer())
+            self._drawChordNotes()
+            return
         for dotFret in self.instrument.dotsOnFrets:
             self._drawDot(dotFret)
         for i, s in enumerate(self.instrument.strings):
             self._drawString(i)
 
+    def _baseLayer(self):
+        """
+        Return the image of the fretboard with all notes unmarked. Paint it, if it is not cached yet
+        """
+        ins = self.instrument
+        key = (tuple(ins.strings), tuple(ins.rootfrets), ins.nfrets, tuple(ins.dotsOnFrets),
+               self.image.width(), self.image.height(), self.fontSize, self.evenFretWidth)
+        base = FretboardPainter._baseLayers.get(key)
+        if base is None:
+            painter = FretboardPainter(self.size, ins)
+            painter.evenFretWidth = self.evenFretWidth
+            if painter.fontSize != self.fontSize:
+                painter.setFontSize(self.fontSize)
+            painter.setChordNotes(None)
+            with painter:
+                painter.draw()
+            # Another thread might have cached the same base layer in the meantime. setdefault keeps only one
+            base = FretboardPainter._baseLayers.setdefault(key, painter.image)
+        return base
+
+    def toSvg(self, idPrefix=""):
+        """
+        Return the image as SVG markup. Does not need painting; the chord notes are marked as by draw()
+        """
+        svg = SvgDocument(self.image.width(), self.image.height(), idPrefix)
+        svg.fill("#fff")
+        for dotFret in self.instrument.dotsOnFrets:
+            for rect in self._dotRects(dotFret):
+                rect = QRectF(rect)
+                svg.ellipse(rect.center().x(), rect.center().y(), rect.width() / 2, rect.height() / 2,
+                            self.dotColor.name())
+        for i in range(len(self.instrument.strings)):
+            for kind, a, b in self._stringItems(i):
+                if kind == "note":
+                    center = QRectF(b).center()
+                    svg.use(self._svgNote(svg, a, b.width()), center.x(), center.y())
+                elif kind == "string":
+                    svg.line(a.x(), a.y(), b.x(), b.y(), self.string_thickness, self.string_color.name())
+                else:
+                    width = self.bar_zero_width if kind == "bar" else self.fret_line_width
+                    svg.line(a.x(), a.y(), b.x(), b.y(), width, "#000")
+        return svg.toString()
+
+    def _svgNote(self, svg, noteName, size):
+        """
+        Define the note annotation centered at (0, 0) in the SVG document. Return its id
+        """
+        style = self._noteStyle(noteName)
+        if style is None:
+            markup = SvgDocument.textMarkup(0, 0, noteName, self.fontSize)
+        else:
+            markup = '<circle r="{:g}" stroke="#000"/>'.format(size / 2)
+            markup += SvgDocument.textMarkup(0, 0, noteName, self.fontSize, "#fff", style == "root")
+        return svg.define((noteName, style, size), '<g id="{id}">' + markup + '</g>')
+
+    def _drawChordNotes(self):
+        """
+        Mark only the notes belonging to the chord. The rest of the fretboard must already be painted
+        """
+        if not self.chordMask:
+            return
+        font = self.p.font()
+        font.setPixelSize(self.fontSize)
+        self.p.setFont(font)
+        matrix = self.instrument.pitchClassMatrix()
+        for i, f in np.argwhere(self.instrument.chordCells(self.chordMask)):
+            self._annotateNote(NOTES[matrix[i, f]], square(self._getNoteRect(int(i), int(f))))
+
     def setFontSize(self, size):
         """Set font size. Basing on that, set the overall size of the picture"""
         self.fontSize = size
@@ -73,12 +195,10 @@ class FretboardPainter(object):
         """
         if size is None:
             return
-        self.pixmap = QPixmap(size)
-        self.pixmap.fill(QColor(Qt.white))
-        self.p.begin(self.pixmap)
-        self.p.setRenderHint(QPainter.Antialiasing)
-        self.fretBoardRect = self.p.viewport().marginsRemoved(
-            QMargins(25, self.fontSize * self.fingerCircleSizeFactor + 5, 5, 5)
+        self.image = QImage(size, QImage.Format_RGB32)
+        self.image.fill(QColor(Qt.white))
+        self.fretBoardRect = self.image.rect().marginsRemoved(
+            QMargins(25, int(self.fontSize * self.fingerCircleSizeFactor + 5), 5, 5)
         )
 
     def setChordNotes(self, notes):
@@ -87,6 +207,13 @@ class FretboardPainter(object):
         chord
         """
         self.chordNotes = notes
+        if notes:
+            pitchClasses = [pitchClass(note) for note in notes]
+            self.chordRoot = pitchClasses[0]
+            self.chordMask = pitchClassMask(pitchClasses)
+        else:
+            self.chordRoot = None
+            self.chordMask = 0
 
     def _calculateFretboardLength(self, nfrets):
         """
@@ -130,22 +257,6 @@ class FretboardPainter(object):
         return self.fretBoardRect.top() + d
 
     def _drawDot(self, fret):
-        radius = 8
-
-        center = self._fretRect(fret).center()
-        if not self.fretBoardRect.contains(center):
-            return
-        topLeft = center - QPoint(radius, radius)
-        bottomRight = center + QPoint(radius, radius)
-        dots = 1
-        rect = QRect(topLeft, bottomRight)
-
-        if fret == 12:
-            dots = 2
-            rect.moveCenter(
-                QPoint(self._fretRect(fret).left() + 0.2 * self._fretRect(fret).width(), rect.center().y())
-            )
-
         pen = self.p.pen()
         brush = QBrush(Qt.SolidPattern)
         brush.setColor(self.dotColor)
@@ -154,12 +265,33 @@ class FretboardPainter(object):
         self.p.setBrush(brush)
         self.p.setPen(pen)
 
-        for i in range(dots):
-            # Draw 2 dots for the 12th fret and one for the others
+        for rect in self._dotRects(fret):
             self.p.drawEllipse(rect)
-            rect.moveCenter(
-                QPoint(self._fretRect(fret).right() - 0.2 * self._fretRect(fret).width(), rect.center().y())
-            )
+
+    def _dotRects(self, fret):
+        """
+        Return the rectangles of the dots marking the fret: 2 dots for the 12th fret and one for the others
+        """
+        radius = 8
+
+        center = self._fretRect(fret).center()
+        if not self.fretBoardRect.contains(center):
+            return []
+        topLeft = center - QPoint(radius, radius)
+        bottomRight = center + QPoint(radius, radius)
+        rect = QRect(topLeft, bottomRight)
+
+        if fret != 12:
+            return [rect]
+        rect.moveCenter(
+            QPoint(int(self._fretRect(fret).left() + 0.2 * self._fretRect(fret).width()), rect.center().y())
+        )
+        rects = [QRect(rect)]
+        rect.moveCenter(
+            QPoint(int(self._fretRect(fret).right() - 0.2 * self._fretRect(fret).width()), rect.center().y())
+        )
+        rects.append(rect)
+        return rects
 
     def _fretRect(self, fret):
         if fret == 0:
@@ -170,7 +302,8 @@ class FretboardPainter(object):
         bottom = self._fretPos(fret)
         left = self.fretBoardRect.left()
         right = self.fretBoardRect.right()
-        return QRect(QPoint(left, top), QPoint(right, bottom))
+        # The positions are truncated, as Qt used to do implicitly
+        return QRect(QPoint(left, int(top)), QPoint(right, int(bottom)))
 
     def _drawString(self, i):
         """
@@ -180,50 +313,53 @@ class FretboardPainter(object):
         font.setPixelSize(self.fontSize)
         self.p.setFont(font)
 
+        pen = self.p.pen()
+        for kind, a, b in self._stringItems(i):
+            if kind == "note":
+                self._annotateNote(a, b)
+                continue
+            if kind == "string":
+                pen.setWidth(self.string_thickness)
+                pen.setColor(self.string_color)
+            else:
+                pen.setWidth(self.bar_zero_width if kind == "bar" else self.fret_line_width)
+                pen.setColor(Qt.black)
+                pen.setStyle(Qt.SolidLine)
+            self.p.setPen(pen)
+            self.p.drawLine(a, b)
+
+    def _stringItems(self, i):
+        """
+        Generate the elements of the ith string in the order in which they are drawn:
+        - ("bar", point, point) - the 0-th fret bar
+        - ("fret", point, point) - a fret
+        - ("string", point, point) - a segment of the string
+        - ("note", note name, rect) - a note annotation
+        """
         openNote = self.instrument.strings[i]
-        ibase = NOTES.index(openNote)
+        pitchClasses = self.instrument.pitchClassMatrix()[i]
 
         rect = self._getNoteRect(i, self.instrument.rootfrets[i])
-
-        # Draw the 0-th fret bar
-        pen = self.p.pen()
-        pen.setWidth(self.bar_zero_width)
-        pen.setColor(Qt.black)
-        pen.setStyle(Qt.SolidLine)
-        self.p.setPen(pen)
         b = self._fretRect(self.instrument.rootfrets[i]).bottom()
-
-        self.p.drawLine(QPoint(rect.left(), b), QPoint(rect.right(), b))
+        yield "bar", QPoint(rect.left(), b), QPoint(rect.right(), b)
 
         # Annotate the open string note
-        self._annotateNote(openNote, square(rect))
+        yield "note", openNote, square(rect)
 
         # For each fret, draw the segments of strings (break them to make room for the note annotations) frets
         # and the note annotations
         for f in range(self.instrument.rootfrets[i] + 1, self.instrument.nfrets + 1):
-            noteName = NOTES[(ibase - self.instrument.rootfrets[i] + f) % 12]
+            noteName = NOTES[pitchClasses[f]]
             fretRect = self._fretRect(f)
             b = fretRect.bottom()
+            yield "fret", QPoint(rect.left(), b), QPoint(rect.right(), b)
 
-            # Draw the fret
-            pen.setWidth(self.fret_line_width)
-            pen.setColor(Qt.black)
-            pen.setStyle(Qt.SolidLine)
-            self.p.setPen(pen)
-            self.p.drawLine(QPoint(rect.left(), b), QPoint(rect.right(), b))
-
-            # Draw the note
             rect = self._getNoteRect(i, f)
-            # self.p.drawRect(rect)
+            yield "note", noteName, square(rect)
 
-            self._annotateNote(noteName, square(rect))
-
-            # Draw two segments of the string - before and after the note
-            pen.setWidth(self.string_thickness)
-            pen.setColor(self.string_color)
-            self.p.setPen(pen)
-            self.p.drawLine(QPoint(rect.center().x(), fretRect.top()), QPoint(rect.center().x(), rect.top()))
-            self.p.drawLine(QPoint(rect.center().x(), fretRect.bottom()), QPoint(rect.center().x(), rect.bottom()))
+            # Two segments of the string - before and after the note
+            yield "string", QPoint(rect.center().x(), fretRect.top()), QPoint(rect.center().x(), rect.top())
+            yield "string", QPoint(rect.center().x(), fretRect.bottom()), QPoint(rect.center().x(), rect.bottom())
 
     def _getNoteRect(self, i, fret):
         """
@@ -242,8 +378,8 @@ class FretboardPainter(object):
 
         h = self.fontSize * self.fingerCircleSizeFactor
         top = fr.top()
-        rect = QRect(l, top, (r - l), h)
-        rect.moveBottom(fr.bottom() - max(2, 0.1 * fr.height()))
+        rect = QRect(int(l), top, int(r - l), int(h))
+        rect.moveBottom(int(fr.bottom() - max(2, 0.1 * fr.height())))
         return rect
 
     def _annotateNote(self, noteName, rect):
@@ -253,13 +389,9 @@ class FretboardPainter(object):
         - The note is a root note of the chord
         - The note does not belong to the chord
         """
-        isRootNote = False
-        isChordNote = False
-        if self.chordNotes is not None:
-            if noteName == self.chordNotes[0]:
-                isRootNote = True
-            elif noteName in self.chordNotes:
-                isChordNote = True
+        style = self._noteStyle(noteName)
+        isRootNote = style == "root"
+        isChordNote = style == "chord"
         brush_old = self.p.brush()
         pen_old = self.p.pen()
         font_old = self.p.font()
@@ -303,3 +435,16 @@ class FretboardPainter(object):
         self.p.setFont(font_old)
         self.p.setPen(pen_old)
         self.p.setBrush(brush_old)
+
+    def _noteStyle(self, noteName):
+        """
+        Return "root" if the note is the root note of the chord, "chord" if it belongs to the chord, otherwise None
+        """
+        pc = PITCH_CLASSES.get(noteName)
+        if pc is None or not self.chordMask:
+            return None
+        if pc == self.chordRoot:
+            return "root"
+        elif self.chordMask >> pc & 1:
+            return "chord"
+        return None
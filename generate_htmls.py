@@ -20,25 +20,43 @@ try:
 except AttributeError:
     pass
 
+import argparse
+import hashlib
 import logging
+import math
+import multiprocessing
 import sys
-from copy import copy
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from xml.sax.saxutils import quoteattr
 
-from PyQt5.QtCore import QSize
-from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QGuiApplication, QImage, QPainter
 
-from Instruments.banjo import Banjo_5string
-from Instruments.guitar import Guitar
-from Instruments.ukulele import Ukulele
-from fretboard_painter import FretboardPainter
-from music_theory import NOTES, ChordInterval, ChordType, getChordNotes
+import Instruments.instrument
+from Instruments.instrument import Instrument
+from Instruments.instrument_factory import INSTRUMENTS, InstrumentFactory
+from file_register import FileRegister
+from fretboard_painter import FretboardPainter, PAINTER_VERSION
+from music_theory import NOTES, CHORD_TYPES, ChordInterval, ChordType, getChordNotes, notesFromString
+from page_template import PageTemplate
+from utils import encodePng, savePng
+from voicing_database import VoicingDatabase, schemeText
 
 htmdir = os.path.join(os.path.dirname(__file__), "", "HTML")
 template_file = os.path.join(htmdir, "chord_page_template.xhtml")
 imgdir = os.path.join(os.path.dirname(__file__), "", "img")
+instruments_file = os.path.join(os.path.dirname(Instruments.instrument.__file__), "instruments.json")
 
 with open(template_file, 'r') as tf:
     TEMPLATE = tf.read()
+TEMPLATE_HASH = hashlib.sha1(TEMPLATE.encode('utf-8')).hexdigest()
+PAGE_TEMPLATE = PageTemplate(TEMPLATE)
+
+# Style sheet with the offsets of the sprites in the atlases. Written next to the pages
+ATLAS_CSS = "chord_atlas.css"
 
 use_types = [ChordInterval.major,
              ChordInterval.minor,
@@ -46,8 +64,83 @@ use_types = [ChordInterval.major,
              ChordInterval.dominant_7,
              ChordInterval.min_7]
 
+# Pages of the site. Each page shows a chord on the instruments (as named in instruments_file) in given tunings.
+# The images are named with given prefixes
+SITE = [("banjo", [("Bluegrass banjo", "Standard", "banjo_openG__"),
+                   ("Bluegrass banjo", "Double C", "banjo_doubleC")]),
+        ("guitar", [("Guitar", "Standard", "guitar"),
+                    ("Ukulele", "Standard", "ukulele")])]
+
+ImageJob = namedtuple("ImageJob", ["instrument", "root", "chordType", "imgName", "layered", "imageFormat", "indexed",
+                                   "compression"],
+                      defaults=[False, "png", False, -1])
+ImageJob.__doc__ = "A single fretboard image to be rendered. Jobs are independent of each other"
+ImageJob.layered.__doc__ = "Paint the chord notes over the cached fretboard (see FretboardPainter)"
+ImageJob.imageFormat.__doc__ = "Either 'png' or 'svg'"
+ImageJob.indexed.__doc__ = "Save the PNG image with an 8-bit palette"
+ImageJob.compression.__doc__ = "Compression level 0-9 of the PNG image, or -1 for the default one"
+
+PageJob = namedtuple("PageJob", ["instrument", "root", "chordType", "htmName", "images", "inlineSvg", "titles"],
+                     defaults=[False, None])
+PageJob.__doc__ = "A single XHTML page together with the image jobs whose results it shows"
+PageJob.inlineSvg.__doc__ = "Inline the SVG images in the page instead of referencing them"
+PageJob.titles.__doc__ = "Titles (tooltips) of the images, e.g. their best voicings, or None"
+
+AtlasJob = namedtuple("AtlasJob", ["imgName", "images", "columns"])
+AtlasJob.__doc__ = "A single image into which all images of one instrument and tuning are packed in a grid"
+
+# QGuiApplication of a worker process. Kept referenced, so that it lives as long as the worker does
+_workerApp = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate XHTML pages with fretboard diagrams of chords")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes rendering the images (default: 1, render serially)")
+    parser.add_argument("-t", "--threads", type=int, default=1,
+                        help="Number of threads rendering the images in this process. Ignored if --jobs is given")
+    parser.add_argument("-l", "--layered", action="store_true",
+                        help="Paint the chord notes over a cached base layer of the fretboard, which is much faster")
+    parser.add_argument("--format", choices=["png", "svg"], default="png",
+                        help="Format of the images (default: png)")
+    parser.add_argument("--inline-svg", action="store_true",
+                        help="Inline the SVG images in the pages instead of referencing them. Implies --format svg")
+    parser.add_argument("-a", "--atlas", action="store_true",
+                        help="Pack the images of each instrument and tuning into a single atlas image "
+                             "and reference them in the pages as CSS sprites")
+    parser.add_argument("-i", "--indexed", action="store_true",
+                        help="Save the PNG images with an 8-bit palette and without metadata")
+    parser.add_argument("-c", "--compression", type=int, default=-1, choices=range(-1, 10), metavar="{0..9}",
+                        help="Compression level of the PNG images (default: Qt's default)")
+    parser.add_argument("--stats", action="store_true",
+                        help="Report the bytes saved per instrument by --indexed and --compression. Encodes every "
+                             "image a second time as a plain PNG, so it takes longer")
+    parser.add_argument("--instrument", action="append",
+                        help="Render only the images of this instrument (a word of its name is enough). Repeatable")
+    parser.add_argument("--tuning", action="append",
+                        help="Render only the images of the instruments in this tuning. Repeatable")
+    parser.add_argument("--root", action="append",
+                        help="Render only the chords with this root note. Repeatable")
+    parser.add_argument("--type", action="append",
+                        help="Render only the chords of this type, given by name or annotation, e.g. 'minor 7th' "
+                             "or 'm7'. Any known chord type can be given. Repeatable")
+    parser.add_argument("--progress", action="store_true", default=sys.stderr.isatty(),
+                        help="Show the progress on the standard error (default if it is a terminal)")
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="Rebuild all files, even if they are up to date according to the build manifest")
+    parser.add_argument("--voicings", metavar="DB",
+                        help="Show the best voicings of the chords, looked up in this voicing database (see "
+                             "voicing_database.py), as the titles of the images")
+    args = parser.parse_args(argv)
+    if args.atlas and (args.format != "png" or args.inline_svg):
+        parser.error("--atlas can only be used with PNG images")
+    try:
+        jobFilter = JobFilter(args.instrument, args.tuning, args.root, args.type)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.atlas and not jobFilter.isEmpty():
+        parser.error("--atlas always renders whole atlases and cannot be used with filters")
 
-def main():
     logfile = "generate_htmls.log"
     logging.basicConfig(level=logging.INFO,
                         format="WRITE HTML: %(asctime)s [%(levelname)s] %(message)s",
@@ -58,80 +151,567 @@ def main():
                         )
     print("Logging information to {}".format(os.path.abspath(os.path.join(os.getcwd(), logfile))))
 
-    generateAllHtmls()
+    register = FileRegister(manifest="generate_htmls.manifest.json")
+    register.forced = args.force
+    imageFormat = "svg" if args.inline_svg else args.format
+    try:
+        voicings = None if args.voicings is None else VoicingDatabase(args.voicings, readOnly=True)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        generateAllHtmls(args.jobs, register, args.layered, args.threads, imageFormat, args.inline_svg, args.atlas,
+                         args.indexed, args.compression, jobFilter, args.progress, voicings, args.stats)
+    finally:
+        if voicings is not None:
+            voicings.close()
+    register.save()
+    logging.info("Rebuilt {} files, {} files were up to date".format(register.rebuilt, register.upToDate))
+
+
+def generateAllHtmls(jobs=1, register=None, layered=False, threads=1, imageFormat="png", inlineSvg=False,
+                     atlas=False, indexed=False, compression=-1, jobFilter=None, progress=False, voicings=None,
+                     stats=False):
+    """
+    Render all images and write all pages. If jobs > 1, the images are rendered in that many worker processes.
+    Otherwise, if threads > 1, they are rendered in that many threads of this process.
+    The pages are always written by this process in the same order, so the output does not depend on the number of jobs
+
+    If a file register is given, only the files whose inputs changed since they were recorded in it are rebuilt.
+    If inlineSvg is True, the SVG images are inlined in the pages. It requires the "svg" image format.
+    If atlas is True, the images are packed into atlases (see generateAtlases). It requires the "png" image format.
+    If indexed is True or compression is given, the PNG images are optimized for size (see utils.encodePng). If stats
+    is True too, the bytes saved are reported per instrument and tuning, which encodes every image a second time.
+    If a job filter is given, only the selected images and the pages showing them are rebuilt.
+    If progress is True, the progress is shown on the standard error.
+    If a voicing database is given, the best voicings of the chords are shown as the titles of the images
+    """
+    if inlineSvg and imageFormat != "svg":
+        raise ValueError("Only SVG images can be inlined")
+    if atlas and imageFormat != "png":
+        raise ValueError("Only PNG images can be packed into atlases")
+    if jobFilter is None:
+        jobFilter = JobFilter()
+    if atlas and not jobFilter.isEmpty():
+        raise ValueError("Atlases cannot be rendered selectively")
+    if register is None:
+        register = FileRegister()
+    pages = list(getPageJobs(layered, imageFormat, inlineSvg, indexed, compression, jobFilter, voicings=voicings))
+    # Number of images, bytes written and bytes of plain PNG files, keyed by instrument name. None if not reported
+    sizes = {} if stats and imageFormat == "png" and (indexed or compression >= 0) else None
+    if atlas:
+        generateAtlases(pages, register, jobs, threads, sizes)
+    else:
+        generateImagesAndPages(pages, register, jobs, threads, sizes, jobFilter, progress)
+    if sizes is not None:
+        for name, (count, size, plainSize) in sizes.items():
+            logging.info("{}: {} files, {} bytes, saved {} bytes ({:.0%})".format(
+                name, count, size, plainSize - size, 1 - size / plainSize))
+
+
+def generateImagesAndPages(pages, register, jobs=1, threads=1, sizes=None, jobFilter=None, progress=False):
+    """
+    Render the images of the pages and write the pages. Count the bytes of the rendered images in sizes, if given.
+    The images not selected by the job filter are neither rendered nor checked, the pages show them as they are
+    """
+    imageJobs = [image for page in pages for image in page.images]
+    hashes = [imageInputsHash(job) if jobFilter is None or jobFilter.matches(job) else None for job in imageJobs]
+    outdated = [h is not None and not register.isUpToDate(imageFileName(job), h) for job, h in zip(imageJobs, hashes)]
+    toRender = [job for job, o in zip(imageJobs, outdated) if o]
+
+    with _renderer(jobs, threads, len(toRender)) as render, \
+            Progress(len(toRender) + len(pages), sys.stderr if progress else None) as counter:
+        rendered = render(partial(renderImage, plainSize=sizes is not None), toRender)
+        _writePages(pages, zip(hashes, outdated), rendered, register, sizes, counter)
+
+
+def generateAtlases(pages, register, jobs=1, threads=1, sizes=None):
+    """
+    Render the images of the pages packed into one atlas image per instrument and tuning, write the style sheet with
+    the sprites' offsets in the atlases and write the pages, which show the images as sprites.
+    Count the bytes of the rendered atlases in sizes, if given
+    """
+    atlases = list(getAtlasJobs(pages))
+    hashes = [atlasInputsHash(atlas) for atlas in atlases]
+    outdated = [not register.isUpToDate(atlasFileName(atlas), h) for atlas, h in zip(atlases, hashes)]
+    toRender = [atlas for atlas, o in zip(atlases, outdated) if o]
+
+    with _renderer(jobs, threads, len(toRender), chunksize=1) as render:
+        rendered = render(partial(renderAtlas, plainSize=sizes is not None), toRender)
+        for atlas, inputsHash, o in zip(atlases, hashes, outdated):
+            if o:
+                filename, size, plainSize = next(rendered)
+                register.record(filename, inputsHash)
+                _countSize(sizes, atlas.images[0], size, plainSize)
+                logging.info("Saved image: {}".format(os.path.abspath(filename)))
+            else:
+                register.upToDate += 1
+                logging.debug("Up to date:  {}".format(os.path.abspath(atlasFileName(atlas))))
+
+    css = atlasStyleSheet(atlases)
+    cssHash = FileRegister.inputsHash(css)
+    if register.isUpToDate(ATLAS_CSS, cssHash):
+        register.upToDate += 1
+    else:
+        with open(ATLAS_CSS, 'w') as f:
+            f.write(css)
+        register.record(ATLAS_CSS, cssHash)
+        logging.info("Wrote file   {}".format(os.path.abspath(ATLAS_CSS)))
+
+    for page in pages:
+        _writePage(page, [spriteName(job) for job in page.images], register, sprites=True)
+
+
+@contextmanager
+def _renderer(jobs, threads, count, chunksize=4):
+    """
+    Provide a map-like function rendering the jobs in worker processes, in threads or serially (see generateAllHtmls)
+    """
+    if jobs > 1 and count > 1:
+        ctx = multiprocessing.get_context("spawn")  # Do not fork a process that may already hold a Qt application
+        with ctx.Pool(jobs, initializer=_initWorker) as pool:
+            yield lambda func, iterable: pool.imap(func, iterable, chunksize=chunksize)
+    elif threads > 1 and count > 1:
+        with ThreadPoolExecutor(threads) as executor:
+            yield executor.map
+    else:
+        yield map
 
 
-def generateAllHtmls():
-    for instrument in ['banjo', 'guitar']:
+def getPageJobs(layered=False, imageFormat="png", inlineSvg=False, indexed=False, compression=-1, jobFilter=None,
+                site=None, voicings=None):
+    """
+    Lazily generate the jobs describing the pages of the site (default: SITE) and the images on them.
+    If a job filter is given, only the pages showing any of the selected images are generated.
+    If a voicing database is given, the pages get the titles of the images (see imageTitle)
+    """
+    if jobFilter is None:
+        jobFilter = JobFilter()
+    if site is None:
+        site = SITE
+    options = (layered, imageFormat, indexed, compression)
+    instruments = None
+    for pageName, columns in site:
+        if not any(jobFilter.matchesInstrument(name, tuning) for name, tuning, prefix in columns):
+            continue
+        if instruments is None:
+            instruments = loadInstruments()
+        tuned = [(tunedInstrument(instruments[name], tuning), prefix) for name, tuning, prefix in columns]
         for root in NOTES:
-            for chordType in use_types:
-                images = []
-                if instrument == 'banjo':
-                    ins = Banjo_5string()
-                    images.append(paintFretboard(ins, root, chordType, "/".join([".", "img", "banjo_openG__"])))
-                    ins.strings = list("DCGCG")
-                    images.append(paintFretboard(ins, root, chordType, "/".join([".", "img", "banjo_doubleC"])))
-                elif instrument == "guitar":
-                    ins = Guitar()
-                    images.append(paintFretboard(ins, root, chordType, "/".join([".", "img", "guitar"])))
-                    ins = Ukulele()
-                    images.append(paintFretboard(ins, root, chordType, "/".join([".", "img", "ukulele"])))
-                else:
-                    raise ValueError(f"{instrument}: Don't know what to do!")
-
-                htm = "{}_{}_{}.xhtml".format(instrument, root, chordType.name.replace(" ", "_"))
-                writeHtml(instrument, root, chordType, htm, images)
-
-
-def writeHtml(instrument, root, chordType: ChordType, htmFullPath, images):
-    htm = copy(TEMPLATE)
-    htm = htm.replace("${instrument}", instrument)
-    htm = htm.replace("${chordroot}", root)
-    htm = htm.replace("${chordnotes}", ', '.join(getChordNotes(root, chordType)))
-    htm = htm.replace("#_", "_sharp_")
-    htm = htm.replace("${chordtype}", chordType.name)
+            if not jobFilter.matchesRoot(root):
+                continue
+            for chordType in jobFilter.chordTypes or use_types:
+                images = [ImageJob(instrument, root, chordType, "/".join([".", "img", prefix]), *options)
+                          for instrument, prefix in tuned]
+                htm = "{}_{}_{}.xhtml".format(pageName, root, chordType.name.replace(" ", "_"))
+                titles = None
+                if voicings is not None:
+                    titles = [imageTitle(voicings, instrument, root, chordType) for instrument, prefix in tuned]
+                yield PageJob(pageName, root, chordType, htm, images, inlineSvg, titles)
+
+
+def imageTitle(voicings: VoicingDatabase, instrument: Instrument, root, chordType: ChordType, count=3):
+    """
+    Return the title of the image of the chord on the instrument listing its best voicings stored in the database,
+    or an empty string, if there are none
+    """
+    best = voicings.voicings(instrument, root, chordType, limit=count)
+    if not best:
+        return ""
+    return "Best voicings: {}".format(", ".join(schemeText(v.scheme) for v in best))
+
+
+def loadInstruments(jfile=None):
+    """
+    Return the instruments defined in the JSON file (default: instruments_file), keyed by their names. The instruments
+    are shared definitions built once by the instrument factory, see tunedInstrument
+    """
+    factory = INSTRUMENTS if jfile is None else InstrumentFactory(jfile)
+    return {name: factory.definition(name) for name in factory.storedNames()}
+
+
+def tunedInstrument(instrument: Instrument, tuning):
+    """
+    Return a view of the instrument with the strings tuned as in the tuning of given name
+    """
+    return instrument.withTuning(tuning)
+
+
+def tuningName(instrument: Instrument):
+    """
+    Return the name of the instrument's tuning in which the strings are currently tuned
+    """
+    for name, strings in instrument.tuning:
+        if list(strings) == list(instrument.strings):
+            return name
+    return None
+
+
+class JobFilter(object):
+    """
+    Selection of the images to render. Each criterion is a list of accepted values, or None to accept any value
+
+    instruments - names of the instruments, case insensitive. A word of the name is enough, e.g. "banjo"
+    tunings - names of the tunings, case insensitive
+    roots - root notes of the chords
+    chordTypes - chord types given by names or annotations. If None, the types in use_types are selected
+    """
+
+    def __init__(self, instruments=None, tunings=None, roots=None, chordTypes=None):
+        self.instruments = None if instruments is None else [i.lower() for i in instruments]
+        self.tunings = None if tunings is None else [t.lower() for t in tunings]
+        self.roots = None
+        if roots is not None:
+            self.roots = []
+            for root in roots:
+                notes = notesFromString(root.upper())
+                if len(notes) != 1 or notes[0] != root.upper():
+                    raise ValueError("Invalid root note: {}".format(root))
+                self.roots.append(notes[0])
+        self.chordTypes = None
+        if chordTypes is not None:
+            self.chordTypes = [JobFilter.chordType(t) for t in chordTypes]
+
+    @staticmethod
+    def chordType(name):
+        """
+        Return the chord type with given name or annotation
+        """
+        chordType = CHORD_TYPES.getByName(name.replace("_", " ")) or CHORD_TYPES.getByAnnotation(name)
+        if chordType is not None:
+            return chordType
+        raise ValueError("Unknown chord type: {}".format(name))
+
+    def isEmpty(self):
+        """Check if the filter selects all images"""
+        return self.instruments is None and self.tunings is None and self.roots is None and self.chordTypes is None
+
+    def matchesInstrument(self, name, tuning):
+        if self.instruments is not None:
+            name = name.lower()
+            if not any(i == name or i in name.split() for i in self.instruments):
+                return False
+        if self.tunings is not None and (tuning or "").lower() not in self.tunings:
+            return False
+        return True
+
+    def matchesRoot(self, root):
+        return self.roots is None or root in self.roots
+
+    def matches(self, job: ImageJob):
+        """
+        Check if the image of the job is selected
+        """
+        if self.chordTypes is not None and job.chordType.interval not in [t.interval for t in self.chordTypes]:
+            return False
+        return self.matchesRoot(job.root) and self.matchesInstrument(job.instrument.name, tuningName(job.instrument))
+
+
+class Progress(object):
+    """
+    Progress of writing the files, shown in a single line of the stream. Nothing is shown if the stream is None
+    """
+
+    def __init__(self, total, stream=None):
+        self.total = total
+        self.done = 0
+        self.stream = stream
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.stream is not None and self.done:
+            self.stream.write("\n")
+
+    def step(self, filename):
+        """Count the file as done"""
+        self.done += 1
+        if self.stream is None:
+            return
+        width = len(str(self.total))
+        self.stream.write("\r[{:>{w}}/{}] {:<60.60}".format(self.done, self.total, os.path.basename(filename), w=width))
+        self.stream.flush()
+
+
+def _writePages(pages, imageStates, renderedImages, register, sizes=None, progress=None):
+    """
+    Write the pages, consuming the rendered images in the order of the pages' image jobs.
+    imageStates yields (inputs hash, outdated) of all image jobs, renderedImages - the results of renderImage of
+    the outdated ones. The inputs hash of the images that are not to be checked is None
+    """
+    if progress is None:
+        progress = Progress(0)
+    imageStates = iter(imageStates)
+    for page in pages:
+        images = []
+        for job in page.images:
+            inputsHash, outdated = next(imageStates)
+            if outdated:
+                filename, size, plainSize = next(renderedImages)
+                register.record(filename, inputsHash)
+                _countSize(sizes, job, size, plainSize)
+                progress.step(filename)
+                logging.info("Saved image: {}".format(os.path.abspath(filename)))
+            else:
+                filename = imageFileName(job)
+                if inputsHash is not None:
+                    register.upToDate += 1
+                    logging.debug("Up to date:  {}".format(os.path.abspath(filename)))
+            images.append(filename)
+        _writePage(page, images, register)
+        progress.step(page.htmName)
+
+
+def _writePage(page, images, register, sprites=False):
+    """
+    Write the page showing the images, unless it is up to date
+    """
+    htmFile = page.htmName.replace("#", "_sharp")
+    inputsHash = pageInputsHash(page, images, sprites)
+    if register.isUpToDate(htmFile, inputsHash):
+        register.upToDate += 1
+        logging.debug("Up to date:  {}".format(os.path.abspath(htmFile)))
+        return
+    writeHtml(page.instrument, page.root, page.chordType, page.htmName, images, page.inlineSvg, sprites, page.titles)
+    register.record(htmFile, inputsHash)
+
+
+def _countSize(sizes, job: ImageJob, size, plainSize):
+    """
+    Count the image of the job in the sizes per instrument name (see generateAllHtmls)
+    """
+    if sizes is None:
+        return
+    count = sizes.setdefault(os.path.basename(job.imgName).strip("_"), [0, 0, 0])
+    count[0] += 1
+    count[1] += size
+    count[2] += plainSize
+
+
+def getAtlasJobs(pages):
+    """
+    Generate the jobs of the atlases, each with all images of one instrument and tuning in the order of the pages
+    """
+    groups = {}
+    for page in pages:
+        for job in page.images:
+            groups.setdefault(job.imgName, []).append(job)
+    for imgName, images in groups.items():
+        size = fretboardSize(images[0].instrument)
+        # Keep the atlas roughly square
+        columns = math.ceil(math.sqrt(len(images) * size.height() / size.width()))
+        yield AtlasJob(imgName, images, min(columns, len(images)))
+
+
+def imageInputsHash(job: ImageJob):
+    """
+    Return the hash of everything the image of the job is painted from
+    """
+    ins = job.instrument
+    size = fretboardSize(ins)
+    return FileRegister.inputsHash(ins.strings, ins.rootfrets, ins.nfrets, ins.dotsOnFrets,
+                                   getChordNotes(job.root, job.chordType), [size.width(), size.height()],
+                                   PAINTER_VERSION, job.layered, job.imageFormat, job.indexed, job.compression)
+
+
+def pageInputsHash(page: PageJob, images, sprites=False):
+    """
+    Return the hash of everything the page is written from
+    """
+    if page.inlineSvg:
+        # The page contains the images, so it is outdated whenever any of them is
+        images = [(img, imageInputsHash(job)) for img, job in zip(images, page.images)]
+    if page.titles is not None:
+        images = [images, page.titles]
+    return FileRegister.inputsHash(page.instrument, page.root, page.chordType, images, sprites, TEMPLATE_HASH)
+
+
+def atlasInputsHash(atlas: AtlasJob):
+    """
+    Return the hash of everything the atlas is painted from
+    """
+    return FileRegister.inputsHash([imageInputsHash(job) for job in atlas.images], atlas.columns)
+
+
+def _initWorker():
+    """
+    Prepare a worker process for rendering: each worker needs its own Qt application, which does not need a display
+    """
+    global _workerApp
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    _workerApp = QGuiApplication([])
+
+
+def renderImage(job: ImageJob, plainSize=False):
+    """
+    Render and save the image described by the job. Return the image file name, its size in bytes and the size of
+    the image saved as a plain 32-bit PNG. The latter is None if it needs a second encoding and plainSize is False
+    """
+    if job.imageFormat != "png" or not (job.indexed or job.compression >= 0):
+        filename = paintFretboard(job.instrument, job.root, job.chordType, job.imgName, job.layered, job.imageFormat)
+        size = os.path.getsize(filename)
+        return filename, size, size
+    image = fretboardImage(job.instrument, job.root, job.chordType, job.layered)
+    filename = imageFileName(job)
+    return filename, savePng(image, filename, job.indexed, job.compression), \
+        len(encodePng(image)) if plainSize else None
+
+
+def renderAtlas(job: AtlasJob, plainSize=False):
+    """
+    Render and save the atlas described by the job. Return the atlas file name, its size in bytes and the size of
+    the atlas saved as a plain 32-bit PNG. The latter is None if it needs a second encoding and plainSize is False
+    """
+    size = fretboardSize(job.images[0].instrument)
+    rows = math.ceil(len(job.images) / job.columns)
+    atlas = QImage(size.width() * job.columns, size.height() * rows, QImage.Format_RGB32)
+    atlas.fill(Qt.white)
+    painter = QPainter(atlas)
+    for i, image in enumerate(job.images):
+        row, column = divmod(i, job.columns)
+        painter.drawImage(column * size.width(), row * size.height(),
+                          fretboardImage(image.instrument, image.root, image.chordType, image.layered))
+    painter.end()
+    filename = atlasFileName(job)
+    options = job.images[0]
+    if not (options.indexed or options.compression >= 0):
+        atlas.save(filename)
+        size = os.path.getsize(filename)
+        return filename, size, size
+    return filename, savePng(atlas, filename, options.indexed, options.compression), \
+        len(encodePng(atlas)) if plainSize else None
+
+
+def writeHtml(instrument, root, chordType: ChordType, htmFullPath, images, inlineSvg=False, sprites=False,
+              titles=None):
+    """
+    Write the page showing the images. If sprites is True, images are the names of the sprites (see spriteName).
+    If titles are given, they are shown as the tooltips of the images which are not inlined
+    """
+    htm = renderHtml(instrument, root, chordType, htmFullPath, images, inlineSvg, sprites, titles)
+    with open(htmFullPath.replace("#", "_sharp"), 'w') as h:
+        h.write(htm)
+    logging.info("Wrote file   {}".format(os.path.abspath(htmFullPath.replace("#", "_sharp"))))
+
+
+def renderHtml(instrument, root, chordType: ChordType, htmFullPath, images, inlineSvg=False, sprites=False,
+               titles=None):
+    """
+    Return the text of the page written by writeHtml
+    """
     htmName = os.path.basename(htmFullPath.replace("#", "_sharp"))
     majorname = htmName.replace(chordType.name.replace(" ", "_"), "major")
-    # Highlight the chord root and remove the hyperlink. Do that only once
-    htm = htm.replace(f'<p><a href="./{majorname}">{root}</a></p>',
-                      f'<p class="highlight">{root}</p>', 1)
-
+    # Highlight the chord root and remove the hyperlink. Do that only once.
     # Highlight the currently selected chord type and remove self-hyperlink in the htm file
-    htm = htm.replace(f'<p><a href="./{htmName}">{root}{chordType.annotations[-1]}</a></p>',
-                      f'<p class="highlight">{root}{chordType.annotations[-1]}</p>')
+    highlight = [(majorname, root, 1),
+                 (htmName, root + chordType.annotations[-1], -1)]
+
+    head = ""
+    if sprites:
+        head = '\n    <link rel="stylesheet" type="text/css" href="./{}"/>'.format(ATLAS_CSS)
 
     # Build the list of images:
     imgnodes = []
-    for img in images:
-        imgnodes.append('<img src="{}" alt="Diagram not found"/>'.format(img))
+    if titles is None:
+        titles = [""] * len(images)
+    for img, title in zip(images, titles):
         logging.debug("Adding image:                    {}".format(img))
+        if title:
+            title = " title={}".format(quoteattr(title))
+        if sprites:
+            imgnodes.append('<div class="sprite {}"{}></div>'.format(img, title))
+            continue
+        if inlineSvg:
+            with open(img, 'r') as f:
+                imgnodes.append(f.read())
+            continue
+        imgnodes.append('<img src="{}" alt="Diagram not found"{}/>'.format(img, title))
         logging.debug("Adding <img/> with src={}".format(imgnodes[-1].strip()))
-    htm = htm.replace("${images}", "\n        ".join(imgnodes))
+    return PAGE_TEMPLATE.render({"instrument": instrument,
+                                 "chordroot": root,
+                                 "chordnotes": ', '.join(getChordNotes(root, chordType)),
+                                 "chordtype": chordType.name,
+                                 "images": "\n        ".join(imgnodes),
+                                 "head": head},
+                                highlight)
 
-    with open(htmFullPath.replace("#", "_sharp"), 'w') as h:
-        h.write(htm)
-    logging.info("Wrote file   {}".format(os.path.abspath(htmFullPath.replace("#", "_sharp"))))
 
+def fretboardSize(instrument):
+    """
+    Return the size of the fretboard image of the instrument. Instruments with up to four strings get narrower images
+    """
+    if len(instrument.strings) <= 4:
+        return QSize(160, 920)
+    return QSize(200, 920)
 
-def paintFretboard(instrument, root, chordType, imgName):
-    if isinstance(instrument, Ukulele):
-        size = QSize(160, 920)
-    else:
-        size = QSize(200, 920)
-    painter = FretboardPainter(size, instrument)
+
+def imageFileName(job: ImageJob):
+    """
+    Return the name of the file to which the image of the job is saved
+    """
+    return "{}_{}_{}.{}".format(job.imgName, job.root.replace("#", "_sharp"), job.chordType.name.replace(" ", "_"),
+                                job.imageFormat)
+
+
+def atlasFileName(job: AtlasJob):
+    """
+    Return the name of the file to which the atlas of the job is saved
+    """
+    return "{}_atlas.png".format(job.imgName)
+
+
+def spriteName(job: ImageJob):
+    """
+    Return the name of the CSS class showing the image of the job from its atlas
+    """
+    return os.path.splitext(os.path.basename(imageFileName(job)))[0]
+
+
+def atlasStyleSheet(atlases):
+    """
+    Return the style sheet defining the sprites of all images in the atlases
+    """
+    rules = [".sprite {\n    display: inline-block;\n    vertical-align: top;\n    }"]
+    for atlas in atlases:
+        size = fretboardSize(atlas.images[0].instrument)
+        rules.append(".sprite.{} {{\n    width: {}px;\n    height: {}px;\n    background-image: url({});\n    }}"
+                     .format(",\n.sprite.".join(spriteName(job) for job in atlas.images), size.width(),
+                             size.height(), atlasFileName(atlas)))
+        for i, job in enumerate(atlas.images):
+            row, column = divmod(i, atlas.columns)
+            rules.append(".{} {{ background-position: {}px {}px; }}".format(
+                spriteName(job), -column * size.width(), -row * size.height()))
+    return "\n".join(rules) + "\n"
+
+
+def fretboardImage(instrument, root, chordType, layered=False):
+    """
+    Return the painted fretboard image of the chord
+    """
+    painter = FretboardPainter(fretboardSize(instrument), instrument, layered)
     painter.setChordNotes(getChordNotes(root, chordType))
-    painter.draw()
-    painter.p.end()
-    px = painter.pixmap
-    filename = "{}_{}_{}.png".format(imgName, root.replace("#", "_sharp"), chordType.name.replace(" ", "_"))
-    px.save(filename)
-    logging.info("Saved image: {}".format(os.path.abspath(filename)))
+    with painter:
+        painter.draw()
+    return painter.image
+
+
+def paintFretboard(instrument, root, chordType, imgName, layered=False, imageFormat="png"):
+    filename = imageFileName(ImageJob(instrument, root, chordType, imgName, layered, imageFormat))
+    if imageFormat == "svg":
+        painter = FretboardPainter(fretboardSize(instrument), instrument, layered)
+        painter.setChordNotes(getChordNotes(root, chordType))
+        # Prefix the ids with the file name, so that they are unique when several images are inlined in a page
+        idPrefix = os.path.splitext(os.path.basename(filename))[0] + "_"
+        with open(filename, 'w') as f:
+            f.write(painter.toSvg(idPrefix))
+        return filename
+    fretboardImage(instrument, root, chordType, layered).save(filename)
     return filename
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    # Using a QApplication appears to mitigate the crash that would otherwise occur upon constructing a QPixmap.
-    #
+    # The images are painted offscreen, so no display is needed. The application is only needed for the fonts
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QGuiApplication(sys.argv)
 
     main()
@@ -16,9 +16,7 @@ from PyQt5.QtWidgets import QApplication
 
 from GUI.fretboard_model import FretboardModel
 from GUI.mainwindow import MainWindow
-from Instruments.banjo import Banjo_5string as Banjo
-from Instruments.guitar import Guitar
-from Instruments.ukulele import Ukulele
+from Instruments.instrument_factory import INSTRUMENTS
 from file_register import FileRegister
 
 if __name__ == '__main__':
@@ -26,9 +24,9 @@ if __name__ == '__main__':
     # Using a QApplication appears to mitigate the crash that would otherwise occur upon constructing a QPixmap.
     #
     size = QSize(160, 920)
-    banjo = Banjo()
-    guitar = Guitar()
-    uke = Ukulele()
+    banjo = INSTRUMENTS.instrument("Banjo")
+    guitar = INSTRUMENTS.instrument("Guitar")
+    uke = INSTRUMENTS.instrument("Ukulele")
     targetDir = os.path.join(os.getcwd(), "img")
     # targetDir = r'C:\Users\piotr\Documents\Songs XML\SeparateFiles\img'
 
@@ -44,10 +42,10 @@ if __name__ == '__main__':
     mw.show()
     # for chord in banjo.chords:
     #     painter = ChordPainter(chord, size, banjo)
-    #     painter.drawEmpty()
-    #     painter.drawChord()
-    #     painter.p.end()
-    #     px = painter.pixmap
+    #     with painter:
+    #         painter.drawEmpty()
+    #         painter.drawChord()
+    #     px = painter.image
     #
     #     filesSaved = []
     #     filenum = 0
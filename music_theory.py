@@ -10,20 +10,62 @@ Collection of general princoples from music theory
 __date__ = '2021-12-04'
 __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 
+import html
+import json
+import os
 import re
 from collections import namedtuple
+from functools import lru_cache
 
 NOTES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
 
-# Regular expression useful for finding notes in a string. Uses reversed(NOTES) so that sharp notes can be resolved
-# first
-NOTEre = re.compile("({})".format("|".join(reversed(NOTES))), re.IGNORECASE)
+# Pitch classes of the notes: integers 0-11, C being 0. A set of pitch classes (e.g. a chord) is represented by a 12-bit
+# mask, in which bit i is set if pitch class i is present
+PITCH_CLASSES = {note: pc for pc, note in enumerate(NOTES)}
+
+# A single note: the letter (German H is B) followed by an optional accidental: a sharp (#, is) or a flat (b, es, or
+# just s after A and E, as in the German As and Es). B is always read as in English; the German B (B flat) must be
+# written Bb
+NOTE_TOKENre = re.compile(r"([A-Ha-h])(#|is|es|(?<=[AaEe])s|b)?")
+# The notes of a list are separated by commas or spaces. Several notes can be written without separators, e.g.
+# "DBGDG", if their letters are all capitals, or all lowercase and with no accidentals but the sharp, e.g. "dbgdg":
+# there the letters b and e are notes
+_NOTE_WORDre = re.compile(r"[^\s,]+")
+_CAPITAL_NOTESre = re.compile(r"(?:[A-H](?:#|is|es|(?<=[AE])s|b)?)+")
+_LOWERCASE_NOTESre = re.compile(r"(?:[a-h]#?)+")
+_LOWERCASE_TOKENre = re.compile(r"[a-h]#?")
+_LETTERS = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11, "H": 11}
+_ACCIDENTALS = {"": 0, "#": 1, "is": 1, "b": -1, "es": -1, "s": -1}
+# Pitch classes of all texts of single notes (see NOTE_TOKENre)
+_TOKEN_PITCH_CLASSES = {letter + accidental: (pc + shift) % 12
+                        for l, pc in _LETTERS.items() for letter in (l, l.lower())
+                        for accidental, shift in _ACCIDENTALS.items() if NOTE_TOKENre.fullmatch(letter + accidental)}
+
+NoteToken = namedtuple("NoteToken", ["start", "end", "pitchClass"])
+NoteToken.__doc__ = "A note found by tokenizeNotes: its span in the string and its pitch class"
 
 ChordType = namedtuple("ChordType", ["interval", "name", "annotations"])
 ChordType.interval.__doc__ = "A tuple of halftone intervals between subsequent notes of a chord"
 ChordType.name.__doc__ = "Name of the chord type"
 ChordType.annotations.__doc__ = "Possible annotations of the chord that can be used in HTML documents"
 
+# Plain-text annotations of the chord types whose annotations are all HTML entities, see plainAnnotation
+_PLAIN_ANNOTATIONS = {"diminished": "dim", "half diminished 7th": "m7b5", "diminished 7th": "dim7"}
+
+
+def plainAnnotation(chordType) -> str:
+    """
+    Return an annotation of the chord type in plain text, usable in chord and file names: the first one without HTML
+    entities, the conventional one (e.g. "dim" for the diminished chords) or the first one with the entities replaced
+    """
+    for annotation in chordType.annotations:
+        if "&" not in annotation:
+            return annotation
+    try:
+        return _PLAIN_ANNOTATIONS[chordType.name]
+    except KeyError:
+        return html.unescape(chordType.annotations[0]) if chordType.annotations else ""
+
 
 class ChordInterval(object):
     """
@@ -48,14 +90,20 @@ class ChordInterval(object):
 
     @staticmethod
     def getInterval(intvl_name):
-        for chord in ChordInterval.getAllChordTypes():
-            if intvl_name == chord.name:
-                return chord
+        return CHORD_TYPES.getByName(intvl_name)
 
     @staticmethod
     def getAllChordTypes():
         """
-        Returns a list of all chord types that are defined in this class
+        Returns a list of all registered chord types: the ones defined in this class, followed by the ones loaded from
+        chord_types_file
+        """
+        return list(CHORD_TYPES.chordTypes)
+
+    @staticmethod
+    def getDefinedChordTypes():
+        """
+        Returns a list of the chord types that are defined in this class
         """
         chordTypes = []
         for a in dir(ChordInterval):
@@ -67,37 +115,248 @@ class ChordInterval(object):
         return chordTypes
 
 
+class ChordTypeRegistry(object):
+    """
+    Chord types indexed by their names, annotations and intervals, and the chords of all types on all roots indexed by
+    their masks (see recognize)
+    """
+
+    def __init__(self):
+        self.chordTypes = []
+        self._byName = {}
+        self._byAnnotation = {}
+        self._byInterval = {}
+        # Reverse index of the chords: chords keyed by their masks, by the masks of the chords without the fifth and
+        # by the masks of all notes containing them. The chords are (root, ChordType) in the order of registration and
+        # of the roots
+        self._chordsByMask = {}
+        self._chordsByMaskWithoutFifth = {}
+        self._chordsBySuperset = {}
+        self._recognized = {}  # Recognized chords, keyed by (mask, lowest pitch class)
+
+    def register(self, chordType):
+        """
+        Add the chord type. The names must be unique. If an annotation or the intervals are already registered, the
+        first chord type keeps them
+        """
+        if chordType.name in self._byName:
+            raise ValueError("Chord type {} is already registered".format(chordType.name))
+        self.chordTypes.append(chordType)
+        self._byName[chordType.name] = chordType
+        for annotation in chordType.annotations:
+            self._byAnnotation.setdefault(annotation, chordType)
+        self._byAnnotation.setdefault(plainAnnotation(chordType), chordType)
+        self._byInterval.setdefault(chordType.interval, chordType)
+
+        for root in range(12):
+            mask = chordMask(root, chordType)
+            self._chordsByMask.setdefault(mask, []).append((root, chordType))
+            fifth = (root + 7) % 12
+            # Without the fifth, a triad would be just an interval
+            if mask >> fifth & 1 and bin(mask).count("1") > 3:
+                self._chordsByMaskWithoutFifth.setdefault(mask & ~(1 << fifth), []).append((root, chordType))
+            # Every non-empty combination of the other pitch classes added to the chord
+            others = ~mask & 0xFFF
+            added = others
+            while added:
+                self._chordsBySuperset.setdefault(mask | added, []).append((root, chordType))
+                added = (added - 1) & others
+        self._recognized.clear()
+
+    def load(self, filename):
+        """
+        Register the chord types from a JSON file: a list of objects with "name", "interval" and "annotations"
+        """
+        with open(filename, encoding='utf-8') as f:
+            data = json.load(f)
+        for d in data:
+            self.register(ChordType(tuple(d["interval"]), d["name"], list(d.get("annotations", []))))
+
+    def getByName(self, name):
+        """Return the chord type with the given name, or None"""
+        return self._byName.get(name)
+
+    def getByAnnotation(self, annotation):
+        """Return the chord type with the given annotation, or None"""
+        return self._byAnnotation.get(annotation)
+
+    def getByInterval(self, interval):
+        """Return the chord type with the given intervals, or None"""
+        return self._byInterval.get(tuple(interval))
+
+    def recognize(self, pitchClasses) -> tuple:
+        """
+        Recognize the chords formed by the pitch classes, the first one being the lowest note. Return a tuple of
+        ChordMatch ranked from the best match: exact, inversions, chords with an omitted fifth and finally the chords
+        contained in the notes, the ones with the most notes first. Within each relation the chords rooted on the
+        lowest note come first. The chords are looked up in the reverse indexes built when the chord types are
+        registered, so that the recognition takes constant time. The ranked results are cached
+        """
+        pitchClasses = list(pitchClasses)
+        mask = pitchClassMask(pitchClasses)
+        bass = pitchClasses[0] if pitchClasses else None
+        try:
+            return self._recognized[mask, bass]
+        except KeyError:
+            pass
+
+        matches = []
+        for root, chordType in self._chordsByMask.get(mask, []):
+            relation = ChordRelation.exact if root == bass else ChordRelation.inversion
+            matches.append(ChordMatch(root, chordType, relation))
+        for root, chordType in self._chordsByMaskWithoutFifth.get(mask, []):
+            matches.append(ChordMatch(root, chordType, ChordRelation.omittedFifth))
+        for root, chordType in self._chordsBySuperset.get(mask, []):
+            matches.append(ChordMatch(root, chordType, ChordRelation.superset))
+
+        # Stable sort keeps the order of the chord types and roots within each rank
+        matches.sort(key=lambda m: (m.relation, -bin(chordMask(m.root, m.chordType)).count("1"), m.root != bass))
+        matches = tuple(matches)
+        self._recognized[mask, bass] = matches
+        return matches
+
+
+@lru_cache(maxsize=1024)
+def tokenizeNotes(s) -> tuple:
+    """
+    Find the notes in the string, separated by commas or spaces or written together (see _NOTE_WORDre). Sharps, flats
+    and German names are understood (see NOTE_TOKENre). Returns a tuple of NoteToken. The words which are not notes,
+    e.g. "major" or "Bad", give no tokens. The results are cached, as the same strings are tokenized again on every
+    keystroke in the editors of notes
+    """
+    tokens = []
+    for word in _NOTE_WORDre.finditer(s):
+        text = word.group()
+        pc = _TOKEN_PITCH_CLASSES.get(text)
+        if pc is not None:  # A single note, the most common word
+            tokens.append(NoteToken(*word.span(), pc))
+            continue
+        if _CAPITAL_NOTESre.fullmatch(text):
+            matches = NOTE_TOKENre.finditer(text)
+        elif _LOWERCASE_NOTESre.fullmatch(text):
+            matches = _LOWERCASE_TOKENre.finditer(text)
+        else:
+            continue
+        tokens += [NoteToken(word.start() + m.start(), word.start() + m.end(), _TOKEN_PITCH_CLASSES[m.group()])
+                   for m in matches]
+    return tuple(tokens)
+
+
 def notesFromString(s):
     """
-    Extract the valid note names from the input list and returns a list of notes.
+    Extract the valid note names from the input list and returns a list of notes, named as in NOTES
+    """
+    return [NOTES[token.pitchClass] for token in tokenizeNotes(s)]
+
+
+def pitchClass(note: str) -> int:
+    """
+    Return the pitch class (0-11) of the note. Flats and German names are understood as in NOTE_TOKENre
+    """
+    try:
+        return PITCH_CLASSES[note.upper()]
+    except KeyError:
+        return _TOKEN_PITCH_CLASSES[note]
+
+
+def pitchClassMask(pitchClasses) -> int:
+    """
+    Return the 12-bit mask of the pitch classes
+    """
+    mask = 0
+    for pc in pitchClasses:
+        mask |= 1 << pc
+    return mask
+
+
+def maskPitchClasses(mask: int) -> list:
+    """
+    Return the sorted list of the pitch classes in the mask
+    """
+    return [pc for pc in range(12) if mask >> pc & 1]
+
+
+def chordPitchClasses(root: int, chordIntervals=None) -> tuple:
+    """
+    Return the pitch classes of the notes in a chord, the first one being the root. Like getChordNotes, repeated notes
+    (e.g. the octave of the power chord) are kept
     """
-    notes = []
-    for substr in NOTEre.split(s):
-        if substr in NOTES:
-            notes.append(substr)
-    return notes
+    return _chordTable(chordIntervals)[root][0]
+
+
+def chordMask(root: int, chordIntervals=None) -> int:
+    """
+    Return the 12-bit mask of the pitch classes in a chord
+    """
+    return _chordTable(chordIntervals)[root][1]
 
 
 def getChordNotes(root: str, chordIntervals=None):
     """
     Determine the notes in a chord. Returns a list of notes, the first note being the root note
     """
-    assert root.upper() in NOTES
+    assert root.upper() in PITCH_CLASSES
+
+    notes = _chordTable(chordIntervals)[pitchClass(root)][2]
+    return [root] + list(notes[1:])
+
+
+# Tables of the chords on all twelve roots, keyed by the chord intervals. The entry of each root is a tuple
+# (pitch classes, mask, note names). ChordType itself is not hashable, as the annotations are a list
+_CHORD_TABLES = {}
+
 
+def _chordTable(chordIntervals):
     if chordIntervals is None:
         chordIntervals = ChordInterval.major
+    try:
+        return _CHORD_TABLES[chordIntervals.interval]
+    except KeyError:
+        pass
+    table = []
+    for root in range(12):
+        pcs = [root]
+        for intvl in chordIntervals.interval:
+            pcs.append((pcs[-1] + intvl) % 12)
+        table.append((tuple(pcs), pitchClassMask(pcs), tuple(NOTES[pc] for pc in pcs)))
+    table = tuple(table)
+    _CHORD_TABLES[chordIntervals.interval] = table
+    return table
 
-    allNotes = 3 * NOTES
-    noteIndex = allNotes.index(root.upper())
 
-    notes = [root]
+class ChordRelation(object):
+    """
+    How a set of notes relates to a recognized chord. Lower values are better matches
+    """
+    exact = 0  # The notes are the chord's notes and the lowest one is the root
+    inversion = 1  # The notes are the chord's notes, but the lowest one is not the root
+    omittedFifth = 2  # The notes are the chord's notes without the fifth
+    superset = 3  # The notes contain all notes of the chord and some more
+
+
+ChordMatch = namedtuple("ChordMatch", ["root", "chordType", "relation"])
+ChordMatch.root.__doc__ = "Pitch class of the chord's root"
+ChordMatch.chordType.__doc__ = "ChordType of the chord"
+ChordMatch.relation.__doc__ = "ChordRelation of the notes to the chord"
+
+
+def recognizeChord(pitchClasses) -> tuple:
+    """
+    Recognize the chords formed by the pitch classes among the registered chord types. See
+    ChordTypeRegistry.recognize
+    """
+    return CHORD_TYPES.recognize(pitchClasses)
 
-    for intvl in chordIntervals.interval:
-        noteIndex += intvl % 12
-        notes.append(allNotes[noteIndex])
 
-    return notes
+# Additional chord types, loaded at import if the file exists
+chord_types_file = os.path.join(os.path.dirname(__file__), "chord_types.json")
 
+CHORD_TYPES = ChordTypeRegistry()
+for _chordType in ChordInterval.getDefinedChordTypes():
+    CHORD_TYPES.register(_chordType)
+del _chordType
+if os.path.exists(chord_types_file):
+    CHORD_TYPES.load(chord_types_file)
 
 CHORD_SUFFIXES = r"(\+|0|6|6\/9|7|7b5|7sus4|9|sus2|sus4|add9)?"
 CHORD_ENGLISH = re.compile(r"[A-G]#?m?" + CHORD_SUFFIXES)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['PageTemplate']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import re
+from operator import itemgetter
+
+
+class _Values(dict):
+    """Placeholder values. Placeholders without value are left unchanged"""
+
+    def __missing__(self, key):
+        return "${" + key + "}"
+
+
+class PageTemplate(object):
+    """
+    A page template compiled once, so that a page can be rendered in a single pass.
+
+    The template is compiled into one format string, in which the ${placeholders} and the navigation anchors are
+    indexed slots. Navigation anchors are the <p><a href="./...">...</a></p> paragraphs. An anchor can be rendered
+    highlighted, i.e. as a <p class="highlight">...</p> paragraph without the hyperlink.
+    """
+
+    placeholderRe = re.compile(r"\$\{(\w+)\}")
+    anchorRe = re.compile(r'<p><a href="\./([^"]*)">([^<]*)</a></p>')
+
+    def __init__(self, text):
+        self.anchors = []  # (href, text) of the anchors as format strings
+        self.anchorSlots = []  # Names of the slots of the anchors in the format string
+
+        fragments = []
+        names = []  # Names of the placeholders used by the anchors
+        pos = 0
+        for i, m in enumerate(PageTemplate.anchorRe.finditer(text)):
+            fragments.append(PageTemplate.toFormat(text[pos:m.start()]))
+            slot = f"_anchor{i}"
+            fragments.append("{" + slot + "}")
+            self.anchorSlots.append(slot)
+            self.anchors.append((PageTemplate.toFormat(m.group(1)), PageTemplate.toFormat(m.group(2))))
+            names += [n for n in PageTemplate.placeholderRe.findall(m.group(0)) if n not in names]
+            pos = m.end()
+        fragments.append(PageTemplate.toFormat(text[pos:]))
+        self.format = "".join(fragments)
+
+        self._anchorKey = itemgetter(*names) if names else lambda values: None
+        # Rendered anchors, keyed by the values of the placeholders they use. See _renderAnchors
+        self._renderedAnchors = {}
+
+    @staticmethod
+    def toFormat(text):
+        """Convert the text with ${placeholders} to a format string"""
+        fragments = PageTemplate.placeholderRe.split(text)
+        # Every odd fragment is a placeholder name
+        return "".join("{" + f + "}" if i % 2 else f.replace("{", "{{").replace("}", "}}")
+                       for i, f in enumerate(fragments))
+
+    @staticmethod
+    def fixHref(href):
+        """Make the link target a valid file name, as the files with sharp notes are named"""
+        return href.replace("#_", "_sharp_")
+
+    def _renderAnchors(self, values):
+        """
+        Return the anchors rendered with given values as
+        - dictionary of the anchor slots filled with links
+        - list of the anchors rendered highlighted
+        - dictionary of the anchor indices, keyed by the anchors' target and text
+        """
+        key = self._anchorKey(values)
+        try:
+            return self._renderedAnchors[key]
+        except KeyError:
+            pass
+        links = {}
+        highlighted = []
+        positions = {}
+        for i, (hrefFormat, textFormat) in enumerate(self.anchors):
+            href = PageTemplate.fixHref(hrefFormat.format_map(values))
+            text = textFormat.format_map(values)
+            links[self.anchorSlots[i]] = f'<p><a href="./{href}">{text}</a></p>'
+            highlighted.append(f'<p class="highlight">{text}</p>')
+            positions.setdefault((href, text), []).append(i)
+        rendered = (links, highlighted, positions)
+        self._renderedAnchors[key] = rendered
+        return rendered
+
+    def render(self, values, highlight=()):
+        """
+        Render the page.
+
+        values - dictionary of the placeholder values
+        highlight - sequence of (href, text, count) tuples. Up to count (all, if count is negative) anchors with the
+                    given target and text are highlighted, in the order of the tuples
+        """
+        values = _Values(values)
+        links, highlighted, positions = self._renderAnchors(values)
+        values.update(links)
+        used = set()
+        for href, text, count in highlight:
+            for i in positions.get((href, text), ()):
+                if count == 0:
+                    break
+                if i in used:
+                    continue
+                used.add(i)
+                values[self.anchorSlots[i]] = highlighted[i]
+                count -= 1
+        return self.format.format_map(values)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['SvgDocument']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+from xml.sax.saxutils import escape, quoteattr
+
+
+def num(x):
+    """Format a coordinate compactly"""
+    return "{:g}".format(round(x, 2))
+
+
+class SvgDocument(object):
+    """
+    A minimal builder of compact SVG images.
+
+    - Lines of the same width and color are merged into a single <path>
+    - Repeated elements (e.g. note annotations) are defined once in <defs> and placed with <use>
+
+    All ids are prefixed with idPrefix, so that several documents can be inlined in one XHTML page
+    """
+
+    def __init__(self, width, height, idPrefix="", fontFamily="sans-serif"):
+        self.width = width
+        self.height = height
+        self.idPrefix = idPrefix
+        self.fontFamily = fontFamily
+        self.defs = {}  # (id, markup) of the definitions, keyed by what they define
+        self.background = None
+        self.shapes = []  # Markup of the shapes drawn under the lines
+        self.paths = {}  # Path data of the lines, keyed by (width, color)
+        self.items = []  # Markup of the items drawn over the lines
+
+    def define(self, key, markup):
+        """
+        Define an element in <defs> unless an element with the same key is already defined. Return the element's id.
+        The "{id}" in the markup is replaced with the element's id
+        """
+        try:
+            return self.defs[key][0]
+        except KeyError:
+            pass
+        elementId = "{}d{}".format(self.idPrefix, len(self.defs))
+        self.defs[key] = (elementId, markup.replace("{id}", elementId))
+        return elementId
+
+    def fill(self, color):
+        self.background = color
+
+    def line(self, x1, y1, x2, y2, width=1, color="#000"):
+        path = self.paths.setdefault((width, color), [])
+        path.append("M{} {}L{} {}".format(num(x1), num(y1), num(x2), num(y2)))
+
+    def ellipse(self, cx, cy, rx, ry, fill="#000", stroke=None, width=1, over=False):
+        """
+        Draw an ellipse under the lines, or over them, if over is True
+        """
+        if rx == ry:
+            markup = '<circle cx="{}" cy="{}" r="{}"'.format(num(cx), num(cy), num(rx))
+        else:
+            markup = '<ellipse cx="{}" cy="{}" rx="{}" ry="{}"'.format(num(cx), num(cy), num(rx), num(ry))
+        markup += SvgDocument._paint(fill, stroke, width) + "/>"
+        (self.items if over else self.shapes).append(markup)
+
+    def text(self, x, y, text, size, color="#000", bold=False, rotate=None, family=None):
+        """
+        Write the text centered at the point, optionally rotated by the angle (degrees) around that point
+        """
+        self.items.append(SvgDocument.textMarkup(x, y, text, size, color, bold, rotate, family))
+
+    @staticmethod
+    def textMarkup(x, y, text, size, color="#000", bold=False, rotate=None, family=None):
+        # Shift the baseline down, so that the text is centered vertically. dominant-baseline or dy would do that too,
+        # but they are not supported by all renderers
+        markup = '<text x="{}" y="{}" font-size="{}"'.format(num(x), num(y + 0.35 * size), num(size))
+        if family is not None:
+            markup += ' font-family={}'.format(quoteattr(family))
+        if color not in ("#000", "#000000"):
+            markup += ' fill="{}"'.format(color)
+        if bold:
+            markup += ' font-weight="bold"'
+        if rotate:
+            markup += ' transform="rotate({} {} {})"'.format(num(rotate), num(x), num(y))
+        return markup + ">{}</text>".format(escape(text))
+
+    @staticmethod
+    def _paint(fill, stroke, width):
+        markup = ' fill="{}"'.format(fill if fill else "none")
+        if stroke:
+            markup += ' stroke="{}"'.format(stroke)
+            if width != 1:
+                markup += ' stroke-width="{}"'.format(num(width))
+        return markup
+
+    def use(self, elementId, x, y):
+        """Place the element defined in <defs> with the origin at the point"""
+        self.items.append('<use href="#{0}" xlink:href="#{0}" x="{1}" y="{2}"/>'.format(elementId, num(x), num(y)))
+
+    def toString(self):
+        """
+        Return the SVG markup. The document can be both written to a file and inlined in XHTML
+        """
+        output = ['<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                  'width="{0}" height="{1}" viewBox="0 0 {0} {1}">'.format(num(self.width), num(self.height))]
+        if self.defs:
+            output.append("<defs>")
+            output += [markup for elementId, markup in self.defs.values()]
+            output.append("</defs>")
+        if self.background is not None:
+            output.append('<rect width="100%" height="100%" fill="{}"/>'.format(self.background))
+        output += self.shapes
+        for (width, color), path in self.paths.items():
+            output.append('<path d="{}" stroke="{}" stroke-width="{}" stroke-linecap="square"/>'.format(
+                "".join(path), color, num(width)))
+        # Text is centered around the given points
+        output.append('<g font-family={} text-anchor="middle">'.format(
+            quoteattr(self.fontFamily)))
+        output += self.items
+        output.append("</g>")
+        output.append("</svg>")
+        return "\n".join(output)
@@ -29,6 +29,31 @@ class TestChordSelector(unittest.TestCase):
             self.assertFalse(btn.isChecked())
         self.assertTrue(self.widget.chordRootButtons.exclusive())
 
+    def test_updateChordFromText(self):
+        self.widget.chordNotesEdit.setText("E, G, C")
+        self.widget.updateChordFromText()
+        self.assertEqual("C", self.widget.chordRootButtons.checkedButton().text())
+        self.assertEqual("major", self.widget.chordTypeComboBox.currentText())
+
+        self.widget.chordNotesEdit.setText("D# F# A C")
+        self.widget.updateChordFromText()
+        self.assertEqual("D#", self.widget.chordRootButtons.checkedButton().text())
+        self.assertEqual("diminished 7th", self.widget.chordTypeComboBox.currentText())
+
+        self.widget.chordNotesEdit.setText("C, E, G, D")
+        self.widget.updateChordFromText()
+        self.assertEqual("C", self.widget.chordRootButtons.checkedButton().text())
+        self.assertEqual("added 9th", self.widget.chordTypeComboBox.currentText())
+
+        self.widget.chordNotesEdit.setText("C, E, G, F#")
+        self.widget.updateChordFromText()
+        self.assertIsNone(self.widget.chordRootButtons.checkedButton())
+
+        # C7 without the fifth is not selected, it would add G
+        self.widget.chordNotesEdit.setText("C, E, A#")
+        self.widget.updateChordFromText()
+        self.assertIsNone(self.widget.chordRootButtons.checkedButton())
+
 
 if __name__ == '__main__':
     unittest.main()
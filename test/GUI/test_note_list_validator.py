@@ -30,9 +30,25 @@ class TestNoteListValidator(unittest.TestCase):
 
         self.assertEqual((QValidator.Intermediate, "A , C#,", 2), self.validator.validate("A , C#,", 2))
         self.assertEqual((QValidator.Intermediate, "A , C# ,  C, ", 54), self.validator.validate("A , C# ,  C, ", 54))
+        self.assertEqual((QValidator.Acceptable, "Bb, Es, H", 2), self.validator.validate("Bb, es, h", 2))
+        # A lowercase b is a note, not a flat
+        self.assertEqual((QValidator.Acceptable, "DBGDG", 5), self.validator.validate("dbgdg", 5))
+        self.assertEqual((QValidator.Acceptable, " E, A", 2), self.validator.validate(" e, a", 2))
+        self.assertEqual((QValidator.Acceptable, "Eb, Bb", 2), self.validator.validate("eb, bb", 2))
+        # The German names can be typed letter by letter
+        self.assertEqual((QValidator.Intermediate, "A, Ci", 5), self.validator.validate("A, ci", 5))
+        self.assertEqual((QValidator.Intermediate, "De", 2), self.validator.validate("De", 2))
+        self.assertEqual((QValidator.Acceptable, "A, Cis", 6), self.validator.validate("A, Cis", 6))
 
         self.assertEqual((QValidator.Invalid, "A major", 0), self.validator.validate("A major", 0))
         self.assertEqual((QValidator.Invalid, "K#", 32), self.validator.validate("K#", 32))
+        self.assertEqual((QValidator.Invalid, ", A", 0), self.validator.validate(", A", 0))
+        self.assertEqual((QValidator.Invalid, "A, , C", 0), self.validator.validate("A, , C", 0))
+        # Words are not notes
+        self.assertEqual((QValidator.Invalid, "Bad", 3), self.validator.validate("Bad", 3))
+        self.assertEqual((QValidator.Invalid, "A, Bad", 6), self.validator.validate("A, Bad", 6))
+        self.assertEqual((QValidator.Invalid, "ebEb", 4), self.validator.validate("ebEb", 4))
+        self.assertEqual((QValidator.Invalid, "A Ci", 4), self.validator.validate("A Ci", 4))
 
         if __name__ == '__main__':
             unittest.main()
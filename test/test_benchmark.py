@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestBenchmark']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import unittest
+
+from music_theory import notesFromString
+from tools.benchmark import Stage, percentiles, splitNotes
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_percentiles(self):
+        self.assertEqual({}, percentiles([]))
+        result = percentiles([float(i) for i in range(100, 0, -1)])
+        self.assertEqual({"mean": 50.5, "max": 100.0, "p50": 50.0, "p90": 90.0, "p99": 99.0}, result)
+        self.assertEqual(3.0, percentiles([3.0])["p99"])
+
+    def test_stage(self):
+        items = []
+        result = Stage(traceMemory=True).run(items.append, range(5))
+        self.assertEqual(list(range(5)), items)
+        self.assertEqual(5, result["count"])
+        self.assertLessEqual(result["itemSeconds"], result["wallSeconds"])
+        self.assertEqual({"mean", "max", "p50", "p90", "p99"}, set(result["latencyMs"]))
+        self.assertIn("pythonPeakKiB", result)
+        self.assertNotIn("pythonPeakKiB", Stage().run(items.append, []))
+
+        # The memory is the stage's own, not the one of the stages before
+        big = Stage(traceMemory=True).run(lambda _: bytearray(64 << 20), [None])
+        small = Stage(traceMemory=True).run(items.append, range(5))
+        self.assertGreater(big["pythonPeakKiB"], 60 << 10)
+        self.assertLess(small["pythonPeakKiB"], 1024)
+        if small["maxRssGrowthKiB"] is not None:
+            self.assertLess(small["maxRssGrowthKiB"], 1024)
+
+    def test_splitNotes(self):
+        # The former tokenizer, kept for the comparison, finds the same plain notes
+        for s in ("EBGDAE", "DADF#AD", "E, B, G, D, A, E", "G# C"):
+            self.assertEqual(notesFromString(s), splitNotes(s))
+
+
+if __name__ == '__main__':
+    unittest.main()
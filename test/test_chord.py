@@ -10,7 +10,9 @@ __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 
 import unittest
 
-from chord import Chord
+import sys
+
+from chord import Chord, PackedChord, ChordName, parseChordName, transposeChordName
 
 
 class TestChord(unittest.TestCase):
@@ -23,6 +25,47 @@ class TestChord(unittest.TestCase):
         self.assertEqual("D_minor_7", Chord("d7", 0).toString)
         self.assertEqual("D_sharp_minor_7", Chord("dis7", 0).toString)
         self.assertEqual("A_sharp_minor_6by9", Chord("as6/9", 0).toString)
+        self.assertRaises(ValueError, lambda: Chord("Cmaj", 0).toString)
+
+    def test_parseChordName(self):
+        self.assertEqual(ChordName("D#", True, "7"), parseChordName("D#m7"))
+        self.assertEqual(ChordName("D#", True, "7"), parseChordName("dis7"))
+        self.assertEqual(ChordName("C", False, ""), parseChordName("C"))
+        self.assertIs(parseChordName("C"), parseChordName("C"))
+
+    def test_transposeChordName(self):
+        self.assertEqual("Cm", transposeChordName("A#m", 2))
+        self.assertEqual("dis7", transposeChordName("cis7", 2))
+        self.assertEqual("Cis", transposeChordName("H", 2))
+        self.assertEqual("Fsus4", transposeChordName("Esus4", 1))
+        self.assertEqual("A#M7", transposeChordName("CM7", -2))
+        self.assertRaises(ValueError, transposeChordName, "maj7", 1)
+
+    def test_PackedChord(self):
+        chords = [Chord("C", ((2, 2), (0, 0), (1, 1), (2, 3)), prefix="banjo_"),
+                  Chord("C", (None, 3, 2, 0, 1, 0)),
+                  Chord("d7", (None, None, 0, (2, None), 1, 1), suffix="_alt")]
+        for chord in chords:
+            packed = PackedChord.fromChord(chord)
+            self.assertEqual(chord, packed.toChord())
+            self.assertEqual(len(chord), len(packed))
+            self.assertEqual(chord.toString, packed.toString)
+            self.assertEqual(packed, PackedChord.fromChord(chord))
+            self.assertEqual(hash(packed), hash(PackedChord.fromChord(chord)))
+            self.assertEqual(chord, packed)
+            self.assertEqual(packed, chord)
+            self.assertEqual(hash(chord), hash(packed))
+            for i in range(len(chord)):
+                self.assertEqual(chord.fret(i), packed.fret(i))
+                self.assertEqual(chord.finger(i), packed.finger(i))
+        packed = PackedChord.fromChord(chords[1])
+        self.assertIsNone(packed.fret(0))
+        self.assertIsNone(chords[1].fret(0))
+        self.assertIsNone(packed.finger(1))
+        self.assertNotEqual(chords[2], PackedChord.fromChord(chords[1]))
+        self.assertFalse(hasattr(packed, "__dict__"))
+        self.assertLess(sys.getsizeof(packed) + sys.getsizeof(packed.frets),
+                        sys.getsizeof(chords[1]) + sys.getsizeof(chords[1].scheme))
 
 
 if __name__ == '__main__':
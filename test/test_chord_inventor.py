@@ -13,38 +13,110 @@ from Instruments.banjo import Banjo_5string
 from Instruments.guitar import Guitar
 from chord_inventor import ChordInventor
 from music_theory import NOTES, ChordInterval
-from chord import Chord
+from chord import Chord, PackedChord
+
 
-@unittest.skip('An abandoned class.')
 class TestChordInventor(unittest.TestCase):
     def test_buildChords_guitar_major(self):
         g = Guitar()
         inv = ChordInventor(g)
-        # ToDo: Add asserts
         chords = {note: inv.buildChords(note, ChordInterval.major) for note in NOTES}
         for note, chord in chords.items():
+            self.assertTrue(chord)
             for c in chord:
-                self.assertIn(c, g.chords)
+                self.assertIsInstance(c, PackedChord)
+                self.assertEqual(note, c.name)
+                self.assertEqual(len(g.strings), len(c))
+
+        for c in g.chords:
+            if c.name in chords:
+                self.assertIn(Chord(c.name, frets(c)), chords[c.name])
 
-        # ToDo: Check more chords
+        self.assertIn(Chord("D", (None, 0, 0, 2, 3, 2)), set(chords["D"]))
         self.assertIn(Chord("D", (None, 0, 0, 2, 3, 2)), chords["D"])
         self.assertIn(Chord("D", (5, 5, 7, 7, 7, 5)), chords["D"])
 
         self.assertIn(Chord("E", (0, 2, 2, 1, 0, 0)), chords["E"])
 
-        self.assertIn(Chord("G", (2, 3, 0, 0, 0, 2)), chords["G"])
+        self.assertIn(Chord("G", (3, 2, 0, 0, 0, 3)), chords["G"])
+
+        # The inner strings are not muted and the chord notes are complete
+        self.assertNotIn(Chord("G", (3, None, 0, 0, 0, 3)), chords["G"])
+        self.assertIn(Chord("G", (3, 5, 5, 4, 3, 3)), chords["G"])
+        self.assertNotIn(Chord("G", (3, 5, 5, 0, 3, 3)), chords["G"])
 
     def test_buildChords_guitar_minor(self):
         g = Guitar()
         inv = ChordInventor(g)
-        # ToDo: Add asserts
-        chords = {note.lower(): inv.buildChords(note, ChordInterval.minor) for note in NOTES}
-        for note, chord in chords.items():
-            for c in chord:
-                self.assertIn(c, g.chords)
+        chords = {note.lower(): inv.buildChords(note, ChordInterval.minor, note.lower()) for note in NOTES}
 
-        # ToDo: Check more chords
         self.assertIn(Chord("e", (0, 2, 2, 0, 0, 0)), chords['e'])
+        self.assertIn(Chord("a", (None, 0, 2, 2, 1, 0)), chords['a'])
+
+    def test_buildChords_rules(self):
+        g = Guitar()
+        inv = ChordInventor(g)
+        # Needs a barre: five fingers otherwise
+        self.assertIn(Chord("F", (1, 3, 3, 2, 1, 1)), inv.buildChords("F"))
+        self.assertNotIn(Chord("F", (1, 3, 3, 2, 2, 1)), inv.buildChords("F"))
+        # Too far stretched
+        self.assertNotIn(Chord("C", (None, 3, 2, 0, 1, 8)), inv.buildChords("C"))
+        inv.maxFingerStretch = 8
+        self.assertIn(Chord("C", (None, 3, 2, 0, 1, 8)), inv.buildChords("C"))
+
+        inv.allowInnerMutes = True
+        self.assertIn(Chord("G", (3, None, 0, 0, 0, 3)), inv.buildChords("G"))
+
+    def test_buildChords_banjo(self):
+        b = Banjo_5string()
+        inv = ChordInventor(b)
+        for name, chordType in (("C", ChordInterval.major), ("c7", ChordInterval.min_7)):
+            chords = [c.scheme for c in inv.buildChords("C", chordType)]
+            # The 5th string starts at the 5th fret: it can only be played open there or pressed above it
+            for scheme in chords:
+                self.assertTrue(scheme[0] is None or scheme[0] >= 5)
+            # The chords defined for the banjo omit the 5th string, G, which belongs to both chords
+            for c in b.chords:
+                if c.name == name:
+                    self.assertIn((5,) + frets(c), chords)
+
+    def test_bestChords(self):
+        g = Guitar()
+        inv = ChordInventor(g)
+        self.assertEqual([Chord("E", (0, 2, 2, 1, 0, 0))], inv.bestChords("E", ChordInterval.major, 1))
+        self.assertEqual(Chord("a", (None, 0, 2, 2, 1, 0)), inv.bestChords("A", ChordInterval.minor, 3, "a")[0])
+
+        for note, chordType in (("G", ChordInterval.major), ("F#", ChordInterval.min_7), ("C", ChordInterval.dim7)):
+            costs = sorted(inv.voicingCost(c.scheme, note) for c in inv.buildChords(note, chordType))
+            best = inv.bestChords(note, chordType, 5)
+            self.assertEqual(costs[:5], [inv.voicingCost(c.scheme, note) for c in best])
+
+        # Fewer voicings than asked for
+        inv.maxFingerStretch = 2
+        self.assertEqual(len(inv.buildChords("C", ChordInterval.dominant_7)),
+                         len(inv.bestChords("C", ChordInterval.dominant_7, 1000)))
+
+    def test_voicingCost(self):
+        g = Guitar()
+        inv = ChordInventor(g)
+        # Span of 1 fret, highest fret 2
+        self.assertEqual(1 + 0.5 * 2, inv.voicingCost((0, 2, 2, 1, 0, 0), "E"))
+        # The bass note is not the root
+        self.assertEqual(1 + 0.5 * 3 + 1 + 3, inv.voicingCost((None, 0, 0, 2, 3, 2), "D"))
+        # Barre
+        self.assertEqual(2 + 0.5 * 3 + 2, inv.voicingCost((1, 3, 3, 2, 1, 1), "F"))
+
+    def test_buildCatalogue(self):
+        for instrument in (Guitar(), Banjo_5string()):
+            inv = ChordInventor(instrument)
+            catalogue = inv.buildCatalogue([ChordInterval.major, ChordInterval.min_7, ChordInterval.power])
+            self.assertEqual((len(catalogue.roots), len(instrument.strings)), catalogue.schemes.shape)
+            # Same voicings as found one by one
+            for chordType in catalogue.chordTypes:
+                for note in NOTES:
+                    expected = [tuple(-1 if f is None else f for f in c.scheme)
+                                for c in inv.buildChords(note, chordType)]
+                    self.assertEqual(sorted(expected), sorted(map(tuple, catalogue.select(note, chordType).tolist())))
 
     def test_figureOutStrings(self):
         g = Guitar()
@@ -83,5 +155,10 @@ class TestChordInventor(unittest.TestCase):
         self.assertEqual([D, B, G, D2, G2], inv.notes)
 
 
+def frets(chord):
+    """Return the scheme of the chord without the fingers"""
+    return tuple(c if c is None or isinstance(c, int) else c[0] for c in chord.scheme)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestChordLibrary']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import unittest
+
+from Instruments.banjo import Banjo_5string
+from chord import Chord
+from chord_library import ChordLibrary
+from music_theory import ChordInterval
+
+
+class TestChordLibrary(unittest.TestCase):
+    def test_listView(self):
+        chords = [Chord("C", (None, 3, 2, 0, 1, 0)), Chord("Am", [None, 0, 2, 2, 1, 0]),
+                  Chord("C", (8, 10, 10, 9, 8, 8))]
+        library = ChordLibrary(chords)
+        self.assertFalse(library.add(Chord("C", (None, 3, 2, 0, 1, 0))))
+        library.append(Chord("Am", (None, 0, 2, 2, 1, 0)))
+        self.assertEqual(3, len(library))
+        self.assertEqual(chords[0], library[0])
+        self.assertEqual((None, 0, 2, 2, 1, 0), library[1].scheme)
+        self.assertEqual(chords[2], library[-1])
+        self.assertEqual([chords[0], Chord("Am", (None, 0, 2, 2, 1, 0)), chords[2]], list(library))
+        self.assertEqual(chords[2:], library[2:])
+        self.assertIn(chords[2], library)
+        self.assertNotIn(Chord("C", (None, 3, 2, 0, 1, 1)), library)
+
+    def test_find(self):
+        library = Banjo_5string().chords
+        self.assertEqual(75, len(library))
+        c7 = library.find(name="C7")
+        self.assertEqual(6, len(c7))
+        self.assertEqual(c7, library.find(root="C", chordType=ChordInterval.dominant_7))
+        self.assertEqual(c7, library.find(root=0, chordType="dominant 7th", prefix="banjo_"))
+        self.assertEqual([c for c in library if c.name in ("H", "h", "H7")], library.find(root="B"))
+        self.assertEqual(1, ChordLibrary.lowestFret(library[0]))
+        self.assertEqual([c for c in library if ChordLibrary.lowestFret(c) == 1], library.find(lowestFret=1))
+        self.assertEqual([Chord("C", ((5, 1), (5, 1), (5, 1), (5, 1)), "banjo_"),
+                          Chord("C7", ((5, 1), (5, 1), (5, 1), (8, 4)), "banjo_"),
+                          Chord("C7", ((8, 4), (5, 1), (5, 1), (5, 1)), "banjo_")],
+                         library.find(root="C", lowestFret=5))
+        self.assertEqual([], library.find(prefix="guitar"))
+        self.assertEqual(list(library), library.find())
+
+        # Chords added after a lookup are indexed too
+        library.add(Chord("CM7", (5, 4, 5, 5), prefix="banjo_"))
+        self.assertEqual(["CM7"], [c.name for c in library.find(chordType=ChordInterval.major_7)])
+
+    def test_columns(self):
+        library = Banjo_5string().chords
+        columns = library.toColumns()
+        self.assertEqual(len(library), columns["count"])
+        self.assertEqual(4, columns["width"])
+        self.assertEqual(["banjo_"], columns["prefixes"])
+
+        restored = ChordLibrary.fromColumns(columns)
+        self.assertEqual(len(library), len(restored))
+        self.assertEqual(list(library), list(restored))
+        self.assertEqual(library.find(name="C7"), restored.find(name="C7"))
+
+        mixed = ChordLibrary([Chord("C", (None, 3, 2, 0, 1, 0)), Chord("G7", (0, 0, 0, (3, None)), "", "_alt")])
+        restored = ChordLibrary.fromColumns(mixed.toColumns()).freeze()
+        self.assertEqual(list(mixed), list(restored))
+        self.assertRaises(ValueError, restored.add, Chord("C", (None, 3, 2, 0, 1, 3)))
+        self.assertEqual([], list(ChordLibrary.fromColumns(ChordLibrary().toColumns())))
+
+    def test_rootAndType(self):
+        self.assertEqual((3, ChordInterval.min_7), ChordLibrary.rootAndType("dis7"))
+        self.assertEqual((1, ChordInterval.major_7), ChordLibrary.rootAndType("C#M7"))
+        self.assertEqual((None, None), ChordLibrary.rootAndType("unknown"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestChordPainter']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import unittest
+import xml.dom.minidom
+
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QColor
+
+from Instruments.banjo import Banjo_5string
+from chord import Chord, PackedChord
+from chord_painter import ChordPainter
+from test.GUI.gui_test_app import app
+
+
+class TestChordPainter(unittest.TestCase):
+    def setUp(self):
+        self.instrument = Banjo_5string()
+        # Muted, open and fingered strings
+        self.chord = Chord("G7", (-1, 0, (3, 2), (1, 1)))
+        self.size = QSize(100, 120)
+
+    def test_lifecycle(self):
+        painter = ChordPainter(self.chord, self.size, self.instrument)
+        with painter as p:
+            self.assertIs(painter, p)
+            self.assertTrue(painter.p.isActive())
+            painter.drawEmpty()
+            painter.drawChord()
+        self.assertFalse(painter.p.isActive())
+        self.assertEqual(self.size, painter.size())
+
+        explicit = ChordPainter(self.chord, self.size, self.instrument)
+        explicit.begin()
+        explicit.drawEmpty()
+        explicit.drawChord()
+        explicit.end()
+        self.assertEqual(painter.image, explicit.image)
+
+        empty = ChordPainter(self.chord, self.size, self.instrument)
+        with empty:
+            empty.drawEmpty()
+        self.assertNotEqual(empty.image, painter.image)
+        white = QColor(Qt.white).rgb()
+        self.assertTrue(any(empty.image.pixel(x, y) != white for x in range(self.size.width())
+                            for y in range(self.size.height())))
+
+    def test_toSvg(self):
+        painter = ChordPainter(self.chord, self.size, self.instrument)
+        dom = xml.dom.minidom.parseString(painter.toSvg("chord_"))
+        svg = dom.documentElement
+        self.assertEqual("100", svg.getAttribute("width"))
+        self.assertEqual("120", svg.getAttribute("height"))
+        # One symbol on every string, each kind of symbol defined once
+        uses = dom.getElementsByTagName("use")
+        self.assertEqual(len(self.chord.scheme), len(uses))
+        ids = [g.getAttribute("id") for g in dom.getElementsByTagName("g") if g.hasAttribute("id")]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertTrue(all(i.startswith("chord_") for i in ids))
+        self.assertEqual(set(ids), {use.getAttribute("href")[1:] for use in uses})
+
+    def test_mutedAsNone(self):
+        images = []
+        for chord in (self.chord, Chord("G7", (None, 0, (3, 2), (1, 1))),
+                      PackedChord.fromChord(Chord("G7", (None, 0, (3, 2), (1, 1))))):
+            painter = ChordPainter(chord, self.size, self.instrument)
+            with painter:
+                painter.drawEmpty()
+                painter.drawChord()
+            images.append(painter.image)
+        self.assertEqual(images[0], images[1])
+        self.assertEqual(images[0], images[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
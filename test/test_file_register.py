@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestFileRegister']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import os
+import tempfile
+import unittest
+
+from file_register import FileRegister
+
+
+class TestFileRegister(unittest.TestCase):
+    def test_manifest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = os.path.join(tmp, "manifest.json")
+            file = os.path.join(tmp, "image.png")
+            inputs = FileRegister.inputsHash(list("DBGDG"), [0, 0, 0, 0, 5], ["G", "B", "D"])
+
+            register = FileRegister(manifest=manifest)
+            self.assertFalse(register.isUpToDate(file, inputs))
+            with open(file, 'w') as f:
+                f.write("image")
+            self.assertFalse(register.isUpToDate(file, inputs))
+            register.record(file, inputs)
+            self.assertTrue(register.isUpToDate(file, inputs))
+            self.assertEqual(1, register.rebuilt)
+            register.save()
+
+            register = FileRegister(manifest=manifest)
+            self.assertTrue(register.isUpToDate(file, inputs))
+            self.assertFalse(register.isUpToDate(file, FileRegister.inputsHash(list("DCGCG"))))
+            self.assertEqual(0, register.rebuilt)
+
+            os.remove(file)
+            self.assertFalse(register.isUpToDate(file, inputs))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestFretboardPainter']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import unittest
+import xml.dom.minidom
+
+import numpy as np
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QImage
+
+from Instruments.banjo import Banjo_5string
+from fretboard_painter import FretboardPainter
+from generate_htmls import fretboardImage, fretboardSize
+from music_theory import ChordInterval, getChordNotes
+from test.GUI.gui_test_app import app
+
+
+def pixels(image):
+    """Return the pixels of the image as a (height x width x 4) array"""
+    image = image.convertToFormat(QImage.Format_RGB32)
+    bits = image.constBits()
+    bits.setsize(image.byteCount())
+    return np.frombuffer(bits, np.uint8).reshape(image.height(), image.width(), 4).copy()
+
+
+class TestFretboardPainter(unittest.TestCase):
+    def setUp(self):
+        self.instrument = Banjo_5string()
+        self.notes = getChordNotes("D#", ChordInterval.minor)
+
+    def test_lifecycle(self):
+        painter = FretboardPainter(fretboardSize(self.instrument), self.instrument)
+        painter.setChordNotes(self.notes)
+        with painter as p:
+            self.assertIs(painter, p)
+            self.assertTrue(painter.p.isActive())
+            painter.draw()
+        self.assertFalse(painter.p.isActive())
+        self.assertEqual(fretboardSize(self.instrument), painter.image.size())
+
+        explicit = FretboardPainter(fretboardSize(self.instrument), self.instrument)
+        explicit.setChordNotes(self.notes)
+        explicit.begin()
+        explicit.draw()
+        explicit.end()
+        self.assertEqual(painter.image, explicit.image)
+        # Something was painted, the root notes in black
+        self.assertIn(QColor(Qt.black).rgb(), {painter.image.pixel(x, y) for x in range(0, painter.image.width(), 2)
+                                               for y in range(0, painter.image.height(), 2)})
+
+    def test_layered(self):
+        direct = pixels(fretboardImage(self.instrument, "D#", ChordInterval.minor))
+        layered = pixels(fretboardImage(self.instrument, "D#", ChordInterval.minor, layered=True))
+        self.assertEqual(direct.shape, layered.shape)
+        # The layered images differ only in a few antialiased edge pixels
+        difference = np.abs(direct.astype(int) - layered).max(axis=2)
+        self.assertLessEqual(difference.max(), 16)
+        self.assertLess(np.count_nonzero(difference), direct.shape[0] * direct.shape[1] // 1000)
+        # A different chord is painted over the same cached base layer
+        other = pixels(fretboardImage(self.instrument, "G", ChordInterval.major, layered=True))
+        self.assertFalse((other == layered).all())
+
+    def test_toSvg(self):
+        painter = FretboardPainter(fretboardSize(self.instrument), self.instrument)
+        painter.setChordNotes(self.notes)
+        dom = xml.dom.minidom.parseString(painter.toSvg("img_"))
+        svg = dom.documentElement
+        self.assertEqual(str(painter.image.width()), svg.getAttribute("width"))
+        self.assertEqual(str(painter.image.height()), svg.getAttribute("height"))
+        # A note annotation is placed on every cell, the marked notes are circles defined once for each note and style
+        self.assertEqual(len(self.instrument.strings) * (self.instrument.nfrets + 1)
+                         - sum(self.instrument.rootfrets), len(dom.getElementsByTagName("use")))
+        self.assertTrue(all(use.getAttribute("href").startswith("#img_") for use in dom.getElementsByTagName("use")))
+        # The chord notes are marked with circles, the root in bold
+        marked = [g for g in dom.getElementsByTagName("g") if g.getElementsByTagName("circle")]
+        self.assertEqual(self.notes, [g.getElementsByTagName("text")[0].firstChild.data for g in marked])
+        self.assertEqual(["bold", "", ""], [g.getElementsByTagName("text")[0].getAttribute("font-weight")
+                                            for g in marked])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,9 +8,11 @@ __date__ = '2022-01-16'
 
 import unittest
 import os
+import tempfile
 
 from music_theory import ChordInterval
-from generate_htmls import writeHtml
+from generate_htmls import writeHtml, getPageJobs, getAtlasJobs, atlasStyleSheet, JobFilter, imageFileName, renderHtml
+from voicing_database import VoicingDatabase
 
 
 class TestGenerateHtmls(unittest.TestCase):
@@ -40,6 +42,59 @@ class TestGenerateHtmls(unittest.TestCase):
 
         self.assertEqual(expected, actual)
 
+    def test_getPageJobs(self):
+        pages = getPageJobs()
+        page = next(pages)
+        self.assertEqual("banjo_C_major.xhtml", page.htmName)
+        self.assertEqual(["./img/banjo_openG___C_major.png", "./img/banjo_doubleC_C_major.png"],
+                         [imageFileName(job) for job in page.images])
+        self.assertEqual(list("DBGDG"), page.images[0].instrument.strings)
+        self.assertEqual(list("DCGCG"), page.images[1].instrument.strings)
+        self.assertEqual(119, len(list(pages)))
+
+        jobFilter = JobFilter(["ukulele"], None, ["c#", "D"], ["m7", "major 7th"])
+        pages = list(getPageJobs(jobFilter=jobFilter))
+        self.assertEqual(["guitar_C#_minor_7th.xhtml", "guitar_C#_major_7th.xhtml",
+                          "guitar_D_minor_7th.xhtml", "guitar_D_major_7th.xhtml"], [page.htmName for page in pages])
+        self.assertEqual([False, True], [jobFilter.matches(job) for job in pages[0].images])
+
+        jobFilter = JobFilter(tunings=["double c"])
+        self.assertEqual(60, len(list(getPageJobs(jobFilter=jobFilter))))
+        self.assertEqual([False, True], [jobFilter.matches(job) for job in next(getPageJobs()).images])
+
+        self.assertRaises(ValueError, JobFilter, roots=["H"])
+        self.assertRaises(ValueError, JobFilter, chordTypes=["sus"])
+
+    def test_atlas(self):
+        pages = list(getPageJobs())
+        atlases = list(getAtlasJobs(pages))
+        self.assertEqual(["./img/banjo_openG__", "./img/banjo_doubleC", "./img/guitar", "./img/ukulele"],
+                         [atlas.imgName for atlas in atlases])
+        guitar = atlases[2]
+        self.assertEqual(len(pages) // 2, len(guitar.images))
+        self.assertEqual(17, guitar.columns)
+
+        css = atlasStyleSheet(atlases)
+        self.assertIn("background-image: url(./img/guitar_atlas.png);", css)
+        self.assertIn(".guitar_C_major { background-position: 0px 0px; }", css)
+        # The 18th image of the atlas is the first one in its second row
+        self.assertIn(".guitar_D_sharp_diminished { background-position: 0px -920px; }", css)
+
+    def test_voicingTitles(self):
+        jobFilter = JobFilter(["ukulele"], None, ["C"], ["major"])
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, "voicings.sqlite")
+            with VoicingDatabase(filename) as db:
+                db.fill(next(getPageJobs(jobFilter=jobFilter)).images[1].instrument, chordTypes=[ChordInterval.major])
+            with VoicingDatabase(filename, readOnly=True) as db:
+                page = next(getPageJobs(jobFilter=jobFilter, voicings=db))
+        self.assertEqual(["", "Best voicings: 0003, 5433, 5707"], page.titles)
+
+        htm = renderHtml(page.instrument, page.root, page.chordType, page.htmName, ["guitar.png", "ukulele.png"],
+                         titles=page.titles)
+        self.assertIn('<img src="guitar.png" alt="Diagram not found"/>', htm)
+        self.assertIn('<img src="ukulele.png" alt="Diagram not found" title="Best voicings: 0003, 5433, 5707"/>', htm)
+
 
 if __name__ == '__main__':
     unittest.main()
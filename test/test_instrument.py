@@ -10,9 +10,15 @@ Test module for instrument class
 __date__ = '2021-12-05'
 __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 
+import json
 import unittest
 
+import numpy as np
+
+from Instruments.banjo import Banjo_5string
+from Instruments.guitar import Guitar
 from Instruments.instrument import Instrument
+from chord import Chord
 
 
 class TestInstrument(unittest.TestCase):
@@ -27,6 +33,123 @@ class TestInstrument(unittest.TestCase):
         self.assertEqual("F", instrument.getNote(0, 15))
         self.assertIsNone(instrument.getNote(4, 2))
 
+    def test_getPitchClass(self):
+        instrument = Instrument()
+        instrument.strings = list("DBGDG")
+        instrument.rootfrets = [0, 0, 0, 0, 5]
+
+        self.assertEqual(9, instrument.getPitchClass(4, 7))
+        self.assertEqual(7, instrument.getPitchClass(4, 5))
+        self.assertEqual(5, instrument.getPitchClass(0, 15))
+        self.assertIsNone(instrument.getPitchClass(4, 2))
+
+    def test_pitchClassMatrix(self):
+        instrument = Instrument()
+        instrument.strings = list("DBGDG")
+        instrument.rootfrets = [0, 0, 0, 0, 5]
+        instrument.nfrets = 12
+
+        matrix = instrument.pitchClassMatrix()
+        self.assertEqual((5, 13), matrix.shape)
+        for string in range(5):
+            for fret in range(13):
+                pc = instrument.getPitchClass(string, fret)
+                self.assertEqual(-1 if pc is None else pc, matrix[string, fret])
+        self.assertIs(matrix, instrument.pitchClassMatrix())
+
+        # Retuning the strings in place invalidates the matrix
+        instrument.strings[0] = "E"
+        self.assertEqual(4, instrument.pitchClassMatrix()[0, 0])
+        instrument.strings[0] = "D"
+        self.assertIs(matrix, instrument.pitchClassMatrix())
+
+    def test_chordCells(self):
+        instrument = Instrument()
+        instrument.strings = list("DBGDG")
+        instrument.rootfrets = [0, 0, 0, 0, 5]
+        instrument.nfrets = 12
+
+        cells = instrument.chordCells(0b10010001)  # C, E, G
+        self.assertEqual([2, 5, 10], list(cells[0].nonzero()[0]))
+        # No notes before the root fret of the 5th string
+        self.assertEqual([5, 10], list(cells[4].nonzero()[0]))
+
+    def test_withTuning(self):
+        instrument = Instrument.fromData({"name": "Banjo", "strings": "DBGDG", "nfrets": 22,
+                                          "rootfrets": [0, 0, 0, 0, 5],
+                                          "tuning": [{"name": "Double C", "strings": "DCGCG"}]})
+        instrument.defineChord("G", (0, 0, 0, 0))
+        doubleC = instrument.withTuning("Double C")
+        self.assertEqual(list("DCGCG"), doubleC.strings)
+        self.assertEqual(list("DBGDG"), instrument.strings)
+        self.assertIs(instrument.chords, doubleC.chords)
+        self.assertEqual(0, doubleC.getPitchClass(1, 0))
+
+        # The views are independent of each other and of the instrument
+        view = instrument.withTuning(list("DBGDG"))
+        view.strings[0] = "E"
+        view.rootfrets[4] = 0
+        self.assertEqual(list("DBGDG"), instrument.strings)
+        self.assertEqual([0, 0, 0, 0, 5], instrument.rootfrets)
+        # ...start with the cached matrix of the same tuning, but cache their own matrices
+        self.assertIs(instrument.pitchClassMatrix(), instrument.withTuning("Standard").pitchClassMatrix())
+        doubleC.pitchClassMatrix()
+        view.pitchClassMatrix()
+        self.assertEqual(1, len(instrument._pitchClassMatrices))
+
+        self.assertRaises(ValueError, instrument.withTuning, "Open D")
+        self.assertRaises(ValueError, instrument.withTuning, list("DGBD"))
+
+    def test_transposed(self):
+        banjo = Banjo_5string()
+        banjo.chords.freeze()
+        capo = banjo.transposed(capo=2)
+        self.assertEqual(["E", "C#", "A", "E", "A"], capo.strings)
+        self.assertEqual([0, 0, 0, 0, 5], capo.rootfrets)
+        self.assertEqual(banjo.nfrets - 2, capo.nfrets)
+        self.assertEqual(banjo.getNote(0, 2), capo.getNote(0, 0))
+        self.assertEqual(banjo.getNote(4, 7), capo.getNote(4, 5))
+        # The chords are renamed, not decoded
+        self.assertIsNotNone(capo.chords._columns)
+        self.assertTrue(capo.chords.frozen)
+        self.assertEqual([c.scheme for c in banjo.chords], [c.scheme for c in capo.chords])
+        self.assertEqual(["C", "D"], [banjo.chords[0].name, capo.chords[0].name])
+        self.assertIs(banjo.chords, banjo.transposed(shifts=12).chords)
+        self.assertEqual(["D", "B", "G", "D", "G"], banjo.strings)
+
+        for kwargs in ({"capo": 3, "partialCapos": [0, 0, 0, 2, 0], "shifts": [0, 1, 0, 0, -2]},
+                       {"partialCapos": [None, None, None, None, 7]}):
+            view = banjo.transposed(**kwargs)
+            fresh = Instrument()
+            fresh.strings, fresh.rootfrets, fresh.nfrets = view.strings, view.rootfrets, view.nfrets
+            np.testing.assert_array_equal(fresh.pitchClassMatrix(), view.pitchClassMatrix())
+        # The views do not fill the cache of the instrument
+        self.assertEqual(1, len(banjo._pitchClassMatrices))
+
+        self.assertRaises(ValueError, banjo.transposed, capo=23)
+        self.assertRaises(ValueError, banjo.transposed, partialCapos=[2, 2])
+
+    def test_transposedChords(self):
+        guitar = Guitar()
+        # Partial capo on the 2nd fret of the B, G and D strings: the E chord presses the G string below the capo, the
+        # open strings of the others sound at the capo
+        view = guitar.transposed(partialCapos=[0, 2, 2, 2, 0, 0])
+        self.assertEqual([Chord("Aadd9", (0, 2, 2, 2, 2, 0)), Chord("Dadd9", (None, 0, 2, (2, 1), (3, 3), (2, 2)))],
+                         list(view.chords))
+        # Drop D
+        view = guitar.transposed(shifts=[0, 0, 0, 0, 0, -2])
+        self.assertEqual(["E", "B", "G", "D", "A", "D"], view.strings)
+        self.assertEqual(["E7", "Em7", "D"], [c.name for c in view.chords])
+
+        # Partial capo on the 2nd fret of the G string of a banjo: C (E G C E) becomes Am (E A C E)
+        banjo = Banjo_5string()
+        view = banjo.transposed(partialCapos=[0, 0, 2, 0, 0])
+        self.assertEqual(Chord("C", ((2, 2), (0, 0), (1, 1), (2, 3)), "banjo_"), banjo.chords[0])
+        self.assertEqual(Chord("Am", ((2, 2), (2, 0), (1, 1), (2, 3)), "banjo_"), view.chords[0])
+        # The chord types annotated with HTML entities get plain-text names
+        self.assertIn("C#dim", [c.name for c in banjo.transposed(partialCapos=[0, 0, 0, 2, 0]).chords])
+        self.assertFalse([c.name for c in view.chords if "&" in c.name])
+
     def test_fromData(self):
         data = {
                    "name": "Guitar",
@@ -44,6 +167,23 @@ class TestInstrument(unittest.TestCase):
 
         self.assertEqual(["E", "B", "G", "D", "A", "E"], i.tuning[0][1])
 
+    def test_toData(self):
+        data = {"name": "Banjo", "strings": "DBGDG", "nfrets": 22, "dotsOnFrets": [3, 5, 7],
+                "rootfrets": [0, 0, 0, 0, 5],
+                "tuning": [{"name": "Double C", "strings": "DCGCG"}, {"strings": "DA#GDG"}]}
+        banjo = Instrument.fromData(dict(data))
+        self.assertEqual(data, banjo.toData())
+
+        banjo.defineChord("C", frets=(2, 0, 1, 2), fingers=(2, 0, 1, 3), prefix="banjo_")
+        banjo.defineChord("G", (0, 0, 0, 0, None))
+        banjo.defineChord("G7", (0, 0, 0, (3, None)))
+        restored = Instrument.fromData(json.loads(json.dumps(banjo.toData())))
+        # The chords are decoded lazily
+        self.assertEqual(3, len(restored.chords))
+        self.assertIsNotNone(restored.chords._columns)
+        self.assertEqual(list(banjo.chords), list(restored.chords))
+        self.assertEqual(["G7"], [c.name for c in restored.chords.find(root="G", chordType="dominant 7th")])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestInstrumentFactory']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import json
+import os
+import tempfile
+import unittest
+
+from Instruments.guitar import Guitar
+from Instruments.instrument_factory import InstrumentFactory
+
+
+class TestInstrumentFactory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.jfile = os.path.join(self.tmp.name, "instruments.json")
+        data = {"instrument": [{"name": "Guitar", "strings": "EBGDAE", "nfrets": 20,
+                                "tuning": [{"name": "Drop D", "strings": "EBGDAD"}]},
+                               {"name": "Mandolin", "strings": "EADG", "nfrets": 17}]}
+        with open(self.jfile, 'w') as f:
+            json.dump(data, f)
+        self.factory = InstrumentFactory(self.jfile, {"Guitar": Guitar, "Acoustic": Guitar})
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_definition(self):
+        self.assertEqual(["Guitar", "Mandolin"], self.factory.storedNames())
+        self.assertEqual(["Guitar", "Mandolin", "Acoustic"], self.factory.names())
+
+        guitar = self.factory.definition("Guitar")
+        self.assertIs(guitar, self.factory.definition("Guitar"))
+        # The stored definition gets the chords of the class, which cannot be changed anymore
+        self.assertEqual(list(Guitar().chords), list(guitar.chords))
+        self.assertRaises(ValueError, guitar.defineChord, "A", (None, 0, 2, 2, 2, 0))
+        self.assertEqual(["Standard", "Drop D"], [name for name, strings in guitar.tuning])
+        self.assertFalse(self.factory.definition("Mandolin").chords)
+
+        acoustic = self.factory.definition("Acoustic")
+        self.assertEqual([("Standard", list("EBGDAE"))], acoustic.tuning)
+        self.assertRaises(KeyError, self.factory.definition, "Banjo")
+
+    def test_instrument(self):
+        dropD = self.factory.instrument("Guitar", "Drop D")
+        self.assertEqual(list("EBGDAD"), dropD.strings)
+        self.assertIs(self.factory.definition("Guitar").chords, dropD.chords)
+        standard = self.factory.instrument("Guitar")
+        self.assertEqual(list("EBGDAE"), standard.strings)
+        self.assertIsNot(self.factory.definition("Guitar"), standard)
+        self.assertEqual(list("DADG"), self.factory.instrument("Mandolin", list("DADG")).strings)
+
+
+if __name__ == '__main__':
+    unittest.main()
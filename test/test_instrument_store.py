@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestInstrumentStore']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from Instruments.banjo import Banjo_5string
+from Instruments.instrument_store import InstrumentStore
+
+
+class TestInstrumentStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "instruments.sqlite")
+        self.jfile = os.path.join(self.tmp.name, "instruments.json")
+        data = {"instrument": [{"name": "Guitar", "strings": "EBGDAE", "nfrets": 20,
+                                "tuning": [{"name": "Drop D", "strings": "EBGDAD"}, {"strings": "EBGDA"}]},
+                               {"name": "Mandolin", "strings": "EADG", "nfrets": 17, "dotsOnFrets": [5, 7]}]}
+        with open(self.jfile, 'w') as f:
+            json.dump(data, f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_import(self):
+        with InstrumentStore(self.filename, self.jfile) as store:
+            self.assertEqual(["Guitar", "Mandolin"], store.names())
+            self.assertIn("Mandolin", store)
+            self.assertNotIn("Banjo", store)
+            # The invalid tuning is not imported
+            self.assertEqual([("Standard", ["E", "B", "G", "D", "A", "E"]), ("Drop D", ["E", "B", "G", "D", "A", "D"])],
+                             store.tunings("Guitar"))
+            mandolin = store.instrument("Mandolin")
+            self.assertEqual(17, mandolin.nfrets)
+            self.assertEqual([5, 7], mandolin.dotsOnFrets)
+            self.assertRaises(KeyError, store.data, "Banjo")
+
+        # An existing store is not imported again
+        os.remove(self.jfile)
+        with InstrumentStore(self.filename, self.jfile) as store:
+            self.assertEqual(["Guitar", "Mandolin"], store.names())
+
+    def test_reimport(self):
+        with InstrumentStore(self.filename, self.jfile) as store:
+            store.saveInstrument(Banjo_5string())
+            store.addTuning("Mandolin", ["D", "A", "D", "G"], "Cajun")
+            store.addTuning("Mandolin", ["G", "D", "G", "D"])
+            mandolin = store.instrument("Mandolin")
+            mandolin.defineChord("G", (0, 0, 2, 3))
+            store.saveInstrument(mandolin)
+            self.assertFalse(store.importJson(self.jfile))
+
+        data = {"instrument": [{"name": "Mandolin", "strings": "GDAE", "nfrets": 20,
+                                "tuning": [{"name": "Open G", "strings": "GDGD"}]},
+                               {"name": "Bouzouki", "strings": "DADG", "nfrets": 24}]}
+        with open(self.jfile, 'w') as f:
+            json.dump(data, f)
+        # The changed file is imported again, the instruments added since are kept
+        with InstrumentStore(self.filename, self.jfile) as store:
+            self.assertEqual(["Guitar", "Mandolin", Banjo_5string().name, "Bouzouki"], store.names())
+            self.assertEqual(20, store.data("Mandolin")["nfrets"])
+            # ...and so are the tunings and chords added to the imported ones
+            self.assertEqual([("Standard", ["G", "D", "A", "E"]), ("Open G", ["G", "D", "G", "D"]),
+                              ("Cajun", ["D", "A", "D", "G"])], store.tunings("Mandolin"))
+            self.assertEqual(["G"], [c.name for c in store.instrument("Mandolin").chords])
+
+    def test_export(self):
+        exported = os.path.join(self.tmp.name, "exported.json")
+        with InstrumentStore(self.filename, self.jfile) as store:
+            store.addTuning("Mandolin", ["D", "A", "D", "G"], "Cajun")
+            store.exportJson(exported)
+            # The exported file is not imported again
+            self.assertFalse(store.importJson(exported))
+            data = [store.data(name) for name in store.names()]
+
+        with InstrumentStore(os.path.join(self.tmp.name, "other.sqlite"), exported) as store:
+            self.assertEqual(data, [store.data(name) for name in store.names()])
+
+    def test_write(self):
+        with InstrumentStore(self.filename, self.jfile) as store:
+            store.addTuning("Mandolin", ["D", "A", "D", "G"], "Cajun")
+            self.assertRaises(ValueError, store.addTuning, "Mandolin", ["D", "A", "D"])
+            self.assertEqual(("Cajun", ["D", "A", "D", "G"]), store.tunings("Mandolin")[-1])
+
+            guitar = store.instrument("Guitar")
+            guitar.tuning.append((None, ["D", "A", "F#", "D", "A", "D"]))
+            guitar.defineChord("D", (None, None, 0, 2, 3, 2))
+            store.saveInstrument(guitar)
+            banjo = Banjo_5string()
+            banjo.tuning = [("Standard", list(banjo.strings))]
+            store.saveInstrument(banjo)
+            # A replaced instrument keeps its position
+            self.assertEqual(["Guitar", "Mandolin", banjo.name], store.names())
+
+            store.removeInstrument("Mandolin")
+            self.assertRaises(KeyError, store.removeInstrument, "Mandolin")
+
+        with InstrumentStore(self.filename, self.jfile) as store:
+            self.assertEqual(["Guitar", banjo.name], store.names())
+            self.assertEqual(guitar.toData(), store.data("Guitar"))
+            self.assertEqual(list(banjo.chords), list(store.instrument(banjo.name).chords))
+            # The tunings of the removed instrument are removed too
+            self.assertEqual(2, store.connection.execute("SELECT COUNT(*) FROM tunings").fetchone()[0])
+
+    def test_atomicWrite(self):
+        with InstrumentStore(self.filename, self.jfile) as store:
+            guitar = store.instrument("Guitar")
+            guitar.nfrets = 24
+            store.connection.execute("CREATE TRIGGER fail BEFORE INSERT ON tunings "
+                                     "BEGIN SELECT RAISE(ABORT, 'failed'); END")
+            self.assertRaises(sqlite3.IntegrityError, store.saveInstrument, guitar)
+            # Nothing of the failed write is stored
+            self.assertEqual(20, store.data("Guitar")["nfrets"])
+            self.assertEqual(2, len(store.tunings("Guitar")))
+
+
+if __name__ == '__main__':
+    unittest.main()
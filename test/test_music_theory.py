@@ -8,7 +8,9 @@ __date__ = '2021-12-14'
 
 import unittest
 
-from music_theory import ChordInterval, getChordNotes, NOTES, ChordType, notesFromString
+from music_theory import ChordInterval, getChordNotes, NOTES, ChordType, notesFromString, tokenizeNotes, pitchClass, \
+    pitchClassMask, maskPitchClasses, chordPitchClasses, chordMask, recognizeChord, ChordRelation, ChordMatch, \
+    ChordTypeRegistry, CHORD_TYPES, plainAnnotation
 
 
 class TestChordInterval(unittest.TestCase):
@@ -26,17 +28,55 @@ class TestChordInterval(unittest.TestCase):
 
         self.assertIsNone(ChordInterval.getInterval("blah"))
 
+    def test_ChordTypeRegistry(self):
+        self.assertIs(ChordInterval.major_7, CHORD_TYPES.getByAnnotation("&Delta;7"))
+        self.assertIs(ChordInterval.min_7, CHORD_TYPES.getByInterval([3, 4, 3]))
+        self.assertEqual((4, 3, 3, 4), CHORD_TYPES.getByName("dominant 9th").interval)
+        self.assertIn(CHORD_TYPES.getByAnnotation("sus4"), ChordInterval.getAllChordTypes())
+
+        registry = ChordTypeRegistry()
+        sixNine = ChordType((4, 3, 2, 5), "6/9", ['6/9'])
+        registry.register(sixNine)
+        self.assertIs(sixNine, registry.getByName("6/9"))
+        self.assertIsNone(registry.getByName("major"))
+        self.assertRaises(ValueError, registry.register, ChordType((4, 3), "6/9", []))
+        self.assertEqual((ChordMatch(0, sixNine, ChordRelation.exact),), registry.recognize([0, 4, 7, 9, 2]))
+        self.assertNotIn(sixNine, [m.chordType for m in recognizeChord([0, 4, 7, 9, 2])])
+        # The chords contained in the notes are indexed when a chord type is registered
+        registry.register(ChordInterval.major)
+        self.assertEqual((ChordMatch(0, sixNine, ChordRelation.exact),
+                          ChordMatch(0, ChordInterval.major, ChordRelation.superset)),
+                         registry.recognize([0, 4, 7, 9, 2]))
+
+    def test_plainAnnotation(self):
+        self.assertEqual("M7", plainAnnotation(ChordInterval.major_7))
+        self.assertEqual("dim", plainAnnotation(ChordInterval.diminished))
+        self.assertEqual("\u2205", plainAnnotation(ChordType((3, 3, 4, 4), "test", ["&empty;"])))
+        self.assertEqual(ChordInterval.halfdim_7, CHORD_TYPES.getByAnnotation("m7b5"))
+
     def test_getAllChordTypes(self):
         expected = [ChordType(interval=(4, 4), name='augmented', annotations=['+']),
                     ChordType(interval=(3, 3, 3), name='diminished 7th', annotations=['&#x25CB;7']),
-                    ChordType(interval=(3, 3), name='diminished', annotations=['&#176;']),
+                    ChordType(interval=(3, 3), name='diminished', annotations=['m&#176;']),
                     ChordType(interval=(4, 3, 3), name='dominant 7th', annotations=["7"]),
                     ChordType(interval=(3, 3, 4), name='half diminished 7th', annotations=['&emptyv;7']),
                     ChordType(interval=(4, 3), name='major', annotations=['']),
                     ChordType(interval=(4, 3, 4), name='major 7th', annotations=['M7', '&Delta;7']),
                     ChordType(interval=(3, 4, 3), name='minor 7th', annotations=['m7']),
                     ChordType(interval=(3, 4), name='minor', annotations=['m']),
-                    ChordType(interval=(3, 4, 4), name='minor major 7th', annotations=['minMaj7'])]
+                    ChordType(interval=(3, 4, 4), name='minor major 7th', annotations=['minMaj7']),
+                    ChordType(interval=(7, 12), name='power', annotations=['5']),
+                    # The chord types of chord_types_file follow the ones defined in ChordInterval
+                    ChordType(interval=(4, 3, 2), name='major 6th', annotations=['6']),
+                    ChordType(interval=(2, 5), name='suspended 2nd', annotations=['sus2']),
+                    ChordType(interval=(5, 2), name='suspended 4th', annotations=['sus4']),
+                    ChordType(interval=(5, 2, 3), name='dominant 7th suspended 4th', annotations=['7sus4']),
+                    ChordType(interval=(4, 3, 7), name='added 9th', annotations=['add9']),
+                    ChordType(interval=(4, 3, 3, 4), name='dominant 9th', annotations=['9']),
+                    ChordType(interval=(4, 3, 4, 3), name='major 9th', annotations=['M9', '&Delta;9']),
+                    ChordType(interval=(3, 4, 3, 4), name='minor 9th', annotations=['m9']),
+                    ChordType(interval=(4, 3, 3, 4, 3), name='dominant 11th', annotations=['11']),
+                    ChordType(interval=(4, 3, 3, 4, 3, 4), name='dominant 13th', annotations=['13'])]
         self.assertEqual(expected, ChordInterval.getAllChordTypes())
 
 
@@ -47,6 +87,26 @@ class TestMusicTheory(unittest.TestCase):
     def test_notesFromString(self):
         self.assertEqual(['E', 'G#', 'B'], notesFromString("EG#B"))
         self.assertEqual(['B', 'D#', 'F#'], notesFromString("B, D# F#"))
+        self.assertEqual(['D', 'B', 'G', 'D', 'G'], notesFromString("DBGDG"))
+        self.assertEqual(['A#', 'D#', 'G#', 'C#', 'F#', 'B'], notesFromString("Bb, Eb, Ab, Db, Gb, Cb"))
+        self.assertEqual(['B', 'C#', 'D#', 'F#', 'G#', 'A#'], notesFromString("H, Cis, Es, Fis, As, Bb"))
+        self.assertEqual(['C#', 'D#', 'C'], notesFromString("Des, Dis, His"))
+        self.assertEqual(['C', 'E', 'G'], notesFromString("c, e, g"))
+        self.assertEqual(['D', 'B', 'G', 'D', 'G'], notesFromString("dbgdg"))
+        self.assertEqual(['D#', 'A#', 'D#'], notesFromString("eb, bb es"))
+        self.assertEqual(['D#', 'G#', 'C#', 'C#'], notesFromString("EbAb CisDes"))
+        # The words which are not notes are rejected
+        self.assertEqual([], notesFromString("Bad"))
+        self.assertEqual([], notesFromString("ebEb"))
+        self.assertEqual([], notesFromString("dbes"))
+        self.assertEqual(['A'], notesFromString("A major"))
+        self.assertEqual((), tokenizeNotes("Cm7"))
+        self.assertEqual([], notesFromString(""))
+        # A fresh list is returned every time, although the tokens are cached
+        notes = notesFromString("EADGBE")
+        notes.append("X")
+        self.assertEqual(list("EADGBE"), notesFromString("EADGBE"))
+        self.assertEqual(((0, 2, 10), (4, 7, 1)), tuple(tuple(t) for t in tokenizeNotes("Bb, Cis")))
 
     def test_getChordNotes(self):
         self.assertEqual(['E', 'G#', 'B'], getChordNotes("E", ChordInterval.major))
@@ -56,6 +116,53 @@ class TestMusicTheory(unittest.TestCase):
         self.assertEqual(['A', 'C', 'E'], getChordNotes("A", ChordInterval.minor))
 
         self.assertEqual(NOTES, getChordNotes("C", ChordType(tuple(11 * [1]), "just all notes!", ['test'])))
+        self.assertEqual(['a', 'C', 'E'], getChordNotes("a", ChordInterval.minor))
+        self.assertEqual(['G', 'D', 'D'], getChordNotes("G", ChordInterval.power))
+
+    def test_pitchClass(self):
+        self.assertEqual(0, pitchClass("C"))
+        self.assertEqual(10, pitchClass("a#"))
+        self.assertEqual(10, pitchClass("Bb"))
+        self.assertEqual(11, pitchClass("H"))
+        self.assertEqual(3, pitchClass("Es"))
+        self.assertRaises(KeyError, pitchClass, "X")
+        self.assertRaises(KeyError, pitchClass, "CE")
+        self.assertEqual(0b100010010001, pitchClassMask([0, 4, 7, 11]))
+        self.assertEqual([0, 4, 7, 11], maskPitchClasses(0b100010010001))
+        self.assertEqual(0, pitchClassMask([]))
+
+    def test_chordMask(self):
+        self.assertEqual((4, 8, 11), chordPitchClasses(pitchClass("E"), ChordInterval.major))
+        self.assertEqual((7, 2, 2), chordPitchClasses(pitchClass("G"), ChordInterval.power))
+        self.assertEqual(pitchClassMask([9, 0, 4]), chordMask(pitchClass("A"), ChordInterval.minor))
+        self.assertEqual(chordMask(0, ChordInterval.major), chordMask(0))
+        self.assertEqual(0xFFF, chordMask(5, ChordType(tuple(11 * [1]), "just all notes!", ['test'])))
+
+        for chordType in ChordInterval.getAllChordTypes():
+            for root in NOTES:
+                notes = getChordNotes(root, chordType)
+                self.assertEqual(tuple(pitchClass(note) for note in notes),
+                                 chordPitchClasses(pitchClass(root), chordType))
+                self.assertEqual(pitchClassMask(pitchClass(note) for note in notes),
+                                 chordMask(pitchClass(root), chordType))
+
+    def test_recognizeChord(self):
+        C, E, F_sharp, G, A_sharp = (pitchClass(note) for note in ["C", "E", "F#", "G", "A#"])
+        self.assertEqual(ChordMatch(C, ChordInterval.major, ChordRelation.exact), recognizeChord([C, E, G])[0])
+        self.assertEqual(ChordMatch(C, ChordInterval.major, ChordRelation.inversion), recognizeChord([E, G, C])[0])
+        self.assertEqual(ChordMatch(C, ChordInterval.dominant_7, ChordRelation.omittedFifth),
+                         recognizeChord([C, E, A_sharp])[0])
+        self.assertEqual(ChordMatch(C, ChordInterval.dominant_7, ChordRelation.superset),
+                         recognizeChord([C, E, G, A_sharp, F_sharp])[0])
+        self.assertIn(ChordMatch(C, ChordInterval.major, ChordRelation.superset), recognizeChord([C, E, G, A_sharp]))
+
+        # Diminished 7th chords are symmetric: the lowest note is the root
+        matches = recognizeChord([pitchClass(note) for note in ["D#", "F#", "A", "C"]])
+        self.assertEqual([(3, ChordRelation.exact), (0, ChordRelation.inversion), (6, ChordRelation.inversion),
+                          (9, ChordRelation.inversion)], [(m.root, m.relation) for m in matches[:4]])
+
+        self.assertEqual((), recognizeChord([]))
+        self.assertIs(recognizeChord([C, E, G]), recognizeChord([C, G, E]))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestPageTemplate']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import unittest
+
+from page_template import PageTemplate
+
+
+class TestPageTemplate(unittest.TestCase):
+    def test_render(self):
+        template = PageTemplate('<title>${chordroot} {}</title>\n'
+                                '<p><a href="./${instrument}_C#_major.xhtml">C#</a></p>\n'
+                                '<p><a href="./${instrument}_${chordroot}_major.xhtml">${chordroot}</a></p>\n'
+                                '<p><a href="./${instrument}_${chordroot}_minor.xhtml">${chordroot}m</a></p>\n'
+                                '${unknown}')
+        values = {"instrument": "banjo", "chordroot": "C#"}
+
+        self.assertEqual('<title>C# {}</title>\n'
+                         '<p><a href="./banjo_C_sharp_major.xhtml">C#</a></p>\n'
+                         '<p><a href="./banjo_C_sharp_major.xhtml">C#</a></p>\n'
+                         '<p><a href="./banjo_C_sharp_minor.xhtml">C#m</a></p>\n'
+                         '${unknown}', template.render(values))
+
+        highlight = [("banjo_C_sharp_major.xhtml", "C#", 1), ("banjo_C_sharp_major.xhtml", "C#", -1)]
+        self.assertEqual('<title>C# {}</title>\n'
+                         '<p class="highlight">C#</p>\n'
+                         '<p class="highlight">C#</p>\n'
+                         '<p><a href="./banjo_C_sharp_minor.xhtml">C#m</a></p>\n'
+                         '${unknown}', template.render(values, highlight))
+
+        highlight = [("banjo_C_sharp_major.xhtml", "C#", 1), ("banjo_C_sharp_minor.xhtml", "C#m", -1)]
+        self.assertEqual('<title>C# {}</title>\n'
+                         '<p class="highlight">C#</p>\n'
+                         '<p><a href="./banjo_C_sharp_major.xhtml">C#</a></p>\n'
+                         '<p class="highlight">C#m</p>\n'
+                         '${unknown}', template.render(values, highlight))
+
+
+if __name__ == '__main__':
+    unittest.main()
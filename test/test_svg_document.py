@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestSvgDocument']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import unittest
+import xml.dom.minidom
+
+from svg_document import SvgDocument
+
+
+class TestSvgDocument(unittest.TestCase):
+    def test_define(self):
+        svg = SvgDocument(100, 200, "img_")
+        a = svg.define("A", '<g id="{id}"><text>A</text></g>')
+        b = svg.define("B", '<g id="{id}"><text>B</text></g>')
+        self.assertEqual("img_d0", a)
+        self.assertEqual("img_d1", b)
+        self.assertEqual(a, svg.define("A", '<g id="{id}"><text>other</text></g>'))
+        svg.use(a, 10, 20)
+        svg.use(a, 10, 40)
+
+        markup = svg.toString()
+        self.assertEqual(1, markup.count('id="img_d0"'))
+        self.assertEqual(2, markup.count('href="#img_d0" xlink:href="#img_d0"'))
+        self.assertNotIn("other", markup)
+
+    def test_lines(self):
+        svg = SvgDocument(100, 200)
+        svg.line(0, 0, 100, 0, 2)
+        svg.line(0, 10.004, 100, 10.004, 2)
+        svg.line(0, 0, 0, 200, 1, "#888")
+
+        dom = xml.dom.minidom.parseString(svg.toString())
+        paths = dom.getElementsByTagName("path")
+        self.assertEqual(2, len(paths))
+        self.assertEqual("M0 0L100 0M0 10L100 10", paths[0].getAttribute("d"))
+        self.assertEqual("2", paths[0].getAttribute("stroke-width"))
+        self.assertEqual("#888", paths[1].getAttribute("stroke"))
+
+
+if __name__ == '__main__':
+    unittest.main()
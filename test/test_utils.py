@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestUtils']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import unittest
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage
+
+from utils import encodePng, indexedImage
+
+
+class TestUtils(unittest.TestCase):
+    def setUp(self):
+        self.image = QImage(40, 30, QImage.Format_RGB32)
+        self.image.fill(Qt.white)
+        # More than 256 colors: a frequently used gray ramp and many colors used only once
+        for x in range(40):
+            for y in range(10):
+                self.image.setPixel(x, y, 0xff000000 + 0x060606 * x)
+            for y in range(20, 30):
+                self.image.setPixel(x, y, 0xff000000 + 0x060000 * x + 0x19 * (y - 20) + 1)
+
+    def test_indexedImage(self):
+        indexed = indexedImage(self.image)
+        self.assertEqual(QImage.Format_Indexed8, indexed.format())
+        self.assertEqual(256, indexed.colorCount())
+        # The most frequent colors are kept exactly
+        self.assertEqual(0xffffffff, indexed.pixel(39, 15))
+        self.assertEqual(self.image.pixel(10, 0), indexed.pixel(10, 0))
+
+        small = self.image.copy(0, 0, 40, 20)
+        self.assertEqual(small.convertToFormat(QImage.Format_RGB32),
+                         indexedImage(small).convertToFormat(QImage.Format_RGB32))
+
+    def test_encodePng(self):
+        for indexed in (False, True):
+            for compression in (-1, 0, 9):
+                data = encodePng(self.image, indexed, compression)
+                self.assertNotIn(b"pHYs", data)
+                self.assertEqual(1, data.count(b"IDAT"))
+                self.assertEqual(indexed, b"PLTE" in data)
+                decoded = QImage.fromData(data)
+                self.assertEqual(self.image.size(), decoded.size())
+                if not indexed:
+                    self.assertEqual(self.image, decoded.convertToFormat(QImage.Format_RGB32))
+        self.assertLess(len(encodePng(self.image, True, 9)), len(encodePng(self.image, False, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+
+
+__all__ = ['TestVoicingDatabase']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from Instruments.banjo import Banjo_5string
+from Instruments.ukulele import Ukulele
+from chord_inventor import ChordInventor
+from music_theory import ChordInterval, chordMask
+from voicing_database import VoicingDatabase, schemeText
+
+
+class TestVoicingDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "voicings.sqlite")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fill_and_query(self):
+        uke = Ukulele()
+        types = [ChordInterval.major, ChordInterval.minor]
+        with VoicingDatabase(self.filename) as db:
+            self.assertFalse(db.hasInstrument(uke))
+            count = db.fill(uke, chordTypes=types)
+            self.assertTrue(db.hasInstrument(uke))
+            # Filling again replaces the voicings
+            self.assertEqual(count, db.fill(uke, chordTypes=types))
+
+        with VoicingDatabase(self.filename, readOnly=True) as db:
+            self.assertEqual(count, len(db.voicings(uke)))
+            inventor = ChordInventor(uke)
+            c = db.voicings(uke, "C", ChordInterval.major)
+            expected = {tuple(chord.scheme) for chord in inventor.buildChords("C", ChordInterval.major)}
+            self.assertEqual(expected, {v.scheme for v in c if v.source == "inventor"})
+            self.assertEqual("0003", schemeText(c[0].scheme))
+            self.assertEqual(("G", "C", "E", "C"), c[0].notes)
+            self.assertEqual(chordMask(0, ChordInterval.major), c[0].mask)
+            self.assertEqual(sorted(v.cost for v in c), [v.cost for v in c])
+            self.assertEqual(inventor.voicingCost(list(c[0].scheme), "C"), c[0].cost)
+
+            self.assertEqual(c[:2], db.voicings(uke, "C", "major", limit=2))
+            self.assertFalse(db.voicings(uke, "C", ChordInterval.dominant_7))
+            for v in db.voicings(uke, chordType="minor", minFret=5, maxFret=9, maxCost=10):
+                self.assertEqual("minor", v.chordType)
+                self.assertTrue(5 <= v.lowest <= v.highest <= 9)
+                self.assertLessEqual(v.cost, 10)
+            am = db.voicings(uke, mask=chordMask(9, ChordInterval.minor))
+            self.assertTrue(am)
+            self.assertEqual({("A", "minor")}, {(v.root, v.chordType) for v in am})
+
+            uke.strings = list("BF#DA")
+            self.assertFalse(db.voicings(uke))
+            self.assertRaises(ValueError, db.fill, uke)
+            self.assertRaises(sqlite3.OperationalError, db.connection.execute, "DELETE FROM voicings")
+
+    def test_readOnlyChecks(self):
+        # A missing database is not created
+        self.assertRaises(ValueError, VoicingDatabase, self.filename, True)
+        self.assertFalse(os.path.exists(self.filename))
+
+        with open(self.filename, 'w') as f:
+            f.write("Not a database, but long enough to be read as its header. " * 2)
+        self.assertRaises(ValueError, VoicingDatabase, self.filename, True)
+
+        os.remove(self.filename)
+        with VoicingDatabase(self.filename) as db:
+            db.connection.execute("PRAGMA user_version = 0")
+        with self.assertRaisesRegex(ValueError, "Rebuild"):
+            VoicingDatabase(self.filename, readOnly=True)
+
+    def test_defined_chords(self):
+        banjo = Banjo_5string()
+        with VoicingDatabase(self.filename) as db:
+            db.fill(banjo, chordTypes=[ChordInterval.major])
+            defined = db.voicings(banjo, "C", "major", maxFret=5)
+            defined = [v for v in defined if v.source == "defined"]
+            self.assertIn((None, 2, 0, 1, 2), [v.scheme for v in defined])
+            self.assertIn((None, 5, 5, 5, 5), [v.scheme for v in defined])
+
+    def test_schemeText(self):
+        self.assertEqual("x32010", schemeText((None, 3, 2, 0, 1, 0)))
+        self.assertEqual("x-10-12-12-12-10", schemeText((None, 10, 12, 12, 12, 10)))
+
+
+if __name__ == '__main__':
+    unittest.main()
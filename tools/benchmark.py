@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+Benchmark of the stages of the HTML/PNG pipeline of generate_htmls.
+
+Every stage is run over a fixed catalogue (the pages of generate_htmls.SITE, optionally filtered) and reported with
+its wall time, the latency percentiles of single items (images, pages, log records) and the memory it needed.
+The results are written as JSON, so that they can be compared between releases:
+
+    python -m tools.benchmark -o benchmark.json
+"""
+
+__all__ = ['main', 'runBenchmark', 'percentiles', 'splitNotes']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+from PyQt5.QtCore import QT_VERSION_STR
+from PyQt5.QtGui import QGuiApplication
+
+import generate_htmls
+from generate_htmls import JobFilter, getPageJobs, fretboardImage, imageFileName, renderHtml, writeHtml
+from file_register import FileRegister
+from music_theory import NOTES, tokenizeNotes
+from utils import savePng
+
+# Version of the format of the results
+BENCHMARK_VERSION = 2
+
+# The note names as the former notesFromString split them, for comparison with tokenizeNotes. It understood neither
+# flats nor German names and did not reject words
+_SPLIT_NOTESre = re.compile("({})".format("|".join(reversed(NOTES))), re.IGNORECASE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the generate_htmls pipeline")
+    parser.add_argument("-o", "--output", help="File to write the JSON results to (default: standard output)")
+    parser.add_argument("--root", action="append", help="Benchmark only the chords with this root note. Repeatable")
+    parser.add_argument("--type", action="append", help="Benchmark only the chords of this type. Repeatable")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also measure the peak of the memory allocated by Python in every stage. "
+                             "Slows down the stages implemented in Python")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+
+    results = runBenchmark(JobFilter(roots=args.root, chordTypes=args.type), args.trace_memory)
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(text)
+
+
+def runBenchmark(jobFilter=None, traceMemory=False):
+    """
+    Run all stages in a temporary directory and return the results as a JSON-serializable dictionary
+    """
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            os.mkdir("img")
+            # Log to a file as generate_htmls does. This also prevents logging from being configured implicitly
+            with _fileLogging("benchmark.log"):
+                pages = list(getPageJobs(jobFilter=jobFilter))
+                stages = _runStages(pages, jobFilter, traceMemory)
+        finally:
+            os.chdir(cwd)
+
+    return {"version": BENCHMARK_VERSION,
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "catalogue": {"pages": len(pages), "images": sum(len(page.images) for page in pages)},
+            "traceMemory": traceMemory,
+            "stages": stages}
+
+
+def _runStages(pages, jobFilter, traceMemory):
+    """
+    Run the stages in the current directory, one after another. Return the measurements keyed by the stage names
+    """
+    stages = {}
+    images = [job for page in pages for job in page.images]
+    imageNames = [imageFileName(job) for job in images]
+
+    stages["jobs"] = Stage(traceMemory).run(lambda _: list(getPageJobs(jobFilter=jobFilter)), [None])
+    stages["paint"] = Stage(traceMemory).run(
+        lambda job: fretboardImage(job.instrument, job.root, job.chordType), images)
+    stages["paint_layered"] = Stage(traceMemory).run(
+        lambda job: fretboardImage(job.instrument, job.root, job.chordType, layered=True), images)
+
+    # The images are painted before they are timed, so that only the encoding is measured
+    def painted():
+        return ((fretboardImage(job.instrument, job.root, job.chordType), name)
+                for job, name in zip(images, imageNames))
+
+    stages["encode"] = Stage(traceMemory).run(lambda item: item[0].save(item[1]), painted())
+    stages["encode_indexed"] = Stage(traceMemory).run(lambda item: savePng(item[0], item[1], True), painted())
+
+    pageArgs = [(page.instrument, page.root, page.chordType, page.htmName, names)
+                for page, names in _pageImageNames(pages, imageNames)]
+    stages["template"] = Stage(traceMemory).run(lambda args: renderHtml(*args), pageArgs)
+    stages["write_page"] = Stage(traceMemory).run(lambda args: writeHtml(*args), pageArgs)
+
+    # The strings of the instruments as typed in the editors of notes: tokenized without the cache and split as before
+    noteLists = [separator.join(job.instrument.strings) for job in images for separator in ("", ", ")]
+    stages["parse_notes"] = Stage(traceMemory).run(tokenizeNotes.__wrapped__, noteLists)
+    stages["parse_notes_split"] = Stage(traceMemory).run(splitNotes, noteLists)
+
+    stages["log"] = Stage(traceMemory).run(
+        lambda name: logging.info("Saved image: {}".format(os.path.abspath(name))), imageNames)
+    stages["pipeline"] = Stage(traceMemory).run(
+        lambda _: generate_htmls.generateAllHtmls(register=FileRegister(), jobFilter=jobFilter), [None])
+    return stages
+
+
+class Stage(object):
+    """
+    Measurement of a single stage of the pipeline: a function applied to every item of the catalogue
+    """
+
+    def __init__(self, traceMemory=False):
+        self.traceMemory = traceMemory
+
+    def run(self, func, items):
+        """
+        Apply the function to all items and return the measurements. The wall time includes producing the items,
+        the item time is the sum of the latencies of the function. The growth of the memory high-water mark of the
+        process is 0 for a stage that needs no more memory than the stages before. The peak of the memory allocated
+        by Python, if traced, is the stage's own
+        """
+        latencies = []
+        rssBefore = maxRss()
+        if self.traceMemory:
+            tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            for item in items:
+                t = time.perf_counter()
+                func(item)
+                latencies.append(time.perf_counter() - t)
+            wall = time.perf_counter() - start
+            if self.traceMemory:
+                peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if self.traceMemory:
+                tracemalloc.stop()
+
+        rssAfter = maxRss()
+        result = {"count": len(latencies),
+                  "wallSeconds": round(wall, 6),
+                  "itemSeconds": round(sum(latencies), 6),
+                  "latencyMs": {k: round(v * 1000, 4) for k, v in percentiles(latencies).items()},
+                  "maxRssGrowthKiB": None if rssAfter is None else rssAfter - rssBefore}
+        if self.traceMemory:
+            result["pythonPeakKiB"] = round(peak / 1024, 1)
+        return result
+
+
+def percentiles(values, ps=(50, 90, 99)):
+    """
+    Return the mean, the maximum and the percentiles (nearest rank) of the values
+    """
+    if not values:
+        return {}
+    values = sorted(values)
+    result = {"mean": sum(values) / len(values), "max": values[-1]}
+    for p in ps:
+        result["p{}".format(p)] = values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+    return result
+
+
+def splitNotes(s):
+    """
+    Return the notes of the string as the former notesFromString found them
+    """
+    return [substr for substr in _SPLIT_NOTESre.split(s) if substr in NOTES]
+
+
+def maxRss():
+    """
+    Return the memory high-water mark of the process in KiB, or None, if it cannot be determined
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":  # Bytes instead of kilobytes
+        rss //= 1024
+    return rss
+
+
+def _pageImageNames(pages, imageNames):
+    """
+    Generate the pages with the names of their images
+    """
+    names = iter(imageNames)
+    for page in pages:
+        yield page, [next(names) for _ in page.images]
+
+
+class _fileLogging(object):
+    """
+    Log the INFO messages to the file as generate_htmls does, for the duration of a "with" block
+    """
+
+    def __init__(self, filename):
+        self.handler = logging.FileHandler(filename, 'w', 'utf-8')
+        self.handler.setFormatter(logging.Formatter("WRITE HTML: %(asctime)s [%(levelname)s] %(message)s"))
+
+    def __enter__(self):
+        root = logging.getLogger()
+        self.level = root.level
+        root.setLevel(logging.INFO)
+        root.addHandler(self.handler)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        root = logging.getLogger()
+        root.removeHandler(self.handler)
+        root.setLevel(self.level)
+        self.handler.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,13 @@ General purpose utilities
 __date__ = '2021-12-05'
 __authors__ = ["Piotr Gradkowski <grotsztaksel@o2.pl>"]
 
-from PyQt5.QtCore import QRect, QSize
+import math
+import struct
+import zlib
+from collections import Counter
+
+from PyQt5.QtCore import Qt, QRect, QSize, QBuffer, QByteArray, QIODevice
+from PyQt5.QtGui import QImage, QImageWriter
 
 
 def square(rect: QRect, maximize=False) -> QRect:
@@ -29,3 +35,74 @@ def square(rect: QRect, maximize=False) -> QRect:
     rect.setSize(QSize(s, s))
     rect.moveCenter(c)
     return rect
+
+
+def indexedImage(image: QImage) -> QImage:
+    """
+    Return the image converted to an 8-bit palette. Images with up to 256 colors are converted exactly. Otherwise the
+    palette consists of the 256 most frequent colors and the remaining colors are replaced with the closest ones
+    """
+    image = image.convertToFormat(QImage.Format_RGB32)
+    bits = image.constBits()
+    bits.setsize(image.sizeInBytes())
+    counts = Counter(memoryview(bits.asstring()).cast('I'))
+    palette = [rgb | 0xff000000 for rgb, _ in counts.most_common(256)]
+    return image.convertToFormat(QImage.Format_Indexed8, palette, Qt.ThresholdDither | Qt.AvoidDither)
+
+
+def encodePng(image: QImage, indexed=False, compression=-1) -> bytes:
+    """
+    Encode the image as PNG without metadata.
+
+    indexed - convert the image to an 8-bit palette (see indexedImage)
+    compression - zlib compression level 0-9, or -1 for the default one
+    """
+    if indexed:
+        image = indexedImage(image)
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    writer = QImageWriter(buffer, b"png")
+    if compression >= 0:
+        # Qt derives the compression level from the quality as (100 - quality) * 9 / 91
+        writer.setQuality(100 - math.ceil(compression * 91 / 9))
+    if not writer.write(image):
+        raise IOError(writer.errorString())
+    return stripPng(bytes(data))
+
+
+def stripPng(data: bytes) -> bytes:
+    """
+    Remove the ancillary chunks (resolution, text etc.) from the PNG data, except transparency, and merge the image
+    data chunks into one
+    """
+    signature = data[:8]
+    chunks = []
+    idat = []
+    pos = 8
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        pos += length + 12
+        if kind == b"IDAT":
+            idat.append(body)
+            continue
+        if idat:
+            chunks.append((b"IDAT", b"".join(idat)))
+            idat = []
+        # Ancillary chunks have the first letter in lower case
+        if kind[0:1].isupper() or kind == b"tRNS":
+            chunks.append((kind, body))
+    return signature + b"".join(struct.pack(">I4s", len(body), kind) + body +
+                                struct.pack(">I", zlib.crc32(kind + body))
+                                for kind, body in chunks)
+
+
+def savePng(image: QImage, filename, indexed=False, compression=-1) -> int:
+    """
+    Save the image as PNG without metadata (see encodePng). Return the size of the file in bytes
+    """
+    data = encodePng(image, indexed, compression)
+    with open(filename, 'wb') as f:
+        f.write(data)
+    return len(data)
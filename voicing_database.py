@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+Persistent database of precomputed voicings of chords.
+
+The voicings of every instrument and tuning are found once by ChordInventor and stored in an SQLite file together
+with their notes, pitch class masks and ergonomic costs. Readers open the file read-only and look the voicings up with
+indexed queries instead of searching the fretboard again:
+
+    python voicing_database.py -o voicings.sqlite
+"""
+
+__all__ = ['VoicingDatabase', 'Voicing', 'schemeText', 'voicings_file']
+__authors__ = ['Piotr Gradkowski <Piotr.Gradkowski@dlr.de>']
+__date__ = '2026-10-18'
+
+import argparse
+import json
+import os
+import sqlite3
+from collections import namedtuple
+from urllib.request import pathname2url
+
+from Instruments.instrument import Instrument
+from Instruments.instrument_factory import InstrumentFactory, instruments_file
+from chord_inventor import ChordInventor
+from file_register import FileRegister
+from music_theory import NOTES, ChordRelation, pitchClass, pitchClassMask, recognizeChord
+
+# Default database file, next to this module
+voicings_file = os.path.join(os.path.dirname(__file__), "voicings.sqlite")
+
+# Version of the schema and of the way the voicings are found. Databases of other versions are rebuilt
+VOICING_DB_VERSION = 1
+
+# Settings of ChordInventor, from which the stored voicings and costs depend
+_INVENTOR_SETTINGS = ("maxFingerStretch", "maxFingers", "allowInnerMutes",
+                      "stretchCost", "barreCost", "muteCost", "bassCost", "positionCost")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS instruments (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    strings TEXT NOT NULL,
+    rootfrets TEXT NOT NULL,
+    nfrets INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS voicings (
+    id INTEGER PRIMARY KEY,
+    instrument INTEGER NOT NULL REFERENCES instruments(id) ON DELETE CASCADE,
+    root TEXT NOT NULL,
+    chordType TEXT NOT NULL,
+    scheme TEXT NOT NULL,
+    lowest INTEGER NOT NULL,
+    highest INTEGER NOT NULL,
+    notes TEXT NOT NULL,
+    mask INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS voicings_chord ON voicings(instrument, chordType, root, cost);
+CREATE INDEX IF NOT EXISTS voicings_mask ON voicings(instrument, mask);
+"""
+
+Voicing = namedtuple("Voicing", ["root", "chordType", "scheme", "lowest", "highest", "notes", "mask", "cost",
+                                 "source"])
+Voicing.__doc__ = "A voicing of a chord stored in VoicingDatabase"
+Voicing.chordType.__doc__ = "Name of the chord type"
+Voicing.scheme.__doc__ = "Frets from the bass string to the thinnest one, None for a muted string"
+Voicing.lowest.__doc__ = "Lowest pressed fret, 0 if no fret is pressed"
+Voicing.highest.__doc__ = "Highest pressed fret, 0 if no fret is pressed"
+Voicing.notes.__doc__ = "Notes of the sounding strings from the bass string"
+Voicing.mask.__doc__ = "12-bit mask of the pitch classes of the voicing"
+Voicing.cost.__doc__ = "Ergonomic cost, see ChordInventor.voicingCost"
+Voicing.source.__doc__ = "'inventor' if found by ChordInventor, 'defined' if defined in Instrument.chords"
+
+
+def schemeText(scheme):
+    """
+    Return the scheme in the usual short notation, e.g. "x32010". The frets are separated with dashes if any of them
+    has two digits
+    """
+    frets = ["x" if f is None else str(f) for f in scheme]
+    return ("-" if any(len(f) > 1 for f in frets) else "").join(frets)
+
+
+class VoicingDatabase(object):
+    """
+    SQLite store of the voicings of chords, keyed by the hash of the instrument's definition (name, tuning, root frets
+    and number of frets) and of the rules of the ChordInventor that found them.
+
+    A database opened read-only cannot be filled, it must exist and have the current version. Use it as a context
+    manager to close it
+    """
+
+    def __init__(self, filename=None, readOnly=False):
+        if filename is None:
+            filename = voicings_file
+        self.filename = filename
+        self.readOnly = readOnly
+        if readOnly:
+            if not os.path.isfile(filename):
+                raise ValueError("The voicing database {} does not exist".format(filename))
+            uri = "file:{}?mode=ro".format(pathname2url(os.path.abspath(filename)))
+            self.connection = sqlite3.connect(uri, uri=True)
+            self._checkVersion()
+        else:
+            self.connection = sqlite3.connect(filename)
+            self._createSchema()
+        self.connection.execute("PRAGMA foreign_keys = ON")
+
+    def _checkVersion(self):
+        """
+        Raise a ValueError, if the database is not a voicing database of the current version
+        """
+        try:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        except sqlite3.DatabaseError as e:
+            self.connection.close()
+            raise ValueError("The voicing database {} cannot be read: {}".format(self.filename, e))
+        if version != VOICING_DB_VERSION:
+            self.connection.close()
+            raise ValueError("The voicing database {} has version {}, not {}. Rebuild it with voicing_database.py"
+                             .format(self.filename, version, VOICING_DB_VERSION))
+
+    def _createSchema(self):
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        with self.connection:
+            if version != VOICING_DB_VERSION:
+                self.connection.executescript("DROP TABLE IF EXISTS voicings; DROP TABLE IF EXISTS instruments;")
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute("PRAGMA user_version = {:d}".format(VOICING_DB_VERSION))
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def instrumentKey(instrument: Instrument, inventor=None):
+        """
+        Return the key of the voicings of the instrument in its current tuning, found by the inventor (default: one
+        with the default settings)
+        """
+        if inventor is None:
+            inventor = ChordInventor()
+        settings = [getattr(inventor, name) for name in _INVENTOR_SETTINGS]
+        return FileRegister.inputsHash(instrument.name, instrument.strings, instrument.rootfrets, instrument.nfrets,
+                                       settings, VOICING_DB_VERSION)
+
+    def _instrumentId(self, instrument, inventor=None):
+        row = self.connection.execute("SELECT id FROM instruments WHERE key = ?",
+                                      (self.instrumentKey(instrument, inventor),)).fetchone()
+        return None if row is None else row[0]
+
+    def hasInstrument(self, instrument: Instrument, inventor=None):
+        """
+        Check if the voicings of the instrument in its current tuning are stored
+        """
+        return self._instrumentId(instrument, inventor) is not None
+
+    def fill(self, instrument: Instrument, inventor=None, chordTypes=None):
+        """
+        Find the voicings of all roots of the chord types (default: all registered types) on the instrument in its
+        current tuning and store them together with the chords defined in Instrument.chords, replacing the voicings
+        stored before. The strings missing from a defined scheme (e.g. the drone of a banjo) are stored muted.
+        Everything is written in a single transaction. Returns the number of stored voicings
+        """
+        if self.readOnly:
+            raise ValueError("The voicing database {} is opened read-only".format(self.filename))
+        if inventor is None:
+            inventor = ChordInventor()
+        inventor.setInstrument(instrument)
+        rows = []
+        catalogue = inventor.buildCatalogue(chordTypes)
+        for scheme, root, itype in zip(catalogue.schemes.tolist(), catalogue.roots.tolist(), catalogue.types.tolist()):
+            scheme = [None if f < 0 else f for f in scheme]
+            rows.append(self._row(instrument, inventor, scheme, NOTES[root], catalogue.chordTypes[itype], "inventor"))
+        for chord in instrument.chords:
+            scheme = [f[0] if isinstance(f, tuple) else f for f in chord.scheme]
+            scheme = [None] * (len(instrument.strings) - len(scheme)) + scheme
+            pitchClasses = [instrument.getPitchClass(len(scheme) - i - 1, f)
+                            for i, f in enumerate(scheme) if f is not None]
+            matches = [m for m in recognizeChord(pitchClasses) if m.relation != ChordRelation.superset]
+            if matches:
+                rows.append(self._row(instrument, inventor, scheme, NOTES[matches[0].root], matches[0].chordType,
+                                      "defined"))
+
+        with self.connection:
+            self.connection.execute("DELETE FROM instruments WHERE key = ?",
+                                    (self.instrumentKey(instrument, inventor),))
+            cursor = self.connection.execute(
+                "INSERT INTO instruments (key, name, strings, rootfrets, nfrets) VALUES (?, ?, ?, ?, ?)",
+                (self.instrumentKey(instrument, inventor), instrument.name, json.dumps(instrument.strings),
+                 json.dumps(instrument.rootfrets), instrument.nfrets))
+            instrumentId = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO voicings (instrument, root, chordType, scheme, lowest, highest, notes, mask, cost, "
+                "source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [(instrumentId,) + row for row in rows])
+        return len(rows)
+
+    @staticmethod
+    def _row(instrument, inventor, scheme, root, chordType, source):
+        """
+        Return the values of the columns of a voicing
+        """
+        rootfrets = instrument.rootfrets[::-1]
+        strings = len(scheme)
+        pressed = [f for f, rootfret in zip(scheme, rootfrets) if f is not None and f != rootfret]
+        notes = [instrument.getNote(strings - i - 1, f) for i, f in enumerate(scheme) if f is not None]
+        mask = pitchClassMask(instrument.getPitchClass(strings - i - 1, f) for i, f in enumerate(scheme)
+                              if f is not None)
+        return (root, chordType.name, ",".join("x" if f is None else str(f) for f in scheme),
+                min(pressed, default=0), max(pressed, default=0), ",".join(notes), mask,
+                inventor.voicingCost(scheme, root), source)
+
+    def voicings(self, instrument: Instrument, root=None, chordType=None, minFret=None, maxFret=None, maxCost=None,
+                 mask=None, limit=None, inventor=None):
+        """
+        Return the stored voicings of the instrument in its current tuning, the best (cheapest) first. The voicings can
+        be selected by the root, the chord type (a ChordType or its name), the range of the pressed frets, the highest
+        cost and the pitch class mask. Returns an empty list if the instrument is not stored
+        """
+        instrumentId = self._instrumentId(instrument, inventor)
+        if instrumentId is None:
+            return []
+        conditions = ["instrument = ?"]
+        values = [instrumentId]
+        if root is not None:
+            conditions.append("root = ?")
+            values.append(NOTES[pitchClass(root)])
+        if chordType is not None:
+            conditions.append("chordType = ?")
+            values.append(chordType if isinstance(chordType, str) else chordType.name)
+        if minFret is not None:
+            conditions.append("lowest >= ?")
+            values.append(minFret)
+        if maxFret is not None:
+            conditions.append("highest <= ?")
+            values.append(maxFret)
+        if maxCost is not None:
+            conditions.append("cost <= ?")
+            values.append(maxCost)
+        if mask is not None:
+            conditions.append("mask = ?")
+            values.append(mask)
+        query = ("SELECT root, chordType, scheme, lowest, highest, notes, mask, cost, source FROM voicings "
+                 "WHERE {} ORDER BY cost, lowest, id".format(" AND ".join(conditions)))
+        if limit is not None:
+            query += " LIMIT {:d}".format(limit)
+        return [Voicing(root, chordType, tuple(None if f == "x" else int(f) for f in scheme.split(",")), lowest,
+                        highest, tuple(notes.split(",")) if notes else (), mask, cost, source)
+                for root, chordType, scheme, lowest, highest, notes, mask, cost, source
+                in self.connection.execute(query, values)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the voicings of all chords of the instruments in all "
+                                                 "their tunings")
+    parser.add_argument("-o", "--output", default=voicings_file,
+                        help="Database file to fill (default: {})".format(voicings_file))
+    parser.add_argument("-i", "--instruments",
+                        default=instruments_file,
+                        help="JSON file with the instruments (default: the instruments.json of the package)")
+    args = parser.parse_args(argv)
+
+    factory = InstrumentFactory(args.instruments)
+    with VoicingDatabase(args.output) as db:
+        for instrumentName in factory.storedNames():
+            instrument = factory.definition(instrumentName)
+            for name, strings in instrument.tuning:
+                count = db.fill(instrument.withTuning(strings))
+                print("{} ({}): {} voicings".format(instrument.name, name or ", ".join(strings), count))
+
+
+if __name__ == '__main__':
+    main()